@@ -0,0 +1,251 @@
+import asyncio
+import datetime
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.interfaces import IReminderStorage
+from database import Database
+
+
+class AsyncDatabase(IReminderStorage):
+    """Awaitable facade over Database for use on the asyncio event loop.
+
+    Writes are serialized on a single dedicated thread that owns the primary
+    connection. Reads run on a small thread pool where every thread keeps its
+    own query-only WAL connection, so readers never wait behind a commit.
+
+    Per-user active counts for quota checks are cached in memory. add,
+    update_status and cancel_for_user adjust them in place. Writes that do not
+    say whose reminders changed drop the whole cache, and entries expire after
+    count_cache_ttl so writes from other processes are picked up.
+    """
+
+    def __init__(self, path_or_url: str, readers: int = 4, count_cache_ttl: float = 60,
+                 max_cached_counts: int = 100000, archive_path: Optional[str] = None,
+                 auto_vacuum: Optional[str] = "INCREMENTAL", wal_size_limit: int = 64 * 1024 * 1024):
+        self.path_or_url = path_or_url
+        self.archive_path = archive_path
+        self.count_cache_ttl = count_cache_ttl
+        self.max_cached_counts = max_cached_counts
+        self._active_counts: Dict[int, Tuple[int, float]] = {}
+        self._counts_generation = 0
+        self.writer = Database(path_or_url, archive_path=archive_path, auto_vacuum=auto_vacuum,
+                               wal_size_limit=wal_size_limit)
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._read_executor = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="db-reader")
+        self._local = threading.local()
+        self._readers: List[Database] = []
+        self._readers_lock = threading.Lock()
+
+    def _reader(self) -> Database:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = Database(self.path_or_url, readonly=True, archive_path=self.archive_path)
+            self._local.db = db
+            with self._readers_lock:
+                self._readers.append(db)
+        return db
+
+    def _call_reader(self, method: str, args, kwargs):
+        return getattr(self._reader(), method)(*args, **kwargs)
+
+    async def _write(self, method: str, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(getattr(self.writer, method), *args, **kwargs)
+        return await loop.run_in_executor(self._write_executor, call)
+
+    async def _write_counts(self, method: str, *args):
+        """_write for methods that change active counts; reads overlapping it are not cached"""
+        self._counts_generation += 1
+        return await self._write(method, *args)
+
+    async def _read(self, method: str, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call_reader, method, args, kwargs)
+        return await loop.run_in_executor(self._read_executor, call)
+
+    def add_time_listener(self, callback: Callable[[int, datetime.datetime], None]):
+        """Listeners are invoked on the writer thread"""
+        self.writer.add_time_listener(callback)
+
+    def remove_time_listener(self, callback: Callable[[int, datetime.datetime], None]):
+        self.writer.remove_time_listener(callback)
+
+    async def add(self, user_id, category, content, time, timezone, repeat, status="active", lead_times=None):
+        reminder_id = await self._write_counts("add", user_id, category, content, time, timezone, repeat, status, lead_times)
+        if status == "active":
+            self._adjust_count(user_id, 1)
+        return reminder_id
+
+    async def add_many(self, user_id, reminders, status="active") -> List[int]:
+        ids = await self._write_counts("add_many", user_id, reminders, status)
+        if status == "active":
+            self._adjust_count(user_id, len(ids))
+        return ids
+
+    async def active_count(self, user_id) -> int:
+        """Number of active reminders of user_id, from memory when cached"""
+        cached = self._active_counts.get(user_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.count_cache_ttl:
+            return cached[0]
+        generation = self._counts_generation
+        count = await self._read("active_count", user_id)
+        # A write that landed while we were reading may already be missing from count
+        if generation == self._counts_generation:
+            if len(self._active_counts) >= self.max_cached_counts:
+                self._active_counts.clear()
+            self._active_counts[user_id] = (count, now)
+        return count
+
+    def _adjust_count(self, user_id, delta: int):
+        self._counts_generation += 1
+        cached = self._active_counts.get(user_id)
+        if cached is not None:
+            self._active_counts[user_id] = (cached[0] + delta, cached[1])
+
+    def _forget_counts(self):
+        self._counts_generation += 1
+        self._active_counts.clear()
+
+    async def list(self, user_id, status="active"):
+        return await self._read("list", user_id, status)
+
+    async def export_page(self, user_id, after_id=0, limit=500, archived=False):
+        return await self._read("export_page", user_id, after_id, limit, archived)
+
+    async def update_status(self, reminder_id, status):
+        previous = await self._write_counts("update_status", reminder_id, status)
+        if previous:
+            user_id, old_status = previous
+            self._adjust_count(user_id, (status == "active") - (old_status == "active"))
+        return previous
+
+    async def update_time(self, reminder_id, new_time):
+        return await self._write("update_time", reminder_id, new_time)
+
+    async def commit_tick(self, completed=(), rescheduled=None, cancelled=(), notifications=(), owner=None):
+        result = await self._write_counts("commit_tick", completed, rescheduled, cancelled, notifications, owner)
+        if completed or cancelled:
+            self._forget_counts()
+        return result
+
+    async def claim_outbox(self, now_utc: datetime.datetime, lease_seconds=60, limit=100):
+        return await self._write("claim_outbox", now_utc, lease_seconds, limit)
+
+    async def ack_outbox(self, message_ids):
+        return await self._write("ack_outbox", message_ids)
+
+    async def renew_outbox(self, message_id, attempts, now_utc: datetime.datetime, lease_seconds=60) -> bool:
+        return await self._write("renew_outbox", message_id, attempts, now_utc, lease_seconds)
+
+    async def fail_outbox(self, message_id, error, retry_at: Optional[datetime.datetime] = None):
+        return await self._write("fail_outbox", message_id, error, retry_at)
+
+    async def update_reminder(self, reminder_id, category, content, time, timezone, repeat):
+        return await self._write("update_reminder", reminder_id, category, content, time, timezone, repeat)
+
+    async def due(self, now_utc: datetime.datetime, limit=1000, after: Optional[Tuple[int, int]] = None):
+        return await self._read("due", now_utc, limit, after)
+
+    async def claim_due(self, now_utc: datetime.datetime, owner: str, lease_seconds=300, limit=1000, categories=None):
+        return await self._write("claim_due", now_utc, owner, lease_seconds, limit, categories)
+
+    async def upcoming(self, until_utc: datetime.datetime, limit=10000) -> List[Tuple[datetime.datetime, int]]:
+        return await self._read("upcoming", until_utc, limit)
+
+    async def next_claimable(self, now_utc: datetime.datetime) -> Optional[datetime.datetime]:
+        return await self._read("next_claimable", now_utc)
+
+    async def get(self, reminder_id, user_id, status="active"):
+        return await self._read("get", reminder_id, user_id, status)
+
+    async def exists_for_user(self, reminder_id, user_id, status="active") -> bool:
+        return await self._read("exists_for_user", reminder_id, user_id, status)
+
+    async def cancel_for_user(self, reminder_id, user_id) -> int:
+        changed = await self._write_counts("cancel_for_user", reminder_id, user_id)
+        if changed:
+            self._adjust_count(user_id, -changed)
+        return changed
+
+    async def ping(self):
+        return await self._read("ping")
+
+    async def get_timezone(self, reminder_id) -> Optional[str]:
+        return await self._read("get_timezone", reminder_id)
+
+    async def add_follow_up(self, parent_id, category, time, retry_count=1, source_id=None) -> Optional[int]:
+        follow_up_id = await self._write_counts("add_follow_up", parent_id, category, time, retry_count, source_id)
+        if follow_up_id:
+            self._forget_counts()
+        return follow_up_id
+
+    async def follow_up_of(self, reminder_id) -> Optional[Tuple[int, int]]:
+        return await self._read("follow_up_of", reminder_id)
+
+    async def count_follow_ups(self, parent_id, status="active") -> int:
+        return await self._read("count_follow_ups", parent_id, status)
+
+    async def cancel_follow_ups(self, parent_id) -> int:
+        changed = await self._write_counts("cancel_follow_ups", parent_id)
+        if changed:
+            self._forget_counts()
+        return changed
+
+    async def cleanup_old_reminders(self, days_old=30, batch_size=500, time_budget=5.0):
+        """Runs one batch per writer job so ticks can commit between batches"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + time_budget
+        while loop.time() < deadline:
+            if await self._write("archive_finished", batch_size) < batch_size:
+                break
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days_old)
+        purged = 0
+        while loop.time() < deadline:
+            deleted = await self._write("purge_archive", cutoff, batch_size)
+            purged += deleted
+            if deleted < batch_size:
+                break
+        return purged
+
+    async def archive_finished(self, limit=500) -> int:
+        return await self._write("archive_finished", limit)
+
+    async def purge_archive(self, before_utc: datetime.datetime, limit=500) -> int:
+        return await self._write("purge_archive", before_utc, limit)
+
+    async def purge_dead_outbox(self, before_utc: datetime.datetime, limit=500) -> int:
+        return await self._write("purge_dead_outbox", before_utc, limit)
+
+    async def checkpoint(self, mode="PASSIVE") -> Tuple[int, int, int]:
+        return await self._write("checkpoint", mode)
+
+    async def incremental_vacuum(self, max_pages=0) -> int:
+        return await self._write("incremental_vacuum", max_pages)
+
+    async def storage_stats(self) -> dict:
+        return await self._read("storage_stats")
+
+    async def get_stats(self, user_id=None):
+        return await self._read("get_stats", user_id)
+
+    async def get_admin_stats(self):
+        return await self._read("get_admin_stats")
+
+    async def reconcile_stats(self) -> int:
+        drifted = await self._write_counts("reconcile_stats")
+        self._forget_counts()
+        return drifted
+
+    async def close(self):
+        self._write_executor.shutdown(wait=True)
+        self._read_executor.shutdown(wait=True)
+        with self._readers_lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+        self.writer.close()
@@ -0,0 +1,74 @@
+"""Per-reminder cost of rescheduling recurring reminders.
+
+Compares the one-at-a-time path (strptime, from_json, advance_past, strftime)
+with ReminderScheduler._next_times, which parses each repeat string once and
+solves plain patterns in one NumPy batch when NumPy is installed.
+
+    python benchmarks/bench_reschedule.py [batch sizes...]
+"""
+import datetime
+import os
+import random
+import sys
+import time
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DueReminder, _to_epoch  # noqa: E402
+from handlers import repeat_handler  # noqa: E402
+from services.reminder_scheduler import ReminderScheduler  # noqa: E402
+
+REPEATS = [
+    '{"type": "daily"}',
+    '{"type": "weekly"}',
+    '{"type": "monthly"}',
+    '{"type": "yearly"}',
+    '{"type": "interval", "value": 8, "unit": "hours"}',
+    '{"type": "interval", "value": 30, "unit": "minutes"}',
+    '{"type": "weekly", "weekdays": ["monday", "wednesday"]}',
+]
+
+
+def make_rows(count, seed=7):
+    rng = random.Random(seed)
+    base = datetime.datetime.utcnow() - datetime.timedelta(days=3)
+    rows = []
+    for i in range(count):
+        when = base + datetime.timedelta(minutes=rng.randrange(0, 4 * 24 * 60))
+        # Rows as claim_due returns them; due_at is the occurrence in UTC
+        due_at = _to_epoch(when - datetime.timedelta(hours=3, minutes=30))
+        rows.append(DueReminder(
+            i, 123, "work", "Reminder", when.strftime("%Y-%m-%d %H:%M"), "+03:30", rng.choice(REPEATS),
+            due_at, due_at
+        ))
+    return rows
+
+
+def bench_scalar(scheduler, rows):
+    started = time.perf_counter()
+    for r in rows:
+        scheduler._next_time(r.time, r.repeat, r.timezone)
+    return time.perf_counter() - started
+
+
+def bench_batch(scheduler, rows):
+    started = time.perf_counter()
+    scheduler._next_times(rows)
+    return time.perf_counter() - started
+
+
+def main(sizes):
+    scheduler = ReminderScheduler(Mock(), Mock(), Mock())
+    numpy_state = "installed" if repeat_handler.np is not None else "not installed"
+    print(f"NumPy {numpy_state}")
+    print(f"{'batch':>8} {'scalar us/rem':>14} {'batch us/rem':>13} {'speedup':>8}")
+    for size in sizes:
+        rows = make_rows(size)
+        scalar = bench_scalar(scheduler, rows)
+        batch = bench_batch(scheduler, rows)
+        print(f"{size:>8} {scalar / size * 1e6:>14.2f} {batch / size * 1e6:>13.2f} {scalar / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
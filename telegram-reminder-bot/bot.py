@@ -1,13 +1,21 @@
 from aiogram import Bot, Dispatcher, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, FSInputFile
 from aiogram.filters import Command
 
 # Local imports
 from config.config import Config
-from database import Database
+from async_database import AsyncDatabase
 from utils.json_storage import JSONStorage
+from utils.sqlite_user_storage import SqliteUserStorage
+from utils.cached_user_storage import CachedUserStorage
 from handlers.ai_handler import AIHandler
 from services.reminder_scheduler import ReminderScheduler
+from services.send_governor import SendGovernor
+from services.outbox_dispatcher import OutboxDispatcher
+from services.db_maintenance import DatabaseMaintenance
+from services.reminder_export import EXPORT_FORMATS, ReminderExporter
+from services.priority_lanes import PriorityLanes
+from services.metrics import MetricsRegistry, MetricsReporter, MetricsExporterFactory
 from handlers.repeat_handler import RepeatHandler
 from handlers.message_handlers import ReminderMessageHandler
 from handlers.callback_handlers import ReminderCallbackHandler
@@ -17,6 +25,7 @@ from utils.security_utils import create_secure_directory, secure_file_permission
 
 import json
 import os
+import tempfile
 import datetime
 import asyncio
 import logging
@@ -40,15 +49,86 @@ create_secure_directory(config.users_path)
 
 bot = Bot(token=config.bot_token)
 dp = Dispatcher()
-db = Database(config.database_url)
-storage = JSONStorage(config.users_path)
+db = AsyncDatabase(
+    config.database_url,
+    readers=config.database_readers,
+    archive_path=config.database_archive_path,
+    auto_vacuum=config.database_auto_vacuum,
+    wal_size_limit=config.database_wal_limit_mb * 1024 * 1024
+)
+if config.users_backend == "json":
+    user_store = JSONStorage(config.users_path)
+else:
+    user_store = SqliteUserStorage(config.users_db_path)
+    migrated = user_store.migrate_from_json(config.users_path)
+    if migrated:
+        logger.info(f"Migrated {migrated} users from {config.users_path} to {config.users_db_path}")
 ai = AIHandler(config.openrouter_key)
-scheduler = ReminderScheduler(db, storage, bot)
+metrics = MetricsRegistry()
+user_cache = CachedUserStorage(
+    user_store,
+    metrics=metrics,
+    max_entries=config.users_cache_size,
+    ttl=config.users_cache_ttl,
+    flush_interval=config.users_cache_flush_interval
+) if config.users_cache_size > 0 else None
+storage = user_cache or user_store
+exporter_options = {"path": config.metrics_path} if config.metrics_exporter == "text" else {}
+metrics_reporter = MetricsReporter(
+    metrics,
+    [MetricsExporterFactory.create(config.metrics_exporter, **exporter_options)],
+    interval=config.metrics_interval
+)
+send_governor = SendGovernor(
+    global_rate=config.notification_global_rate,
+    per_chat_rate=config.notification_per_chat_rate,
+    per_chat_burst=config.notification_per_chat_burst,
+    metrics=metrics
+)
+lanes = PriorityLanes(config.notification_priority_lanes, config.notification_lane_reserved, metrics=metrics)
+outbox = OutboxDispatcher(
+    db, bot,
+    governor=send_governor,
+    lanes=lanes,
+    metrics=metrics,
+    workers=config.outbox_workers,
+    batch_size=config.outbox_batch_size,
+    lease_seconds=config.outbox_lease_seconds,
+    max_attempts=config.outbox_max_attempts
+) if config.outbox_enabled else None
+maintenance = DatabaseMaintenance(
+    db,
+    metrics=metrics,
+    interval=config.maintenance_interval,
+    retention_days=config.archive_retention_days,
+    time_budget=config.maintenance_time_budget,
+    wal_truncate_bytes=config.database_wal_limit_mb * 1024 * 1024
+)
+scheduler = ReminderScheduler(
+    db, storage, bot,
+    governor=send_governor,
+    outbox=outbox,
+    lanes=lanes,
+    metrics=metrics,
+    mode=config.scheduler_mode,
+    poll_interval=config.scheduler_poll_interval,
+    heap_horizon=config.scheduler_heap_horizon,
+    batch_size=config.scheduler_batch_size,
+    drain=config.scheduler_drain,
+    instance_id=config.scheduler_instance_id,
+    lease_seconds=config.scheduler_lease_seconds,
+    catch_up=config.scheduler_catch_up
+)
 repeat_handler = RepeatHandler()
+reminder_exporter = ReminderExporter(db, repeat_handler)
 base = os.path.dirname(__file__)
 
 if os.path.exists(config.database_path):
     secure_file_permissions(config.database_path)
+if config.database_archive_path and os.path.exists(config.database_archive_path):
+    secure_file_permissions(config.database_archive_path)
+if config.users_backend != "json" and os.path.exists(config.users_db_path):
+    secure_file_permissions(config.users_db_path)
 
 def load_locales():
     l = {}
@@ -85,7 +165,7 @@ session = UserSession()
 
 message_handler = ReminderMessageHandler(storage, db, ai, repeat_handler, locales, session, config)
 callback_handler = ReminderCallbackHandler(storage, db, ai, repeat_handler, locales, message_handler, session, config)
-admin_handler = AdminHandler(storage, db, bot, config, locales)
+admin_handler = AdminHandler(storage, db, bot, config, locales, send_governor)
 
 @dp.message(Command("start"))
 async def start_message(message: Message):
@@ -98,6 +178,13 @@ async def start_message(message: Message):
     
     data = storage.load(user_id)
     is_new_user = not data["settings"].get("setup_complete", False)
+    if data.get("blocked"):
+        # /start after blocking the bot means broadcasts reach the user again
+        storage.set_blocked(user_id, False)
+        # Keeps the save below from writing the old flag back
+        data.pop("blocked")
+    # Lets admins find the user by @username
+    data["username"] = message.from_user.username
     
     if config.forced_join.get("enabled", False) and not is_new_user:
         if not await admin_handler.check_user_membership(user_id):
@@ -150,7 +237,7 @@ async def list_reminders(message: Message):
         data = storage.load(user_id)
         lang = data["settings"]["language"]
         calendar_type = data["settings"].get("calendar", "miladi")
-        reminders = db.list(user_id)
+        reminders = await db.list(user_id)
         if not reminders:
             await message.answer(message_handler.t(lang, "no_reminders"))
         else:
@@ -173,7 +260,7 @@ async def show_reminders_list(message: Message):
         data = storage.load(user_id)
         lang = data["settings"]["language"]
         calendar_type = data["settings"].get("calendar", "miladi")
-        reminders = db.list(user_id)
+        reminders = await db.list(user_id)
     except Exception as e:
         logger.error(f"Error in show_reminders_list for user {user_id}: {e}")
         return
@@ -206,10 +293,7 @@ async def delete_reminder(message: Message):
             try:
                 reminder_id = int(parts[1])
                 if reminder_id > 0:
-                    user_reminders = db.list(user_id)
-                    reminder_exists = any(r[0] == reminder_id for r in user_reminders)
-                    if reminder_exists:
-                        db.update_status(reminder_id, "cancelled")
+                    if await db.cancel_for_user(reminder_id, user_id):
                         await message.answer(message_handler.t(lang, "reminder_deleted").format(id=reminder_id))
                     else:
                         await message.answer(message_handler.t(lang, "invalid_id"))
@@ -222,6 +306,36 @@ async def delete_reminder(message: Message):
     except Exception as e:
         logger.error(f"Error in delete_reminder for user {user_id}: {e}")
 
+@dp.message(Command("export"))
+async def export_reminders(message: Message):
+    user_id = message.from_user.id
+    if not message_handler.rate_limit_check(user_id):
+        await message_handler.handle_rate_limit(message)
+        return
+    try:
+        lang = storage.load(user_id)["settings"]["language"]
+        parts = message.text.split()
+        fmt = parts[1].lower() if len(parts) > 1 else "ics"
+        if fmt not in EXPORT_FORMATS:
+            await message.answer(message_handler.t(lang, "export_usage"))
+            return
+        # Rows are streamed into a temp file, which is sent as a document
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+                count = await reminder_exporter.export(user_id, fmt, out)
+            if count:
+                await message.answer_document(
+                    FSInputFile(path, filename=f"reminders.{fmt}"),
+                    caption=message_handler.t(lang, "export_done").format(count=count)
+                )
+            else:
+                await message.answer(message_handler.t(lang, "no_reminders"))
+        finally:
+            os.unlink(path)
+    except Exception as e:
+        logger.error(f"Error in export_reminders for user {user_id}: {e}")
+
 async def show_delete_reminders(message: Message):
     user_id = message.from_user.id
     if not message_handler.rate_limit_check(user_id):
@@ -231,7 +345,7 @@ async def show_delete_reminders(message: Message):
         data = storage.load(user_id)
         lang = data["settings"]["language"]
         calendar_type = data["settings"].get("calendar", "miladi")
-        reminders = db.list(user_id)
+        reminders = await db.list(user_id)
     except Exception as e:
         logger.error(f"Error in show_delete_reminders for user {user_id}: {e}")
         return
@@ -259,7 +373,7 @@ async def show_edit_reminders(message: Message):
         data = storage.load(user_id)
         lang = data["settings"]["language"]
         calendar_type = data["settings"].get("calendar", "miladi")
-        reminders = db.list(user_id)
+        reminders = await db.list(user_id)
     except Exception as e:
         logger.error(f"Error in show_edit_reminders for user {user_id}: {e}")
         return
@@ -303,6 +417,10 @@ async def show_menu(message: Message):
     kb = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
     await message.answer(message_handler.t(lang, "menu"), reply_markup=kb)
 
+@dp.message(F.document)
+async def handle_document(message: Message):
+    await message_handler.handle_document(message)
+
 @dp.message(F.text)
 async def handle_menu_buttons(message: Message):
     user_id = message.from_user.id
@@ -362,7 +480,7 @@ async def handle_menu_buttons(message: Message):
         ])
         await message.answer(message_handler.t(lang, "settings"), reply_markup=kb)
     elif action == "stats":
-        stats = db.get_stats(user_id)
+        stats = await db.get_stats(user_id)
         await message.answer(message_handler.t(lang, "stats").format(**stats))
 
 
@@ -492,7 +610,13 @@ async def cleanup_memory():
 async def main():
     try:
         asyncio.create_task(cleanup_memory())
+        if outbox:
+            outbox.start()
         scheduler.start()
+        maintenance.start()
+        if user_cache:
+            user_cache.start()
+        metrics_reporter.start()
         await dp.start_polling(bot)
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
@@ -500,8 +624,16 @@ async def main():
         logger.error(f"Bot error: {e}")
     finally:
         scheduler.stop()
+        maintenance.stop()
+        metrics_reporter.stop()
+        if outbox:
+            outbox.stop()
         await bot.session.close()
-        db.close()
+        await db.close()
+        if user_cache:
+            user_cache.stop()
+        if isinstance(user_store, SqliteUserStorage):
+            user_store.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -9,7 +9,19 @@ class Config:
         self.openrouter_key: str = self.config_data.get("ai", {}).get("openrouter_key", "")
         self.database_path: str = self.config_data.get("database", {}).get("path", "data/reminders.db")
         self.database_url: str = self.config_data.get("database", {}).get("url", f"sqlite:///{self.database_path}")
+        self.database_readers: int = self.config_data.get("database", {}).get("reader_pool_size", 4)
+        self.database_archive_path: Optional[str] = self.config_data.get("database", {}).get("archive_path")
+        self.archive_retention_days: int = self.config_data.get("database", {}).get("archive_retention_days", 30)
+        self.database_auto_vacuum: Optional[str] = self.config_data.get("database", {}).get("auto_vacuum", "INCREMENTAL")
+        self.database_wal_limit_mb: int = self.config_data.get("database", {}).get("wal_limit_mb", 64)
+        self.maintenance_interval: float = self.config_data.get("database", {}).get("maintenance_interval", 600)
+        self.maintenance_time_budget: float = self.config_data.get("database", {}).get("maintenance_time_budget", 5.0)
         self.users_path: str = self.config_data.get("storage", {}).get("users_path", "data/users")
+        self.users_backend: str = self.config_data.get("storage", {}).get("backend", "sqlite")
+        self.users_db_path: str = self.config_data.get("storage", {}).get("users_db_path", "data/users.db")
+        self.users_cache_size: int = self.config_data.get("storage", {}).get("cache_size", 10000)
+        self.users_cache_ttl: float = self.config_data.get("storage", {}).get("cache_ttl", 300)
+        self.users_cache_flush_interval: float = self.config_data.get("storage", {}).get("cache_flush_interval", 5.0)
         self.max_requests_per_minute: int = self.config_data.get("bot", {}).get("max_requests_per_minute", 20)
         self.rate_limit_window: int = self.config_data.get("bot", {}).get("rate_limit_window", 60)
         self.max_reminders_per_user: int = self.config_data.get("bot", {}).get("max_reminders_per_user", 100)
@@ -25,6 +37,27 @@ class Config:
         self.notification_strategy: str = self.config_data.get("notification", {}).get("strategy", "standard")
         self.notification_max_retries: int = self.config_data.get("notification", {}).get("max_retries", 3)
         self.notification_retry_delay: float = self.config_data.get("notification", {}).get("retry_delay", 1.0)
+        self.notification_global_rate: float = self.config_data.get("notification", {}).get("global_rate", 30.0)
+        self.notification_per_chat_rate: float = self.config_data.get("notification", {}).get("per_chat_rate", 1.0)
+        self.notification_per_chat_burst: float = self.config_data.get("notification", {}).get("per_chat_burst", 1.0)
+        self.notification_priority_lanes: Optional[dict] = self.config_data.get("notification", {}).get("priority_lanes")
+        self.notification_lane_reserved: Optional[dict] = self.config_data.get("notification", {}).get("lane_reserved")
+        self.scheduler_mode: str = self.config_data.get("scheduler", {}).get("mode", "poll")
+        self.scheduler_poll_interval: float = self.config_data.get("scheduler", {}).get("poll_interval", 60)
+        self.scheduler_heap_horizon: float = self.config_data.get("scheduler", {}).get("heap_horizon", 3600)
+        self.scheduler_batch_size: int = self.config_data.get("scheduler", {}).get("batch_size", 500)
+        self.scheduler_drain: bool = self.config_data.get("scheduler", {}).get("drain", False)
+        self.scheduler_lease_seconds: int = self.config_data.get("scheduler", {}).get("lease_seconds", 300)
+        self.scheduler_instance_id: Optional[str] = self.config_data.get("scheduler", {}).get("instance_id")
+        self.scheduler_catch_up: str = self.config_data.get("scheduler", {}).get("catch_up", "once")
+        self.outbox_enabled: bool = self.config_data.get("outbox", {}).get("enabled", True)
+        self.outbox_workers: int = self.config_data.get("outbox", {}).get("workers", 4)
+        self.outbox_batch_size: int = self.config_data.get("outbox", {}).get("batch_size", 50)
+        self.outbox_lease_seconds: int = self.config_data.get("outbox", {}).get("lease_seconds", 60)
+        self.outbox_max_attempts: int = self.config_data.get("outbox", {}).get("max_attempts", 5)
+        self.metrics_exporter: str = self.config_data.get("metrics", {}).get("exporter", "log")
+        self.metrics_interval: float = self.config_data.get("metrics", {}).get("interval", 300)
+        self.metrics_path: Optional[str] = self.config_data.get("metrics", {}).get("path")
         constants = self.config_data.get("constants", {})
         self.max_reminder_length: int = constants.get("max_reminder_length", 500)
         self.max_city_length: int = constants.get("max_city_length", 50)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Union
 import os
 import json
 import logging
@@ -16,6 +16,13 @@ class DatabaseConfig:
     synchronous: str = "NORMAL"
     cache_size: int = 10000
     temp_store: str = "MEMORY"
+    reader_pool_size: int = 4
+    archive_path: Optional[str] = None
+    archive_retention_days: int = 30
+    auto_vacuum: Optional[str] = "INCREMENTAL"
+    wal_limit_mb: int = 64
+    maintenance_interval: float = 600
+    maintenance_time_budget: float = 5.0
     
     def validate(self) -> bool:
         """Validate database configuration"""
@@ -23,6 +30,16 @@ class DatabaseConfig:
             raise ValueError("Database path cannot be empty")
         if self.timeout <= 0:
             raise ValueError("Database timeout must be positive")
+        if self.reader_pool_size <= 0:
+            raise ValueError("Reader pool size must be positive")
+        if self.archive_retention_days <= 0:
+            raise ValueError("Archive retention days must be positive")
+        if self.auto_vacuum and self.auto_vacuum.upper() not in ("NONE", "FULL", "INCREMENTAL"):
+            raise ValueError("Auto vacuum must be NONE, FULL or INCREMENTAL")
+        if self.wal_limit_mb <= 0:
+            raise ValueError("WAL limit must be positive")
+        if self.maintenance_interval <= 0 or self.maintenance_time_budget <= 0:
+            raise ValueError("Maintenance interval and time budget must be positive")
         return True
 
 
@@ -69,6 +86,11 @@ class AIConfig:
 class StorageConfig:
     """Storage configuration"""
     users_path: str = "data/users"
+    backend: str = "sqlite"
+    users_db_path: str = "data/users.db"
+    cache_size: int = 10000
+    cache_ttl: float = 300
+    cache_flush_interval: float = 5.0
     backup_enabled: bool = True
     backup_interval_hours: int = 24
     cleanup_old_backups: bool = True
@@ -78,6 +100,14 @@ class StorageConfig:
         """Validate storage configuration"""
         if not self.users_path:
             raise ValueError("Users path cannot be empty")
+        if self.backend not in ("sqlite", "json"):
+            raise ValueError("Storage backend must be 'sqlite' or 'json'")
+        if self.backend == "sqlite" and not self.users_db_path:
+            raise ValueError("Users database path cannot be empty")
+        if self.cache_size < 0:
+            raise ValueError("User cache size cannot be negative")
+        if self.cache_ttl <= 0 or self.cache_flush_interval <= 0:
+            raise ValueError("User cache TTL and flush interval must be positive")
         if self.backup_interval_hours <= 0:
             raise ValueError("Backup interval must be positive")
         return True
@@ -106,6 +136,12 @@ class NotificationConfig:
     max_retries: int = 3
     retry_delay: float = 1.0
     enable_silent_mode: bool = False
+    global_rate: float = 30.0
+    per_chat_rate: float = 1.0
+    per_chat_burst: float = 1.0
+    # Lane name -> categories, most urgent lane first; None keeps the built-in lanes
+    priority_lanes: Optional[Dict[str, List[str]]] = None
+    lane_reserved: Optional[Dict[str, int]] = None
     
     def validate(self) -> bool:
         """Validate notification configuration"""
@@ -113,6 +149,79 @@ class NotificationConfig:
             raise ValueError("Max retries cannot be negative")
         if self.retry_delay < 0:
             raise ValueError("Retry delay cannot be negative")
+        if self.global_rate <= 0 or self.per_chat_rate <= 0:
+            raise ValueError("Send rates must be positive")
+        if self.per_chat_burst < 1:
+            raise ValueError("Per-chat burst must be at least 1")
+        if self.lane_reserved and any(slots < 0 for slots in self.lane_reserved.values()):
+            raise ValueError("Reserved lane capacity cannot be negative")
+        return True
+
+
+@dataclass
+class SchedulerConfig:
+    """Scheduler configuration"""
+    mode: str = "poll"
+    poll_interval: float = 60
+    heap_horizon: float = 3600
+    batch_size: int = 500
+    drain: bool = False
+    lease_seconds: int = 300
+    instance_id: Optional[str] = None
+    catch_up: str = "once"
+    
+    def validate(self) -> bool:
+        """Validate scheduler configuration"""
+        if self.mode not in ("poll", "heap"):
+            raise ValueError("Scheduler mode must be 'poll' or 'heap'")
+        if self.poll_interval <= 0:
+            raise ValueError("Poll interval must be positive")
+        if self.heap_horizon <= 0:
+            raise ValueError("Heap horizon must be positive")
+        if self.batch_size <= 0:
+            raise ValueError("Batch size must be positive")
+        if self.lease_seconds <= 0:
+            raise ValueError("Lease must be positive")
+        if self.catch_up not in ("once", "summary"):
+            raise ValueError("Catch-up policy must be 'once' or 'summary'")
+        return True
+
+
+@dataclass
+class OutboxConfig:
+    """Notification outbox delivery configuration"""
+    enabled: bool = True
+    workers: int = 4
+    batch_size: int = 50
+    lease_seconds: int = 60
+    max_attempts: int = 5
+    
+    def validate(self) -> bool:
+        """Validate outbox configuration"""
+        if self.workers <= 0:
+            raise ValueError("Outbox workers must be positive")
+        if self.batch_size <= 0:
+            raise ValueError("Outbox batch size must be positive")
+        if self.lease_seconds <= 0:
+            raise ValueError("Outbox lease must be positive")
+        if self.max_attempts <= 0:
+            raise ValueError("Outbox max attempts must be positive")
+        return True
+
+
+@dataclass
+class MetricsConfig:
+    """Metrics export configuration"""
+    exporter: str = "log"
+    interval: float = 300
+    path: Optional[str] = None
+    
+    def validate(self) -> bool:
+        """Validate metrics configuration"""
+        if self.exporter not in ("log", "text"):
+            raise ValueError("Metrics exporter must be 'log' or 'text'")
+        if self.interval <= 0:
+            raise ValueError("Metrics interval must be positive")
         return True
 
 
@@ -125,6 +234,9 @@ class AppConfig:
     storage: StorageConfig = field(default_factory=StorageConfig)
     security: SecurityConfig = field(default_factory=SecurityConfig)
     notification: NotificationConfig = field(default_factory=NotificationConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    outbox: OutboxConfig = field(default_factory=OutboxConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
     
     def validate(self) -> bool:
         """Validate all configurations"""
@@ -134,7 +246,10 @@ class AppConfig:
             self.ai.validate() and
             self.storage.validate() and
             self.security.validate() and
-            self.notification.validate()
+            self.notification.validate() and
+            self.scheduler.validate() and
+            self.outbox.validate() and
+            self.metrics.validate()
         )
 
 
@@ -282,6 +397,24 @@ class ConfigManager:
                 if hasattr(app_config.notification, key):
                     setattr(app_config.notification, key, value)
         
+        # Update scheduler config
+        if "scheduler" in config_data:
+            for key, value in config_data["scheduler"].items():
+                if hasattr(app_config.scheduler, key):
+                    setattr(app_config.scheduler, key, value)
+        
+        # Update outbox config
+        if "outbox" in config_data:
+            for key, value in config_data["outbox"].items():
+                if hasattr(app_config.outbox, key):
+                    setattr(app_config.outbox, key, value)
+        
+        # Update metrics config
+        if "metrics" in config_data:
+            for key, value in config_data["metrics"].items():
+                if hasattr(app_config.metrics, key):
+                    setattr(app_config.metrics, key, value)
+        
         return app_config
     
     def save_config(self, config_path: str):
@@ -297,6 +430,13 @@ class ConfigManager:
                 "synchronous": self._config.database.synchronous,
                 "cache_size": self._config.database.cache_size,
                 "temp_store": self._config.database.temp_store,
+                "reader_pool_size": self._config.database.reader_pool_size,
+                "archive_path": self._config.database.archive_path,
+                "archive_retention_days": self._config.database.archive_retention_days,
+                "auto_vacuum": self._config.database.auto_vacuum,
+                "wal_limit_mb": self._config.database.wal_limit_mb,
+                "maintenance_interval": self._config.database.maintenance_interval,
+                "maintenance_time_budget": self._config.database.maintenance_time_budget,
             },
             "bot": {
                 "token": self._config.bot.token,
@@ -315,6 +455,11 @@ class ConfigManager:
             },
             "storage": {
                 "users_path": self._config.storage.users_path,
+                "backend": self._config.storage.backend,
+                "users_db_path": self._config.storage.users_db_path,
+                "cache_size": self._config.storage.cache_size,
+                "cache_ttl": self._config.storage.cache_ttl,
+                "cache_flush_interval": self._config.storage.cache_flush_interval,
                 "backup_enabled": self._config.storage.backup_enabled,
                 "backup_interval_hours": self._config.storage.backup_interval_hours,
                 "cleanup_old_backups": self._config.storage.cleanup_old_backups,
@@ -332,6 +477,33 @@ class ConfigManager:
                 "max_retries": self._config.notification.max_retries,
                 "retry_delay": self._config.notification.retry_delay,
                 "enable_silent_mode": self._config.notification.enable_silent_mode,
+                "global_rate": self._config.notification.global_rate,
+                "per_chat_rate": self._config.notification.per_chat_rate,
+                "per_chat_burst": self._config.notification.per_chat_burst,
+                "priority_lanes": self._config.notification.priority_lanes,
+                "lane_reserved": self._config.notification.lane_reserved,
+            },
+            "scheduler": {
+                "mode": self._config.scheduler.mode,
+                "poll_interval": self._config.scheduler.poll_interval,
+                "heap_horizon": self._config.scheduler.heap_horizon,
+                "batch_size": self._config.scheduler.batch_size,
+                "drain": self._config.scheduler.drain,
+                "lease_seconds": self._config.scheduler.lease_seconds,
+                "instance_id": self._config.scheduler.instance_id,
+                "catch_up": self._config.scheduler.catch_up,
+            },
+            "outbox": {
+                "enabled": self._config.outbox.enabled,
+                "workers": self._config.outbox.workers,
+                "batch_size": self._config.outbox.batch_size,
+                "lease_seconds": self._config.outbox.lease_seconds,
+                "max_attempts": self._config.outbox.max_attempts,
+            },
+            "metrics": {
+                "exporter": self._config.metrics.exporter,
+                "interval": self._config.metrics.interval,
+                "path": self._config.metrics.path,
             }
         }
         
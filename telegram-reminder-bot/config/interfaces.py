@@ -30,6 +30,11 @@ class IReminderStorage(ABC):
         """Add new reminder and return its ID"""
         pass
     
+    @abstractmethod
+    def add_many(self, user_id: int, reminders: List[Dict[str, Any]], status: str = "active") -> List[int]:
+        """Add several reminders in one transaction and return their IDs"""
+        pass
+    
     @abstractmethod
     def list(self, user_id: int, status: str = "active") -> List[Tuple]:
         """List reminders for user"""
@@ -39,6 +44,21 @@ class IReminderStorage(ABC):
     def update_status(self, reminder_id: int, status: str) -> bool:
         """Update reminder status"""
         pass
+
+    @abstractmethod
+    def get(self, reminder_id: int, user_id: int, status: Optional[str] = "active") -> Optional[Tuple]:
+        """Get one reminder owned by user"""
+        pass
+
+    @abstractmethod
+    def exists_for_user(self, reminder_id: int, user_id: int, status: Optional[str] = "active") -> bool:
+        """Check that user owns the reminder"""
+        pass
+
+    @abstractmethod
+    def cancel_for_user(self, reminder_id: int, user_id: int) -> int:
+        """Cancel a reminder owned by user and return the number of rows changed"""
+        pass
     
     @abstractmethod
     def update_time(self, reminder_id: int, new_time: str) -> bool:
@@ -56,13 +76,13 @@ class IReminderStorage(ABC):
         pass
     
     @abstractmethod
-    def get_stats(self, user_id: Optional[int] = None) -> Tuple:
+    def get_stats(self, user_id: Optional[int] = None) -> Dict[str, int]:
         """Get reminder statistics"""
         pass
     
     @abstractmethod
-    def cleanup_old_reminders(self, days_old: int = 30) -> int:
-        """Cleanup old reminders"""
+    def cleanup_old_reminders(self, days_old: int = 30, batch_size: int = 500, time_budget: float = 5.0) -> int:
+        """Archive finished reminders and purge old archived ones"""
         pass
     
     @abstractmethod
@@ -98,6 +118,26 @@ class IUserStorage(ABC):
     def get_user_language(self, user_id: int) -> str:
         """Get user's preferred language"""
         pass
+    
+    @abstractmethod
+    def user_ids(self, include_blocked: bool = False) -> List[int]:
+        """Ids of all known users, without those who blocked the bot unless include_blocked"""
+        pass
+    
+    @abstractmethod
+    def set_blocked(self, user_id: int, blocked: bool = True) -> None:
+        """Mark whether the user has blocked the bot"""
+        pass
+    
+    @abstractmethod
+    def delete_user(self, user_id: int) -> bool:
+        """Delete user data; returns False if the user was unknown"""
+        pass
+    
+    @abstractmethod
+    def find_user(self, username: str) -> Optional[int]:
+        """Id of the user with this Telegram username (with or without @), or None"""
+        pass
 
 
 class IRepeatHandler(ABC):
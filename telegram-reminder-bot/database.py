@@ -1,7 +1,12 @@
 import sqlite3
 import threading
 import datetime
+import calendar
+import json
 import os
+import re
+import time as _time
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
 from urllib.parse import urlparse
 
 
@@ -11,9 +16,139 @@ def _parse_tz(tz: str) -> datetime.timedelta:
     return datetime.timedelta(hours=sign * int(hours), minutes=sign * int(minutes))
 
 
+def _to_epoch(dt_utc: datetime.datetime) -> int:
+    return calendar.timegm(dt_utc.timetuple())
+
+
+def _from_epoch(epoch: int) -> datetime.datetime:
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=epoch)
+
+
+# Birthdays alert a week and three days ahead, as the old birthday_pre_* rows did
+BIRTHDAY_LEAD_TIMES = (7 * 86400, 3 * 86400)
+
+
+def _load_lead_times(value) -> Tuple[int, ...]:
+    """Lead times in seconds, largest first, from the JSON lead_times column"""
+    if not value:
+        return ()
+    try:
+        return tuple(sorted({int(lead) for lead in json.loads(value) if int(lead) > 0}, reverse=True))
+    except (ValueError, TypeError):
+        return ()
+
+
+def _next_trigger(occurs_at: int, lead_times: Sequence[int], after: int) -> Optional[int]:
+    """Earliest of the occurrence and its lead-time alerts that is later than after"""
+    later = [t for t in [occurs_at - lead for lead in lead_times] + [occurs_at] if t > after]
+    return min(later) if later else None
+
+
+def _is_yearly(repeat) -> bool:
+    if repeat == "yearly":
+        return True
+    try:
+        return json.loads(repeat).get("type") == "yearly"
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+def _claim_candidates(categories: int) -> str:
+    """Select of the ids claim_due leases, restricted to that many categories if any.
+
+    With a category list the planner prefers idx_status_due_at and filters
+    category row by row, so each category gets its own ordered range of
+    idx_active_category_due_at and the short ranges are merged.
+    """
+    if not categories:
+        return """select id from reminders
+                  where status='active'
+                  and due_at <= ?
+                  and (lease_until is null or lease_until <= ?)
+                  order by due_at asc, id asc
+                  limit ?"""
+    lane = """select * from (
+                  select id, due_at from reminders indexed by idx_active_category_due_at
+                  where status='active'
+                  and category=?
+                  and due_at <= ?
+                  and (lease_until is null or lease_until <= ?)
+                  order by due_at asc, id asc
+                  limit ?
+              )"""
+    return f"select id from ({' union all '.join([lane] * categories)}) order by due_at asc, id asc limit ?"
+
+
+# PRAGMA user_version once the one-shot data migrations in _migrate have run
+_SCHEMA_VERSION = 1
+
+
+# Content the scheduler used to give installment retries before parent_id existed
+_LEGACY_RETRY_CONTENT = re.compile(r"^Retry #(\d+) for reminder (\d+)$")
+
+
+# AUTOINCREMENT, so the id of a reminder moved to the archive is never handed out again
+_REMINDERS_TABLE = """
+    create table if not exists {name}(
+        id integer primary key autoincrement,
+        user_id integer,
+        category text,
+        content text,
+        time text,
+        timezone text,
+        repeat text,
+        status text,
+        due_at integer,
+        claimed_by text,
+        lease_until integer,
+        parent_id integer,
+        retry_count integer default 0,
+        lead_times text
+    )
+"""
+
+# Columns copied between reminders and reminders_archive
+_ARCHIVE_COLUMNS = "id, user_id, category, content, time, timezone, repeat, status, due_at, parent_id, retry_count, lead_times"
+
+
+class DueReminder(NamedTuple):
+    id: int
+    user_id: int
+    category: str
+    content: str
+    time: str  # local time
+    timezone: str
+    repeat: str
+    due_at: int  # next trigger: the occurrence or one of its lead-time alerts
+    occurs_at: Optional[int] = None  # the occurrence itself
+    lead_times: Tuple[int, ...] = ()
+
+
+class OutboxMessage(NamedTuple):
+    id: int
+    reminder_id: int
+    user_id: int
+    payload: str  # JSON rendered by the scheduler
+    attempts: int
+
+
 class Database:
-    def __init__(self, path_or_url: str):
+    """SQLite reminder store.
+
+    Active reminders live in the hot reminders table. Completed and cancelled
+    ones are moved to reminders_archive by cleanup_old_reminders, which lives
+    in a separate database file attached as "archive" when archive_path is set.
+    """
+
+    # wal_checkpoint modes, from least to most intrusive
+    CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+    def __init__(self, path_or_url: str, readonly: bool = False, archive_path: Optional[str] = None,
+                 auto_vacuum: Optional[str] = "INCREMENTAL", wal_size_limit: int = 64 * 1024 * 1024):
         self.lock = threading.Lock()
+        self.readonly = readonly
+        self.archive_path = archive_path
+        self._time_listeners: List[Callable[[int, datetime.datetime], None]] = []
         
         if path_or_url.startswith(('sqlite:///', 'sqlite://')):
             parsed = urlparse(path_or_url)
@@ -33,18 +168,54 @@ class Database:
         if db_path and os.path.dirname(db_path):
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
+        self.db_path = db_path
         self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30.0)
+        if auto_vacuum and not readonly:
+            # Only takes effect on a new file, so it has to come before journal_mode writes the header
+            self.conn.execute(f"PRAGMA auto_vacuum={auto_vacuum}")
         self.conn.execute("PRAGMA journal_mode=WAL")
+        # A checkpoint that resets the WAL also truncates it back to this size
+        self.conn.execute(f"PRAGMA journal_size_limit={int(wal_size_limit)}")
         self.conn.execute("PRAGMA synchronous=NORMAL")
         self.conn.execute("PRAGMA cache_size=10000")
         self.conn.execute("PRAGMA temp_store=MEMORY")
-        self._create_tables()
+        self.archive_table = "reminders_archive"
+        if archive_path:
+            if os.path.dirname(archive_path):
+                os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            self.conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            if auto_vacuum and not readonly:
+                self.conn.execute(f"PRAGMA archive.auto_vacuum={auto_vacuum}")
+            self.conn.execute("PRAGMA archive.journal_mode=WAL")
+            self.conn.execute(f"PRAGMA archive.journal_size_limit={int(wal_size_limit)}")
+            self.archive_table = "archive.reminders_archive"
+        if readonly:
+            # Reader connections rely on the writer having created the schema
+            self.conn.execute("PRAGMA query_only=ON")
+        else:
+            self._create_tables()
 
     def _create_tables(self):
         with self.conn:
+            self.conn.execute(_REMINDERS_TABLE.format(name="reminders"))
             self.conn.execute(
                 """
-                create table if not exists reminders(
+                create table if not exists outbox(
+                    id integer primary key,
+                    reminder_id integer,
+                    user_id integer,
+                    payload text,
+                    priority integer default 0,
+                    state text default 'pending',
+                    attempts integer default 0,
+                    next_attempt_at integer,
+                    last_error text
+                )
+                """
+            )
+            self.conn.execute(
+                f"""
+                create table if not exists {self.archive_table}(
                     id integer primary key,
                     user_id integer,
                     category text,
@@ -52,217 +223,918 @@ class Database:
                     time text,
                     timezone text,
                     repeat text,
-                    status text
+                    status text,
+                    due_at integer,
+                    parent_id integer,
+                    retry_count integer default 0,
+                    lead_times text,
+                    archived_at integer
                 )
                 """
             )
+            self._migrate()
             self._create_indexes()
+            self._create_stats_counters()
+
+    def _columns(self, table):
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+
+    def _migrate(self):
+        columns = self._columns("reminders")
+        if "due_at" not in columns:
+            self.conn.execute("alter table reminders add column due_at integer")
+        if "claimed_by" not in columns:
+            self.conn.execute("alter table reminders add column claimed_by text")
+        if "lease_until" not in columns:
+            self.conn.execute("alter table reminders add column lease_until integer")
+        if "parent_id" not in columns:
+            self.conn.execute("alter table reminders add column parent_id integer")
+            self.conn.execute("alter table reminders add column retry_count integer default 0")
+            self._link_legacy_retries()
+        if "lead_times" not in columns:
+            self.conn.execute("alter table reminders add column lead_times text")
+            self._collapse_birthday_alerts()
+        if "priority" not in self._columns("outbox"):
+            self.conn.execute("alter table outbox add column priority integer default 0")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Backfill the epoch column from the legacy '%Y-%m-%d %H:%M' UTC text
+            self.conn.execute(
+                "update reminders set due_at = cast(strftime('%s', time) as integer) where due_at is null and time is not null"
+            )
+        self.conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        self._use_autoincrement()
     
+    def _use_autoincrement(self):
+        """Rebuild a reminders table created without AUTOINCREMENT.
+
+        Plain rowids restart at max(id) + 1, which reuses the ids of the newest
+        reminders once they are archived. Indexes and stats triggers go with the
+        old table and are recreated by _create_indexes/_create_stats_counters.
+        """
+        sql = self.conn.execute("select sql from sqlite_master where type='table' and name='reminders'").fetchone()[0]
+        if "autoincrement" in sql.lower():
+            return
+        for trigger in ("trg_stats_insert", "trg_stats_delete", "trg_stats_update"):
+            self.conn.execute(f"drop trigger if exists {trigger}")
+        self.conn.execute(_REMINDERS_TABLE.format(name="reminders_rebuild"))
+        columns = ", ".join(sorted(self._columns("reminders") & self._columns("reminders_rebuild")))
+        self.conn.execute(f"insert into reminders_rebuild({columns}) select {columns} from reminders")
+        self.conn.execute("drop table reminders")
+        self.conn.execute("alter table reminders_rebuild rename to reminders")
+        seq = self.conn.execute(
+            f"select max(coalesce((select max(id) from reminders), 0), coalesce((select max(id) from {self.archive_table}), 0))"
+        ).fetchone()[0]
+        self.conn.execute("delete from sqlite_sequence where name='reminders'")
+        self.conn.execute("insert into sqlite_sequence(name, seq) values('reminders', ?)", (seq,))
+
+    def _link_legacy_retries(self):
+        """Point existing installment_retry rows at their parent, recovered from the content text"""
+        rows = self.conn.execute(
+            "select id, content from reminders where category='installment_retry' and parent_id is null"
+        ).fetchall()
+        for rid, content in rows:
+            match = _LEGACY_RETRY_CONTENT.match(content or "")
+            if not match:
+                continue
+            retry_count, parent_id = int(match.group(1)), int(match.group(2))
+            self.conn.execute(
+                """
+                update reminders set parent_id=?, retry_count=?,
+                    content=coalesce((select content from reminders where id=?), content)
+                where id=?
+                """,
+                (parent_id, retry_count, parent_id, rid)
+            )
+
+    def _collapse_birthday_alerts(self):
+        """Fold legacy birthday_pre_week/birthday_pre_three rows into lead_times on their birthday"""
+        lead_times = json.dumps(list(BIRTHDAY_LEAD_TIMES))
+        now = _to_epoch(datetime.datetime.utcnow())
+        rows = self.conn.execute(
+            """
+            select b.id, b.time from reminders b
+            where b.category='birthday' and b.status='active' and exists (
+                select 1 from reminders p
+                where p.category in ('birthday_pre_week', 'birthday_pre_three')
+                and p.user_id=b.user_id and p.content=b.content and p.timezone=b.timezone
+            )
+            """
+        ).fetchall()
+        for rid, time_utc in rows:
+            try:
+                occurs_at = _to_epoch(datetime.datetime.strptime(time_utc, "%Y-%m-%d %H:%M"))
+            except (ValueError, TypeError):
+                continue
+            due_at = _next_trigger(occurs_at, BIRTHDAY_LEAD_TIMES, now) or occurs_at
+            self.conn.execute(
+                "update reminders set lead_times=?, due_at=? where id=?", (lead_times, due_at, rid)
+            )
+            self.conn.execute(
+                """
+                delete from reminders
+                where category in ('birthday_pre_week', 'birthday_pre_three')
+                and user_id=(select user_id from reminders where id=?)
+                and content=(select content from reminders where id=?)
+                and timezone=(select timezone from reminders where id=?)
+                """,
+                (rid, rid, rid)
+            )
+
     def _create_indexes(self):
         with self.conn:
+            # Text-time indexes are superseded by due_at; datetime(time) could never use them
+            for legacy in ("idx_status_time", "idx_due_reminders"):
+                self.conn.execute(f"DROP INDEX IF EXISTS {legacy}")
             indexes = [
                 "CREATE INDEX IF NOT EXISTS idx_user_status ON reminders(user_id, status)",
-                "CREATE INDEX IF NOT EXISTS idx_status_time ON reminders(status, time)",
+                "CREATE INDEX IF NOT EXISTS idx_status_due_at ON reminders(status, due_at)",
                 "CREATE INDEX IF NOT EXISTS idx_user_id ON reminders(user_id)",
-                "CREATE INDEX IF NOT EXISTS idx_due_reminders ON reminders(status, time) WHERE status='active'"
+                "CREATE INDEX IF NOT EXISTS idx_active_due_at ON reminders(due_at) WHERE status='active'",
+                "CREATE INDEX IF NOT EXISTS idx_active_category_due_at ON reminders(category, due_at) WHERE status='active'",
+                "CREATE INDEX IF NOT EXISTS idx_outbox_claim ON outbox(state, next_attempt_at)",
+                "CREATE INDEX IF NOT EXISTS idx_parent_status ON reminders(parent_id, status) WHERE parent_id IS NOT NULL"
+            ]
+            schema = self.archive_table[:-len("reminders_archive")]
+            indexes += [
+                f"CREATE INDEX IF NOT EXISTS {schema}idx_archive_user_status ON reminders_archive(user_id, status)",
+                f"CREATE INDEX IF NOT EXISTS {schema}idx_archive_due_at ON reminders_archive(due_at)",
+                f"CREATE INDEX IF NOT EXISTS {schema}idx_archive_user_id ON reminders_archive(user_id)",
             ]
             for index in indexes:
                 self.conn.execute(index)
 
-    def add(self, user_id, category, content, time, timezone, repeat, status="active"):
+    def _create_stats_counters(self):
+        """Counters behind get_stats/get_admin_stats, kept current by triggers on reminders.
+
+        Rows are (scope, key, status) -> count for the 'global', 'user' and
+        'category' scopes. Users also get a 'live' row counting reminders that
+        are not cancelled, and ('users', '', '') counts distinct users.
+
+        Archived reminders keep being counted until purge_archive drops them,
+        except in ('users', '', ''), which only counts users with hot rows.
+        """
+        with self.conn:
+            exists = self.conn.execute(
+                "select 1 from sqlite_master where type='table' and name='stats_counters'"
+            ).fetchone()
+            self.conn.execute(
+                """
+                create table if not exists stats_counters(
+                    scope text not null,
+                    key text not null,
+                    status text not null,
+                    count integer not null default 0,
+                    primary key (scope, key, status)
+                ) without rowid
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_stats_rank ON stats_counters(scope, status, count)"
+            )
+            bump = """
+                insert into stats_counters(scope, key, status, count)
+                values ('global', '', coalesce({r}.status, ''), {d}),
+                       ('user', coalesce({r}.user_id, ''), coalesce({r}.status, ''), {d}),
+                       ('category', coalesce({r}.category, ''), coalesce({r}.status, ''), {d})
+                on conflict(scope, key, status) do update set count = count + {d};
+                insert into stats_counters(scope, key, status, count)
+                select 'user', coalesce({r}.user_id, ''), 'live', {d} where {r}.status is not 'cancelled'
+                on conflict(scope, key, status) do update set count = count + {d};
+            """
+            self.conn.executescript(f"""
+                create trigger if not exists trg_stats_insert after insert on reminders
+                begin
+                    {bump.format(r='new', d='1')}
+                    insert into stats_counters(scope, key, status, count)
+                    select 'users', '', '', 1
+                    where not exists (select 1 from reminders where user_id=new.user_id and id!=new.id)
+                    on conflict(scope, key, status) do update set count = count + 1;
+                end;
+                create trigger if not exists trg_stats_delete after delete on reminders
+                begin
+                    {bump.format(r='old', d='-1')}
+                    update stats_counters set count = count - 1
+                    where scope='users' and key='' and status=''
+                    and not exists (select 1 from reminders where user_id=old.user_id);
+                end;
+                create trigger if not exists trg_stats_update after update of status, category on reminders
+                when old.status is not new.status or old.category is not new.category
+                begin
+                    {bump.format(r='old', d='-1')}
+                    {bump.format(r='new', d='1')}
+                end;
+            """)
+        if not exists:
+            self.reconcile_stats()
+
+    def add_time_listener(self, callback: Callable[[int, datetime.datetime], None]):
+        """Register a callback invoked with (reminder_id, utc_time) whenever a deadline is written"""
+        self._time_listeners.append(callback)
+
+    def remove_time_listener(self, callback: Callable[[int, datetime.datetime], None]):
+        if callback in self._time_listeners:
+            self._time_listeners.remove(callback)
+
+    def _notify_time(self, deadlines: List[Tuple[int, datetime.datetime]]):
+        for callback in list(self._time_listeners):
+            for rid, dt_utc in deadlines:
+                try:
+                    callback(rid, dt_utc)
+                except Exception:
+                    continue
+
+    def add(self, user_id, category, content, time, timezone, repeat, status="active", lead_times=None):
+        """Insert a reminder; lead_times are seconds before each occurrence to alert in advance.
+
+        Yearly birthdays default to BIRTHDAY_LEAD_TIMES.
+        """
+        if lead_times is None and category == "birthday" and _is_yearly(repeat):
+            lead_times = BIRTHDAY_LEAD_TIMES
+        lead_times = tuple(sorted({int(lead) for lead in lead_times or () if int(lead) > 0}, reverse=True))
         with self.lock, self.conn:
             dt_local = datetime.datetime.strptime(time, "%Y-%m-%d %H:%M")
             dt_utc = dt_local - _parse_tz(timezone)
             time_utc = dt_utc.strftime("%Y-%m-%d %H:%M")
+            occurs_at = _to_epoch(dt_utc)
+            due_at = _next_trigger(occurs_at, lead_times, _to_epoch(datetime.datetime.utcnow())) or occurs_at
 
-            self.conn.execute(
-                "insert into reminders(user_id,category,content,time,timezone,repeat,status) values(?,?,?,?,?,?,?)",
-                (user_id, category, content, time_utc, timezone, repeat, status),
+            cur = self.conn.execute(
+                "insert into reminders(user_id,category,content,time,timezone,repeat,status,due_at,lead_times) "
+                "values(?,?,?,?,?,?,?,?,?)",
+                (user_id, category, content, time_utc, timezone, repeat, status, due_at,
+                 json.dumps(list(lead_times)) if lead_times else None),
             )
-            if category == "birthday" and repeat == "yearly":
-                week_before = dt_local - datetime.timedelta(days=7)
-                week_before_utc = week_before - _parse_tz(timezone)
-                self.conn.execute(
-                    "insert into reminders(user_id,category,content,time,timezone,repeat,status) values(?,?,?,?,?,?,?)",
-                    (user_id, "birthday_pre_week", content,
-                     week_before_utc.strftime("%Y-%m-%d %H:%M"), timezone, "yearly", status),
-                )
-                three_days_before = dt_local - datetime.timedelta(days=3)
-                three_days_before_utc = three_days_before - _parse_tz(timezone)
-                self.conn.execute(
-                    "insert into reminders(user_id,category,content,time,timezone,repeat,status) values(?,?,?,?,?,?,?)",
-                    (user_id, "birthday_pre_three", content,
-                     three_days_before_utc.strftime("%Y-%m-%d %H:%M"), timezone, "yearly", status),
-                )
+            reminder_id = cur.lastrowid
+        if status == "active":
+            self._notify_time([(reminder_id, _from_epoch(due_at))])
+        return reminder_id
+
+    def add_many(self, user_id, reminders, status="active") -> List[int]:
+        """Insert several reminders of one user in a single transaction; returns their ids in order.
+
+        Each reminder is a mapping with category, content, time (local),
+        timezone and repeat, plus optional lead_times as in add.
+        """
+        offsets = {}
+        now = _to_epoch(datetime.datetime.utcnow())
+        rows = []
+        for reminder in reminders:
+            category, repeat, tz = reminder["category"], reminder["repeat"], reminder["timezone"]
+            lead_times = reminder.get("lead_times")
+            if lead_times is None and category == "birthday" and _is_yearly(repeat):
+                lead_times = BIRTHDAY_LEAD_TIMES
+            lead_times = tuple(sorted({int(lead) for lead in lead_times or () if int(lead) > 0}, reverse=True))
+            if tz not in offsets:
+                offsets[tz] = _parse_tz(tz)
+            dt_utc = datetime.datetime.strptime(reminder["time"], "%Y-%m-%d %H:%M") - offsets[tz]
+            occurs_at = _to_epoch(dt_utc)
+            rows.append((
+                user_id, category, reminder["content"], dt_utc.strftime("%Y-%m-%d %H:%M"), tz, repeat, status,
+                _next_trigger(occurs_at, lead_times, now) or occurs_at,
+                json.dumps(list(lead_times)) if lead_times else None
+            ))
+        if not rows:
+            return []
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "insert into reminders(user_id,category,content,time,timezone,repeat,status,due_at,lead_times) "
+                "values(?,?,?,?,?,?,?,?,?)",
+                rows
+            )
+            # AUTOINCREMENT ids of one transaction on the write lock are consecutive
+            last = self.conn.execute("select last_insert_rowid()").fetchone()[0]
+        ids = list(range(last - len(rows) + 1, last + 1))
+        if status == "active":
+            self._notify_time([(rid, _from_epoch(row[7])) for rid, row in zip(ids, rows)])
+        return ids
 
     def list(self, user_id, status="active"):
+        query = "select id,category,content,time,timezone,repeat,status from reminders where user_id=? and status=?"
+        params = (user_id, status)
+        if status != "active":
+            # Finished reminders may already have been archived
+            query += (
+                f" union all select id,category,content,time,timezone,repeat,status from {self.archive_table}"
+                " where user_id=? and status=? order by id"
+            )
+            params += (user_id, status)
         with self.lock:
             cur = self.conn.cursor()
-            cur.execute(
-                "select id,category,content,time,timezone,repeat,status from reminders where user_id=? and status=?",
-                (user_id, status),
-            )
+            cur.execute(query, params)
             rows = cur.fetchall()
             cur.close()
+            return [self._local_row(row) for row in rows]
 
-            result = []
-            for row in rows:
-                rid, cat, content, time_utc, tz, repeat, status_val = row
-                try:
-                    dt_utc = datetime.datetime.strptime(time_utc, "%Y-%m-%d %H:%M")
-                    dt_local = dt_utc + _parse_tz(tz)
-                    time_local = dt_local.strftime("%Y-%m-%d %H:%M")
-                    result.append((rid, cat, content, time_local, tz, repeat, status_val))
-                except (ValueError, TypeError):
-                    result.append(row)
-            return result
-
-    def update_status(self, reminder_id, status):
+    def export_page(self, user_id, after_id=0, limit=500, archived=False):
+        """Up to limit reminders of user_id with id > after_id, in id order, as stored (UTC time).
+
+        Rows are (id, category, content, time, timezone, repeat, status). Pass
+        the last id back as after_id for the next page; archived=True pages
+        through the archive instead of the hot table.
+        """
+        table = self.archive_table if archived else "reminders"
+        with self.lock:
+            return self.conn.execute(
+                f"select id,category,content,time,timezone,repeat,status from {table} "
+                "where user_id=? and id>? order by id limit ?",
+                (user_id, after_id, limit)
+            ).fetchall()
+
+    @staticmethod
+    def _local_row(row):
+        """(id, category, content, local time, timezone, repeat, status) from a stored row"""
+        rid, cat, content, time_utc, tz, repeat, status_val = row
+        try:
+            dt_utc = datetime.datetime.strptime(time_utc, "%Y-%m-%d %H:%M")
+            time_local = (dt_utc + _parse_tz(tz)).strftime("%Y-%m-%d %H:%M")
+            return (rid, cat, content, time_local, tz, repeat, status_val)
+        except (ValueError, TypeError):
+            return row
+
+    def get(self, reminder_id, user_id, status="active"):
+        """One reminder of user_id in the same shape as list(), or None; status=None matches any status"""
+        with self.lock:
+            row = self.conn.execute(
+                "select id,category,content,time,timezone,repeat,status from reminders "
+                "where id=? and user_id=? and (? is null or status=?)",
+                (reminder_id, user_id, status, status)
+            ).fetchone()
+            return self._local_row(row) if row else None
+
+    def exists_for_user(self, reminder_id, user_id, status="active") -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "select 1 from reminders where id=? and user_id=? and (? is null or status=?)",
+                (reminder_id, user_id, status, status)
+            ).fetchone()
+            return row is not None
+
+    def cancel_for_user(self, reminder_id, user_id) -> int:
+        """Cancel an active reminder only if user_id owns it; returns the number of rows changed.
+
+        Pending follow-ups of the reminder are cancelled with it, as deleting an
+        installment stops its retries.
+        """
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "update reminders set status='cancelled' where id=? and user_id=? and status='active'",
+                (reminder_id, user_id)
+            )
+            changed = cur.rowcount
+            if changed:
+                changed += self.conn.execute(
+                    "update reminders set status='cancelled' where parent_id=? and status='active'", (reminder_id,)
+                ).rowcount
+            return changed
+
+    def ping(self):
+        with self.lock:
+            self.conn.execute("SELECT 1")
+        return True
+
+    def get_timezone(self, reminder_id):
+        with self.lock:
+            row = self.conn.execute("select timezone from reminders where id=?", (reminder_id,)).fetchone()
+            return row[0] if row else None
+
+    def add_follow_up(self, parent_id, category, time, retry_count=1, source_id=None) -> Optional[int]:
+        """Queue a one-time follow-up of parent_id, e.g. an unpaid installment retry.
+
+        time is local to the reminder's timezone. User, content and timezone are
+        copied from source_id, the previous follow-up of the chain, or else from
+        the parent, which may already be finished or archived. The parent's status
+        does not matter: paying or stopping ends a chain by cancelling its pending
+        follow-up. Returns None only if the source reminder does not exist.
+        """
+        source = source_id or parent_id
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                f"""
+                select user_id, content, timezone from reminders where id=?
+                union all
+                select user_id, content, timezone from {self.archive_table} where id=?
+                limit 1
+                """,
+                (source, source)
+            ).fetchone()
+            if row is None:
+                return None
+            user_id, content, timezone = row
+            dt_utc = datetime.datetime.strptime(time, "%Y-%m-%d %H:%M") - _parse_tz(timezone)
+            cur = self.conn.execute(
+                """
+                insert into reminders(user_id,category,content,time,timezone,repeat,status,due_at,parent_id,retry_count)
+                values(?, ?, ?, ?, ?, '{"type": "none"}', 'active', ?, ?, ?)
+                """,
+                (user_id, category, content, dt_utc.strftime("%Y-%m-%d %H:%M"), timezone, _to_epoch(dt_utc),
+                 parent_id, retry_count)
+            )
+            follow_up_id = cur.lastrowid
+        self._notify_time([(follow_up_id, dt_utc)])
+        return follow_up_id
+
+    def follow_up_of(self, reminder_id) -> Optional[Tuple[int, int]]:
+        """(parent_id, retry_count) if reminder_id is a follow-up, else None"""
+        with self.lock:
+            row = self.conn.execute(
+                "select parent_id, retry_count from reminders where id=? and parent_id is not null", (reminder_id,)
+            ).fetchone()
+            return (row[0], row[1]) if row else None
+
+    def count_follow_ups(self, parent_id, status="active") -> int:
+        with self.lock:
+            row = self.conn.execute(
+                "select count(*) from reminders where parent_id=? and status=?", (parent_id, status)
+            ).fetchone()
+            return row[0] if row else 0
+
+    def cancel_follow_ups(self, parent_id) -> int:
+        """Cancel the pending follow-ups of parent_id"""
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "update reminders set status='cancelled' where parent_id=? and status='active'", (parent_id,)
+            )
+            return cur.rowcount
+
+    def update_status(self, reminder_id, status) -> Optional[Tuple[int, str]]:
+        """Set the status; returns (user_id, previous status), or None if there is no such reminder"""
         with self.lock, self.conn:
+            row = self.conn.execute("select user_id, status from reminders where id=?", (reminder_id,)).fetchone()
             self.conn.execute("update reminders set status=? where id=?", (status, reminder_id))
+            return (row[0], row[1]) if row else None
 
     def update_time(self, reminder_id, new_time):
+        dt_utc = None
         with self.lock, self.conn:
             cur = self.conn.cursor()
-            cur.execute("select timezone from reminders where id=?", (reminder_id,))
+            cur.execute("select timezone, lead_times from reminders where id=?", (reminder_id,))
             row = cur.fetchone()
             cur.close()
 
             if row:
-                tz = row[0]
+                tz, lead_times = row
                 dt_local = datetime.datetime.strptime(new_time, "%Y-%m-%d %H:%M")
-                dt_utc = dt_local - _parse_tz(tz)
-                time_utc = dt_utc.strftime("%Y-%m-%d %H:%M")
-                self.conn.execute("update reminders set time=? where id=?", (time_utc, reminder_id))
+                occurs_at = _to_epoch(dt_local - _parse_tz(tz))
+                due_at = self._first_trigger(occurs_at, lead_times)
+                dt_utc = _from_epoch(due_at)
+                self.conn.execute(
+                    "update reminders set time=?, due_at=? where id=?",
+                    (_from_epoch(occurs_at).strftime("%Y-%m-%d %H:%M"), due_at, reminder_id)
+                )
             else:
                 self.conn.execute("update reminders set time=? where id=?", (new_time, reminder_id))
+        if dt_utc:
+            self._notify_time([(reminder_id, dt_utc)])
+
+    @staticmethod
+    def _first_trigger(occurs_at: int, lead_times) -> int:
+        """due_at for a reminder whose occurrence was just set"""
+        now = _to_epoch(datetime.datetime.utcnow())
+        return _next_trigger(occurs_at, _load_lead_times(lead_times), now) or occurs_at
     
+    def commit_tick(self, completed=(), rescheduled=None, cancelled=(), notifications=(), owner=None):
+        """Apply a scheduler tick's outcomes in a single transaction; returns how many reminders changed.
+
+        rescheduled maps reminder id to (new local time, timezone), optionally followed by
+        the due_at of its next lead-time alert when that comes before the new time.
+        notifications are (reminder_id, user_id, payload, priority) rows queued in the outbox
+        together with the state change, so a crash can neither lose nor repeat them.
+
+        With owner, only reminders still leased to owner change and only their
+        notifications are queued. A tick that outlived its lease leaves the rows
+        to the instance that claimed them again instead of sending twice.
+        """
+        leased = " and claimed_by=?" if owner else ""
+        lease = (owner,) if owner else ()
+        rows = []
+        for reminder_id, (new_time, tz, *next_trigger) in (rescheduled or {}).items():
+            dt_utc = datetime.datetime.strptime(new_time, "%Y-%m-%d %H:%M") - _parse_tz(tz)
+            due_at = next_trigger[0] if next_trigger else _to_epoch(dt_utc)
+            rows.append((dt_utc.strftime("%Y-%m-%d %H:%M"), due_at, reminder_id))
+
+        applied = set()
+        deadlines = []
+        with self.lock, self.conn:
+            for status, ids in (("completed", completed), ("cancelled", cancelled)):
+                for rid in ids:
+                    if self.conn.execute(
+                        f"update reminders set status=?, claimed_by=null, lease_until=null where id=?{leased}",
+                        (status, rid, *lease)
+                    ).rowcount:
+                        applied.add(rid)
+            for time_utc, due_at, rid in rows:
+                if self.conn.execute(
+                    f"update reminders set time=?, due_at=?, claimed_by=null, lease_until=null where id=?{leased}",
+                    (time_utc, due_at, rid, *lease)
+                ).rowcount:
+                    applied.add(rid)
+                    deadlines.append((rid, _from_epoch(due_at)))
+            if owner:
+                notifications = [n for n in notifications if n[0] in applied]
+            if notifications:
+                now = _to_epoch(datetime.datetime.utcnow())
+                self.conn.executemany(
+                    "insert into outbox(reminder_id,user_id,payload,priority,state,next_attempt_at) values(?,?,?,?,'pending',?)",
+                    [(rid, uid, payload, priority, now) for rid, uid, payload, priority in notifications]
+                )
+        self._notify_time(deadlines)
+        return len(applied)
+
+    def claim_outbox(self, now_utc: datetime.datetime, lease_seconds=60, limit=100) -> List[OutboxMessage]:
+        """Lease up to limit deliverable messages, lowest priority value first.
+
+        Claimed rows move to 'sending' with next_attempt_at as the lease expiry, so
+        messages held by a worker that died become claimable again.
+        """
+        now = _to_epoch(now_utc)
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                """
+                update outbox set state='sending', attempts=attempts+1, next_attempt_at=?
+                where id in (
+                    select id from outbox
+                    where state in ('pending', 'sending') and next_attempt_at <= ?
+                    order by priority, next_attempt_at, id limit ?
+                )
+                returning id, reminder_id, user_id, payload, attempts
+                """,
+                (now + lease_seconds, now, limit)
+            ).fetchall()
+        return [OutboxMessage(*row) for row in sorted(rows)]
+
+    def ack_outbox(self, message_ids):
+        with self.lock, self.conn:
+            self.conn.executemany("delete from outbox where id=?", [(mid,) for mid in message_ids])
+
+    def renew_outbox(self, message_id, attempts, now_utc: datetime.datetime, lease_seconds=60) -> bool:
+        """Extend the lease on a claimed message; False when it was claimed again since.
+
+        Every claim bumps attempts, so (message_id, attempts) names one claim.
+        """
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "update outbox set next_attempt_at=? where id=? and attempts=? and state='sending'",
+                (_to_epoch(now_utc) + lease_seconds, message_id, attempts)
+            ).rowcount > 0
+
+    def fail_outbox(self, message_id, error, retry_at: Optional[datetime.datetime] = None):
+        """Schedule another attempt at retry_at, or mark the message dead when retry_at is None.
+
+        Dead messages keep the time they died in next_attempt_at for purge_dead_outbox.
+        """
+        with self.lock, self.conn:
+            if retry_at is None:
+                self.conn.execute(
+                    "update outbox set state='dead', next_attempt_at=?, last_error=? where id=?",
+                    (_to_epoch(datetime.datetime.utcnow()), str(error)[:500], message_id)
+                )
+            else:
+                self.conn.execute(
+                    "update outbox set state='pending', next_attempt_at=?, last_error=? where id=?",
+                    (_to_epoch(retry_at), str(error)[:500], message_id)
+                )
+
     def update_reminder(self, reminder_id, category, content, time, timezone, repeat):
         with self.lock, self.conn:
             dt_local = datetime.datetime.strptime(time, "%Y-%m-%d %H:%M")
             dt_utc = dt_local - _parse_tz(timezone)
             time_utc = dt_utc.strftime("%Y-%m-%d %H:%M")
+            row = self.conn.execute("select lead_times from reminders where id=?", (reminder_id,)).fetchone()
+            due_at = self._first_trigger(_to_epoch(dt_utc), row[0] if row else None)
 
             self.conn.execute(
-                "update reminders set category=?, content=?, time=?, timezone=?, repeat=? where id=?",
-                (category, content, time_utc, timezone, repeat, reminder_id)
+                "update reminders set category=?, content=?, time=?, timezone=?, repeat=?, due_at=? where id=?",
+                (category, content, time_utc, timezone, repeat, due_at, reminder_id)
             )
+        self._notify_time([(reminder_id, _from_epoch(due_at))])
+
+    def due(self, now_utc: datetime.datetime, limit=1000, after: Optional[Tuple[int, int]] = None) -> List[DueReminder]:
+        """Return active reminders due by now_utc ordered by (due_at, id).
+
+        Pass the (due_at, id) of the last row seen as after to fetch the next keyset page.
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            if after is None:
+                cur.execute(
+                    """select id,user_id,category,content,time,timezone,repeat,due_at,lead_times
+                       from reminders
+                       where status='active'
+                       and due_at <= ?
+                       order by due_at asc, id asc
+                       limit ?""",
+                    (_to_epoch(now_utc), limit)
+                )
+            else:
+                cur.execute(
+                    """select id,user_id,category,content,time,timezone,repeat,due_at,lead_times
+                       from reminders
+                       where status='active'
+                       and due_at <= ?
+                       and (due_at, id) > (?, ?)
+                       order by due_at asc, id asc
+                       limit ?""",
+                    (_to_epoch(now_utc), after[0], after[1], limit)
+                )
+            items = self._due_items(cur.fetchall())
+            cur.close()
+            return items
+
+    def claim_due(self, now_utc: datetime.datetime, owner: str, lease_seconds=300, limit=1000,
+                  categories: Optional[Sequence[str]] = None) -> List[DueReminder]:
+        """Atomically lease up to limit due reminders to owner, optionally only the given categories.
 
-    def due(self, now_utc: datetime.datetime, limit=1000):
+        Reminders leased by another scheduler are skipped until their lease expires,
+        so instances sharing the database claim disjoint batches. commit_tick releases
+        the lease; if the owner dies first, the reminder becomes claimable again.
+        """
+        now = _to_epoch(now_utc)
+        params = [owner, now + lease_seconds]
+        if categories:
+            for category in categories:
+                params.extend([category, now, now, limit])
+        else:
+            params.extend([now, now])
+        params.append(limit)
+        with self.lock:
+            # IMMEDIATE takes the write lock up front so concurrent claimers serialize
+            # instead of failing to upgrade a stale WAL read snapshot
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    f"""update reminders set claimed_by=?, lease_until=?
+                       where id in ({_claim_candidates(len(categories or ()))})
+                       returning id,user_id,category,content,time,timezone,repeat,due_at,lead_times""",
+                    params
+                ).fetchall()
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        rows.sort(key=lambda row: (row[7], row[0]))
+        return self._due_items(rows)
+
+    def _due_items(self, rows) -> List[DueReminder]:
+        items = []
+        for rid, uid, cat, content, time_utc_str, tz, repeat, due_at, lead_times in rows:
+            try:
+                dt_utc = datetime.datetime.strptime(time_utc_str, "%Y-%m-%d %H:%M")
+                dt_local = dt_utc + _parse_tz(tz)
+                time_local_str = dt_local.strftime("%Y-%m-%d %H:%M")
+                items.append(DueReminder(rid, uid, cat, content, time_local_str, tz, repeat, due_at,
+                                         _to_epoch(dt_utc), _load_lead_times(lead_times)))
+            except (ValueError, TypeError):
+                continue
+        return items
+
+    def upcoming(self, until_utc: datetime.datetime, limit=10000):
+        """Return (utc_time, id) pairs of active reminders due no later than until_utc"""
         with self.lock:
             cur = self.conn.cursor()
             cur.execute(
-                """select id,user_id,category,content,time,timezone,repeat
+                """select id, due_at
                    from reminders
                    where status='active'
-                   and datetime(time) <= datetime(?)
-                   order by time asc
+                   and due_at <= ?
+                   order by due_at asc
                    limit ?""",
-                (now_utc.strftime("%Y-%m-%d %H:%M"), limit)
+                (_to_epoch(until_utc), limit)
             )
-            items = []
-            for rid, uid, cat, content, time_utc_str, tz, repeat in cur.fetchall():
-                try:
-                    dt_utc = datetime.datetime.strptime(time_utc_str, "%Y-%m-%d %H:%M")
-                    if dt_utc <= now_utc:
-                        dt_local = dt_utc + _parse_tz(tz)
-                        time_local_str = dt_local.strftime("%Y-%m-%d %H:%M")
-                        items.append((rid, uid, cat, content, time_local_str, tz, repeat))
-                except (ValueError, TypeError):
-                    continue
+            items = [(_from_epoch(due_at), rid) for rid, due_at in cur.fetchall()]
             cur.close()
             return items
 
-    def cleanup_old_reminders(self, days_old=30):
+    def next_claimable(self, now_utc: datetime.datetime) -> Optional[datetime.datetime]:
+        """When the earliest reminder that is already due can be claimed, or None if none is due"""
         with self.lock:
-            cutoff_date = datetime.datetime.utcnow() - datetime.timedelta(days=days_old)
-            cur = self.conn.cursor()
-            cur.execute(
-                "delete from reminders where status in ('completed', 'cancelled') and datetime(time) < datetime(?)",
-                (cutoff_date.strftime("%Y-%m-%d %H:%M"),)
+            row = self.conn.execute(
+                "select min(coalesce(lease_until, 0)) from reminders where status='active' and due_at <= ?",
+                (_to_epoch(now_utc),)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(_from_epoch(row[0]), now_utc)
+
+    def cleanup_old_reminders(self, days_old=30, batch_size=500, time_budget=5.0):
+        """Archive finished reminders, then purge archived ones due more than days_old ago.
+
+        Works in batches of batch_size rows, each its own short transaction, and
+        stops after time_budget seconds; whatever is left is picked up by the
+        next call. Returns how many reminders were purged.
+        """
+        deadline = _time.monotonic() + time_budget
+        while _time.monotonic() < deadline:
+            if self.archive_finished(batch_size) < batch_size:
+                break
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days_old)
+        purged = 0
+        while _time.monotonic() < deadline:
+            deleted = self.purge_archive(cutoff, batch_size)
+            purged += deleted
+            if deleted < batch_size:
+                break
+        return purged
+
+    def archive_finished(self, limit=500) -> int:
+        """Move up to limit completed/cancelled reminders to the archive; returns how many moved.
+
+        A reminder stays in the hot table while an active follow-up still
+        points at it through parent_id.
+
+        With an attached archive file the commit is not atomic across both
+        files, so a crash can leave a row in both tables. The copy uses
+        insert or replace, which makes the next run simply move it again.
+        """
+        with self.lock, self.conn:
+            ids = [row[0] for row in self.conn.execute(
+                "select id from reminders r where status in ('completed', 'cancelled') and not exists ("
+                "select 1 from reminders f where f.parent_id = r.id and f.status = 'active') limit ?", (limit,)
+            )]
+            if not ids:
+                return 0
+            marks = ",".join("?" * len(ids))
+            self.conn.execute(
+                f"insert or replace into {self.archive_table}({_ARCHIVE_COLUMNS}, archived_at) "
+                f"select {_ARCHIVE_COLUMNS}, ? from reminders where id in ({marks})",
+                [_to_epoch(datetime.datetime.utcnow()), *ids]
+            )
+            # The delete trigger uncounts the rows, but archived reminders still count
+            self._shift_counters(
+                f"select user_id, category, status from reminders where id in ({marks})", ids, 1
+            )
+            self.conn.execute(f"delete from reminders where id in ({marks})", ids)
+            return len(ids)
+
+    def purge_archive(self, before_utc: datetime.datetime, limit=500) -> int:
+        """Delete up to limit archived reminders that were due before before_utc; returns how many were deleted"""
+        with self.lock, self.conn:
+            ids = [row[0] for row in self.conn.execute(
+                f"select id from {self.archive_table} where due_at < ? limit ?",
+                (_to_epoch(before_utc), limit)
+            )]
+            if not ids:
+                return 0
+            marks = ",".join("?" * len(ids))
+            self._shift_counters(
+                f"select user_id, category, status from {self.archive_table} where id in ({marks})", ids, -1
+            )
+            self.conn.execute(f"delete from {self.archive_table} where id in ({marks})", ids)
+            return len(ids)
+
+    def purge_dead_outbox(self, before_utc: datetime.datetime, limit=500) -> int:
+        """Delete up to limit dead outbox messages that died before before_utc; returns how many were deleted"""
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "delete from outbox where id in (select id from outbox where state='dead' and next_attempt_at < ? limit ?)",
+                (_to_epoch(before_utc), limit)
+            ).rowcount
+
+    def _shift_counters(self, rows_query, params, delta):
+        """Add delta to the global/user/category counters once per (user_id, category, status) row"""
+        grouped = [
+            "select 'global', '', coalesce(status, ''), count(*) * ? from ({rows}) group by 3",
+            "select 'user', coalesce(user_id, ''), coalesce(status, ''), count(*) * ? from ({rows}) group by 2, 3",
+            "select 'user', coalesce(user_id, ''), 'live', count(*) * ? from ({rows}) "
+            "where status is not 'cancelled' group by 2",
+            "select 'category', coalesce(category, ''), coalesce(status, ''), count(*) * ? from ({rows}) group by 2, 3",
+        ]
+        for query in grouped:
+            self.conn.execute(
+                f"insert into stats_counters(scope, key, status, count) {query.format(rows=rows_query)} "
+                "on conflict(scope, key, status) do update set count = count + excluded.count",
+                [delta, *params]
             )
-            deleted_count = cur.rowcount
-            self.conn.commit()
-            cur.close()
-            return deleted_count
+
+    def _counters(self, scope, key="") -> dict:
+        rows = self.conn.execute(
+            "select status, count from stats_counters where scope=? and key=?", (scope, str(key))
+        ).fetchall()
+        return dict(rows)
 
     def get_stats(self, user_id=None):
+        """Reminder counts from stats_counters; point lookups regardless of table size"""
         with self.lock:
-            cur = self.conn.cursor()
             if user_id:
-                cur.execute("""
-                    select 
-                        count(*) as total,
-                        count(case when status='active' then 1 end) as active,
-                        count(case when status='completed' then 1 end) as completed,
-                        count(case when status='cancelled' then 1 end) as cancelled,
-                        1 as unique_users
-                    from reminders
-                    where user_id=?
-                """, (user_id,))
+                counters = self._counters("user", user_id)
+                unique_users = 1
             else:
-                cur.execute("""
-                    select 
-                        count(*) as total,
-                        count(case when status='active' then 1 end) as active,
-                        count(case when status='completed' then 1 end) as completed,
-                        count(case when status='cancelled' then 1 end) as cancelled,
-                        count(distinct user_id) as unique_users
-                    from reminders
-                """)
-            result = cur.fetchone()
-            cur.close()
+                counters = self._counters("global")
+                unique_users = self._counters("users").get("", 0)
             return {
-                'total': result[0],
-                'active': result[1],
-                'completed': result[2],
-                'cancelled': result[3],
-                'unique_users': result[4]
+                'total': sum(count for status, count in counters.items() if status != 'live'),
+                'active': counters.get('active', 0),
+                'completed': counters.get('completed', 0),
+                'cancelled': counters.get('cancelled', 0),
+                'unique_users': unique_users
             }
 
+    def active_count(self, user_id) -> int:
+        """Active reminders of user_id, read from stats_counters"""
+        with self.lock:
+            row = self.conn.execute(
+                "select count from stats_counters where scope='user' and key=? and status='active'", (str(user_id),)
+            ).fetchone()
+            return row[0] if row else 0
+
     def get_admin_stats(self):
         with self.lock:
-            cur = self.conn.cursor()
-            cur.execute("""
-                select 
-                    count(distinct user_id) as total_users,
-                    count(*) as total_reminders,
-                    count(case when status='active' then 1 end) as active_reminders
-                from reminders
-            """)
-            basic_stats = cur.fetchone()
-            
-            cur.execute("""
-                select category, count(*) as count
-                from reminders 
-                where status != 'cancelled'
-                group by category 
-                order by count desc 
+            counters = self._counters("global")
+            total_users = self._counters("users").get("", 0)
+            # A handful of categories, so this aggregates a few counter rows
+            top_category = self.conn.execute("""
+                select key, sum(count) as count
+                from stats_counters
+                where scope='category' and status != 'cancelled'
+                group by key
+                order by count desc
                 limit 1
-            """)
-            top_category = cur.fetchone()
-            
-            cur.execute("""
-                select user_id, count(*) as count
-                from reminders 
-                where status != 'cancelled'
-                group by user_id 
-                order by count desc 
+            """).fetchone()
+            top_user = self.conn.execute("""
+                select key, count
+                from stats_counters
+                where scope='user' and status='live'
+                order by count desc
                 limit 1
-            """)
-            top_user = cur.fetchone()
-            
-            cur.close()
+            """).fetchone()
             return {
-                'total_users': basic_stats[0],
-                'total_reminders': basic_stats[1], 
-                'active_reminders': basic_stats[2],
-                'top_category': top_category[0] if top_category else None,
+                'total_users': total_users,
+                'total_reminders': sum(count for count in counters.values()),
+                'active_reminders': counters.get('active', 0),
+                'top_category': top_category[0] if top_category and top_category[1] else None,
                 'top_category_count': top_category[1] if top_category else 0,
-                'top_user_id': top_user[0] if top_user else None,
+                'top_user_id': int(top_user[0]) if top_user and top_user[1] else None,
                 'top_user_count': top_user[1] if top_user else 0
             }
 
+    def reconcile_stats(self) -> int:
+        """Rebuild stats_counters from the hot and archived reminders; returns how many counters had drifted"""
+        with self.lock, self.conn:
+            before = dict(((scope, key, status), count) for scope, key, status, count in self.conn.execute(
+                "select scope, key, status, count from stats_counters where count != 0"
+            ))
+            self.conn.execute("delete from stats_counters")
+            self._shift_counters(
+                f"select user_id, category, status from reminders "
+                f"union all select user_id, category, status from {self.archive_table}", [], 1
+            )
+            self.conn.execute(
+                "insert into stats_counters(scope, key, status, count) "
+                "select 'users', '', '', count(distinct user_id) from reminders"
+            )
+            after = dict(((scope, key, status), count) for scope, key, status, count in self.conn.execute(
+                "select scope, key, status, count from stats_counters where count != 0"
+            ))
+            return sum(1 for k in set(before) | set(after) if before.get(k) != after.get(k))
+
+    def _schemas(self) -> List[str]:
+        return ["main", "archive"] if self.archive_path else ["main"]
+
+    def checkpoint(self, mode="PASSIVE") -> Tuple[int, int, int]:
+        """Run wal_checkpoint(mode) on every attached file; returns (busy, wal frames, frames checkpointed)"""
+        mode = mode.upper()
+        if mode not in self.CHECKPOINT_MODES:
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+        busy = frames = checkpointed = 0
+        with self.lock:
+            for schema in self._schemas():
+                row = self.conn.execute(f"PRAGMA {schema}.wal_checkpoint({mode})").fetchone()
+                busy, frames, checkpointed = busy + row[0], frames + max(row[1], 0), checkpointed + max(row[2], 0)
+        return busy, frames, checkpointed
+
+    def incremental_vacuum(self, max_pages=0) -> int:
+        """Return up to max_pages free pages (0 for all) of each auto_vacuum=INCREMENTAL file to the OS.
+
+        Files created with another auto_vacuum mode are left alone, since
+        switching them over needs a full VACUUM. Returns the pages freed.
+        """
+        freed = 0
+        with self.lock:
+            for schema in self._schemas():
+                if self.conn.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+                    continue
+                before = self.conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+                if not before:
+                    continue
+                # execute() would step the pragma once and free a single page
+                self.conn.executescript(f"PRAGMA {schema}.incremental_vacuum({int(max_pages)})")
+                freed += before - self.conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        return freed
+
+    def storage_stats(self) -> dict:
+        """Page and WAL sizes, summed over the main and archive files"""
+        stats = {"page_count": 0, "freelist_count": 0, "db_bytes": 0, "wal_bytes": 0}
+        paths = {"main": self.db_path, "archive": self.archive_path}
+        with self.lock:
+            for schema in self._schemas():
+                page_size = self.conn.execute(f"PRAGMA {schema}.page_size").fetchone()[0]
+                page_count = self.conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+                stats["page_count"] += page_count
+                stats["freelist_count"] += self.conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+                stats["db_bytes"] += page_count * page_size
+                wal = paths[schema] + "-wal"
+                stats["wal_bytes"] += os.path.getsize(wal) if os.path.exists(wal) else 0
+        return stats
+
     def close(self):
         with self.lock:
             self.conn.close()
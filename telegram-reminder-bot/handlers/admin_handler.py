@@ -1,17 +1,23 @@
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.exceptions import TelegramForbiddenError
+import asyncio
+import functools
 import logging
 import json
-import os
+from services.send_governor import SendGovernor
 
 logger = logging.getLogger(__name__)
 
 class AdminHandler:
-    def __init__(self, storage, db, bot, config, locales):
+    BROADCAST_CHUNK = 100
+
+    def __init__(self, storage, db, bot, config, locales, governor: SendGovernor = None):
         self.storage = storage
         self.db = db
         self.bot = bot
         self.config = config
         self.locales = locales
+        self.governor = governor or SendGovernor()
         self.waiting_for_admin_id = set()
         self.waiting_for_broadcast = set()
         self.waiting_for_private_message = {}
@@ -33,6 +39,9 @@ class AdminHandler:
     def is_admin(self, user_id):
         return user_id in self.config.admin_ids
 
+    async def _send(self, chat_id, text):
+        return await self.governor.send(chat_id, functools.partial(self.bot.send_message, chat_id, text))
+
     async def show_admin_panel(self, message: Message):
         user_id = message.from_user.id
         if not self.is_admin(user_id):
@@ -124,7 +133,7 @@ class AdminHandler:
             await message.answer(self.t(lang, "admin_error"))
 
     async def handle_general_stats(self, message: Message, lang: str):
-        stats = self.db.get_admin_stats()
+        stats = await self.db.get_admin_stats()
         stats_text = self.t(lang, "admin_stats_report").format(**stats)
         await message.answer(stats_text)
 
@@ -303,15 +312,21 @@ class AdminHandler:
         user_id = message.from_user.id
         try:
             broadcast_text = message.text
-            users = self.storage.get_all_users()
+            user_ids = self.storage.user_ids()
             success_count = 0
             
-            for user_data in users:
-                try:
-                    await self.bot.send_message(user_data["user_id"], broadcast_text)
-                    success_count += 1
-                except Exception:
-                    pass
+            # The governor paces the sends, so a chunk can be in flight at once
+            for start in range(0, len(user_ids), self.BROADCAST_CHUNK):
+                chunk = user_ids[start:start + self.BROADCAST_CHUNK]
+                results = await asyncio.gather(
+                    *(self._send(chat_id, broadcast_text) for chat_id in chunk),
+                    return_exceptions=True
+                )
+                for chat_id, result in zip(chunk, results):
+                    if isinstance(result, TelegramForbiddenError):
+                        # Skip users who blocked the bot in later broadcasts
+                        self.storage.set_blocked(chat_id)
+                success_count += sum(1 for result in results if not isinstance(result, Exception))
             
             await message.answer(self.t(lang, "admin_broadcast_sent").format(count=success_count))
             await self.show_admin_panel(message)
@@ -342,7 +357,7 @@ class AdminHandler:
         # User already provided target ID, now sending the message
         target_user_id = self.waiting_for_private_message[user_id]
         try:
-            await self.bot.send_message(target_user_id, message.text)
+            await self._send(target_user_id, message.text)
             await message.answer(self.t(lang, "admin_private_sent"))
             await self.show_admin_panel(message)
         except Exception as e:
@@ -729,54 +744,36 @@ class AdminHandler:
         try:
             target_input = message.text.strip()
             
+            target_user_display = target_input
             if target_input.startswith("@"):
-                target_user_display = target_input
-                target_user_id = None
-                user_found = False
-                users_path = self.storage.path
-                for filename in os.listdir(users_path):
-                    if filename.endswith('.json'):
-                        try:
-                            file_user_id = int(filename.replace('.json', ''))
-                            user_file = os.path.join(users_path, filename)
-                            if os.path.exists(user_file):
-                                os.remove(user_file)
-                                user_found = True
-                        except:
-                            continue
-                
-                if user_found:
-                    await message.answer(self.t(lang, "user_deleted_success").format(user_id=target_user_display))
-                else:
+                target_user_id = self.storage.find_user(target_input)
+                if target_user_id is None:
                     await message.answer(self.t(lang, "user_not_found"))
+                    return
             else:
                 try:
                     target_user_id = int(target_input)
-                    target_user_display = str(target_user_id)
-                    
-                    if target_user_id in self.config.admin_ids:
-                        await message.answer(self.t(lang, "admin_error"))
-                        return
-                    
-                    user_file = self.storage.file(target_user_id)
-                    if os.path.exists(user_file):
-                        os.remove(user_file)
-                        
-                        try:
-                            user_reminders = self.db.list(target_user_id)
-                            for reminder_id, _, _, _, _, _, _ in user_reminders:
-                                self.db.update_status(reminder_id, "cancelled")
-                        except Exception as db_error:
-                            logger.error(f"Error deleting user reminders from DB: {db_error}")
-                        
-                        await message.answer(self.t(lang, "user_deleted_success").format(user_id=target_user_display))
-                    else:
-                        await message.answer(self.t(lang, "user_not_found"))
-                        
                 except ValueError:
                     await message.answer(self.t(lang, "admin_invalid_id"))
                     return
-                
+                target_user_display = str(target_user_id)
+
+            if target_user_id in self.config.admin_ids:
+                await message.answer(self.t(lang, "admin_error"))
+                return
+
+            if self.storage.delete_user(target_user_id):
+                try:
+                    user_reminders = await self.db.list(target_user_id)
+                    for reminder_id, _, _, _, _, _, _ in user_reminders:
+                        await self.db.update_status(reminder_id, "cancelled")
+                except Exception as db_error:
+                    logger.error(f"Error deleting user reminders from DB: {db_error}")
+
+                await message.answer(self.t(lang, "user_deleted_success").format(user_id=target_user_display))
+            else:
+                await message.answer(self.t(lang, "user_not_found"))
+
         except Exception as e:
             logger.error(f"Error deleting user: {e}")
             await message.answer(self.t(lang, "admin_error"))
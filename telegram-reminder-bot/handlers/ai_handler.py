@@ -71,7 +71,7 @@ OUTPUT: Strict JSON only:
       "content": "clean title (≤40 chars)",
       "time_hour": number|null,
       "relative_days": number|null,
-      "repeat": {{ "type": "none|daily|weekly|monthly|yearly|interval", "value": number|null, "unit": "minutes|hours|days|weeks|null", "day": number|null, "weekday": "monday|tuesday|wednesday|thursday|friday|saturday|sunday"|null }}
+      "repeat": {{ "type": "none|daily|weekly|monthly|yearly|interval", "value": number|null, "unit": "minutes|hours|days|weeks|null", "day": number|null, "weekday": "monday|tuesday|wednesday|thursday|friday|saturday|sunday"|null, "weekdays": ["monday", ...]|null, "count": number|null, "until": "YYYY-MM-DD"|null }}
     }}
   ]
 }}
@@ -80,12 +80,13 @@ RULES:
 2. Interval: "every 8 hours" / "هر 8 ساعت" / "cada 8 horas" → {{"type": "interval", "value": 8, "unit": "hours"}}
 3. Daily: "every day" / "هر روز" / "todos los días" → {{"type": "daily"}}
 4. Weekly single: "every Friday" / "هر جمعه" / "cada viernes" → {{"type": "weekly", "weekday": "friday"}}
-5. Weekly multiple: "Monday and Wednesday" / "دوشنبه و چهارشنبه" → CREATE 2 SEPARATE reminders, each with {{"type": "weekly", "weekday": "monday"}} and {{"type": "weekly", "weekday": "wednesday"}}
+5. Weekly multiple: "Monday and Wednesday" / "دوشنبه و چهارشنبه" → ONE reminder with {{"type": "weekly", "weekdays": ["monday", "wednesday"]}}
 6. Time extraction: "at 7" / "ساعت 7" / "a las 7" → "time_hour": 7
 7. Relative dates: "فردا/tomorrow" → "relative_days": 1, "پسفردا" → 2, "سه روز دیگه" → 3, "پریروز" → -2, "دیروز" → -1, "امروز" → 0
 8. Content: Remove time/schedule words, keep action/object only
 9. Category: Detect from content
-CRITICAL: If text mentions multiple days (and/or), create separate reminders for each day.
+10. End: "10 times" / "10 بار" → "count": 10; "until June 1" / "تا ۱ خرداد" → "until": "YYYY-MM-DD" (Gregorian)
+CRITICAL: If text mentions multiple days of the week (and/or), create one reminder listing them in "weekdays".
 JSON only, no markdown.
         """
         try:
@@ -225,13 +226,16 @@ JSON only, no markdown.
                 else:
                     next_month = now.replace(day=target_day, hour=target_hour, minute=target_minute)
                 return next_month.strftime("%Y-%m-%d %H:%M")
-        elif repeat_type == "weekly" and "weekday" in repeat_data:
+        elif repeat_type == "weekly" and (repeat_data.get("weekday") or repeat_data.get("weekdays")):
             weekday_map = {"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
-            target_weekday = weekday_map.get(repeat_data["weekday"], 0)
+            weekdays = repeat_data.get("weekdays") or [repeat_data["weekday"]]
             current_weekday = now.weekday()
-            days_ahead = target_weekday - current_weekday
-            if days_ahead < 0 or (days_ahead == 0 and target_hour <= now.hour):
-                days_ahead += 7
+            days_ahead = 7
+            for weekday in weekdays:
+                ahead = weekday_map.get(weekday, 0) - current_weekday
+                if ahead < 0 or (ahead == 0 and target_hour <= now.hour):
+                    ahead += 7
+                days_ahead = min(days_ahead, ahead)
             next_occurrence = now + datetime.timedelta(days=days_ahead)
             next_occurrence = next_occurrence.replace(hour=target_hour, minute=target_minute)
             return next_occurrence.strftime("%Y-%m-%d %H:%M")
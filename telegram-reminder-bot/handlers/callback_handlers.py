@@ -233,34 +233,16 @@ class ReminderCallbackHandler(IMessageHandler):
             return
         try:
             if action == "stop":
-                self.db.update_status(reminder_id, "cancelled")
-                if reminder_id:
-                    try:
-                        with self.db.lock:
-                            cur = self.db.conn.cursor()
-                            cur.execute(
-                                "UPDATE reminders SET status='cancelled' WHERE category='installment_retry' AND content LIKE ?",
-                                (f"%{reminder_id}%",)
-                            )
-                            self.db.conn.commit()
-                            cur.close()
-                    except Exception as e:
-                        logger.error(f"Error cancelling retry reminders for {reminder_id}: {e}")
+                link = await self.db.follow_up_of(reminder_id)
+                # Stopping a retry stops the installment it belongs to
+                parent_id = link[0] if link else reminder_id
+                await self.db.update_status(parent_id, "cancelled")
+                await self._cancel_retries(parent_id)
                 await callback_query.message.edit_text(self.t(lang, "reminder_stopped"))
             elif action == "paid":
-                self.db.update_status(reminder_id, "completed")
-                if reminder_id:
-                    try:
-                        with self.db.lock:
-                            cur = self.db.conn.cursor()
-                            cur.execute(
-                                "UPDATE reminders SET status='cancelled' WHERE category='installment_retry' AND content LIKE ?",
-                                (f"%{reminder_id}%",)
-                            )
-                            self.db.conn.commit()
-                            cur.close()
-                    except Exception as e:
-                        logger.error(f"Error cancelling retry reminders for {reminder_id}: {e}")
+                link = await self.db.follow_up_of(reminder_id)
+                await self.db.update_status(reminder_id, "completed")
+                await self._cancel_retries(link[0] if link else reminder_id)
                 await callback_query.message.edit_text(self.t(lang, "payment_recorded"))
             elif action == "taken":
                 await callback_query.message.edit_text(self.t(lang, "medicine_taken"))
@@ -268,6 +250,11 @@ class ReminderCallbackHandler(IMessageHandler):
         except Exception as e:
             logger.error(f"Error updating reminder {reminder_id} for user {user_id}: {e}")
             await callback_query.answer()
+    async def _cancel_retries(self, parent_id: int):
+        try:
+            await self.db.cancel_follow_ups(parent_id)
+        except Exception as e:
+            logger.error(f"Error cancelling retry reminders for {parent_id}: {e}")
     async def handle_delete_confirmation(self, callback_query: CallbackQuery):
         user_id = callback_query.from_user.id
         if not self.rate_limit_check(user_id):
@@ -276,9 +263,7 @@ class ReminderCallbackHandler(IMessageHandler):
         try:
             lang = self.storage.load(user_id)["settings"]["language"]
             reminder_id = int(callback_query.data.split("_")[2])
-            user_reminders = self.db.list(user_id)
-            reminder_exists = any(r[0] == reminder_id for r in user_reminders)
-            if not reminder_exists:
+            if not await self.db.cancel_for_user(reminder_id, user_id):
                 await callback_query.message.edit_text(self.t(lang, "invalid_id"))
                 await callback_query.answer()
                 return
@@ -286,7 +271,6 @@ class ReminderCallbackHandler(IMessageHandler):
             logger.error(f"Error in handle_delete_confirmation for user {user_id}: {e}")
             await callback_query.answer()
             return
-        self.db.update_status(reminder_id, "cancelled")
         await callback_query.message.edit_text(self.t(lang, "reminder_deleted").format(id=reminder_id))
         await callback_query.answer(self.t(lang, "delete_confirmed"))
     async def handle_edit_selection(self, callback_query: CallbackQuery):
@@ -297,9 +281,7 @@ class ReminderCallbackHandler(IMessageHandler):
         try:
             lang = self.storage.load(user_id)["settings"]["language"]
             reminder_id = int(callback_query.data.split("_")[2])
-            user_reminders = self.db.list(user_id)
-            reminder_exists = any(r[0] == reminder_id for r in user_reminders)
-            if not reminder_exists:
+            if not await self.db.exists_for_user(reminder_id, user_id):
                 await callback_query.message.edit_text(self.t(lang, "invalid_id"))
                 await callback_query.answer()
                 return
@@ -330,13 +312,16 @@ class ReminderCallbackHandler(IMessageHandler):
                 reminder_id = pending_data["reminder_id"]
                 edit_result = pending_data["edited"]
                 original = pending_data["original"]
-                self.db.update_reminder(
+                edited_time = edit_result.get("time", original["time"])
+                await self.db.update_reminder(
                     reminder_id,
                     edit_result.get("category", original["category"]),
                     edit_result.get("content", original["content"]),
-                    edit_result.get("time", original["time"]),
+                    edited_time,
                     edit_result.get("timezone", original["timezone"]),
-                    edit_result.get("repeat", original["repeat"])
+                    self.repeat_handler.anchor(
+                        edit_result.get("repeat", original["repeat"]), edited_time, data["settings"].get("calendar")
+                    )
                 )
                 self.session.editing_reminders.pop(user_id, None)
                 repeat_value = edit_result.get("repeat", original["repeat"])
@@ -365,8 +350,8 @@ class ReminderCallbackHandler(IMessageHandler):
                     reply_markup=kb
                 )
             elif "reminders" in pending_data and isinstance(pending_data["reminders"], list):
-                created_count = 0
                 calendar_type = data["settings"].get("calendar", "miladi")
+                reminders = []
                 for reminder in pending_data["reminders"]:
                     reminder_data = {
                         "category": reminder.get("category", self.config.default_category),
@@ -375,20 +360,17 @@ class ReminderCallbackHandler(IMessageHandler):
                         "timezone": reminder.get("timezone", self.config.default_timezone),
                         "repeat": reminder.get("repeat", self.config.default_repeat)
                     }
-                    corrected_time = self._calculate_correct_time(reminder_data, calendar_type)
-                    reminder_data["time"] = corrected_time
-                    self.db.add(
-                        user_id,
-                        reminder_data["category"],
-                        reminder_data["content"],
-                        reminder_data["time"],
-                        reminder_data["timezone"],
-                        reminder_data["repeat"]
-                    )
+                    reminder_data["time"] = self._calculate_correct_time(reminder_data, calendar_type)
+                    reminder_data["repeat"] = self.repeat_handler.anchor(reminder_data["repeat"], reminder_data["time"], calendar_type)
+                    reminders.append(reminder_data)
+                reminder_ids = await self.db.add_many(user_id, reminders)
+                lines = [self.t(lang, "multiple_reminders_saved").format(count=len(reminder_ids))]
+                for reminder_id, reminder_data in zip(reminder_ids, reminders):
                     self.storage.add_reminder(user_id, reminder_data)
-                    created_count += 1
+                    display_time = DateConverter.convert_to_user_calendar(reminder_data["time"], calendar_type)
+                    lines.append(f"{self.t(lang, 'reminder_id').format(id=reminder_id)} — {reminder_data['content']} ({display_time})")
                 await callback_query.message.edit_reply_markup(reply_markup=None)
-                await callback_query.message.answer(self.t(lang, "multiple_reminders_saved").format(count=created_count))
+                await callback_query.message.answer("\n".join(lines))
             else:
                 calendar_type = data["settings"].get("calendar", "miladi")
                 reminder_data = {
@@ -400,7 +382,8 @@ class ReminderCallbackHandler(IMessageHandler):
                 }
                 corrected_time = self._calculate_correct_time(reminder_data, calendar_type)
                 reminder_data["time"] = corrected_time
-                self.db.add(
+                reminder_data["repeat"] = self.repeat_handler.anchor(reminder_data["repeat"], corrected_time, calendar_type)
+                await self.db.add(
                     user_id,
                     reminder_data["category"],
                     reminder_data["content"],
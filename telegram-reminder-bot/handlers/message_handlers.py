@@ -5,8 +5,11 @@ import logging
 import time
 import datetime
 import json
+import os
+import tempfile
 from config.config import Config
 from config.interfaces import IMessageHandler
+from services.reminder_import import MAX_IMPORT_BYTES, ReminderImporter
 from utils.date_converter import DateConverter
 
 logger = logging.getLogger(__name__)
@@ -23,6 +26,12 @@ class ReminderMessageHandler(IMessageHandler):
         self.user_request_times = {}
         self.user_message_count = {}
         self.waiting_for_city = {}
+        self.importer = ReminderImporter(
+            db, repeat_handler,
+            max_reminders=config.max_reminders_per_user,
+            default_category=getattr(config, "default_category", "general"),
+            max_content_length=getattr(config, "max_reminder_length", 500)
+        )
 
     def t(self, lang, key, **kwargs):
         text = self.locales.get(lang, self.locales["en"]).get(key, key)
@@ -113,8 +122,8 @@ class ReminderMessageHandler(IMessageHandler):
             if not data["settings"].get("setup_complete", False):
                 return
             
-            user_reminders = self.db.list(user_id)
-            if self.config.max_reminders_per_user > 0 and len(user_reminders) >= self.config.max_reminders_per_user:
+            if self.config.max_reminders_per_user > 0 and \
+                    await self.db.active_count(user_id) >= self.config.max_reminders_per_user:
                 await message.answer(self.t(lang, "max_reminders_reached").format(max=self.config.max_reminders_per_user))
                 return
             logger.info(f"Parsing text for user {user_id}: {message.text}")
@@ -140,6 +149,39 @@ class ReminderMessageHandler(IMessageHandler):
         except Exception as e:
             logger.error(f"Error in handle_message for user {user_id}: {e}")
 
+    async def handle_document(self, message: Message) -> None:
+        """Import reminders from an uploaded .ics or .csv file"""
+        user_id = message.from_user.id
+        if not self.rate_limit_check(user_id):
+            await self.handle_rate_limit(message)
+            return
+        lang = "en"
+        try:
+            data = self.storage.load(user_id)
+            lang = data["settings"]["language"]
+            if not data["settings"].get("setup_complete", False):
+                return
+            document = message.document
+            if not self.importer.is_supported(document.file_name):
+                await message.answer(self.t(lang, "import_unsupported"))
+                return
+            if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+                await message.answer(self.t(lang, "import_too_large").format(max_mb=MAX_IMPORT_BYTES // (1024 * 1024)))
+                return
+            fd, path = tempfile.mkstemp(suffix=os.path.splitext(document.file_name)[1].lower())
+            os.close(fd)
+            try:
+                await message.bot.download(document, destination=path)
+                result = await self.importer.import_file(user_id, path, document.file_name, data["settings"]["timezone"])
+            finally:
+                os.unlink(path)
+            await message.answer(self.t(lang, "import_done").format(imported=result.imported, skipped=result.skipped))
+            if result.limit_reached:
+                await message.answer(self.t(lang, "max_reminders_reached").format(max=self.config.max_reminders_per_user))
+        except Exception as e:
+            logger.error(f"Error importing document for user {user_id}: {e}")
+            await message.answer(self.t(lang, "import_failed"))
+
     async def handle_callback(self, callback: CallbackQuery) -> None:
         user_id = callback.from_user.id
         if not self.rate_limit_check(user_id):
@@ -191,19 +233,18 @@ class ReminderMessageHandler(IMessageHandler):
             data = self.storage.load(user_id)
             lang = data["settings"]["language"]
             reminder_id = self.session.editing_reminders[user_id] 
-            user_reminders = self.db.list(user_id)
+            row = await self.db.get(reminder_id, user_id)
             current_reminder = None
-            for rid, cat, content, time, tz, repeat, status in user_reminders:
-                if rid == reminder_id:
-                    current_reminder = {
-                        "id": rid,
-                        "category": cat,
-                        "content": content,
-                        "time": time,
-                        "timezone": tz,
-                        "repeat": repeat
-                    }
-                    break
+            if row:
+                rid, cat, content, time, tz, repeat, status = row
+                current_reminder = {
+                    "id": rid,
+                    "category": cat,
+                    "content": content,
+                    "time": time,
+                    "timezone": tz,
+                    "repeat": repeat
+                }
             
             if not current_reminder:
                 await message.answer(self.t(lang, "reminder_not_found"))
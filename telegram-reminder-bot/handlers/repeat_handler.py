@@ -1,9 +1,75 @@
 import json
+import calendar
 import datetime
+import itertools
 import re
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 import logging
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from convertdate import persian, islamic
+except ImportError:
+    persian = None
+    islamic = None
+
+
+WEEKDAY_NAMES = {"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+
+
+def _weekday_index(value) -> Optional[int]:
+    if isinstance(value, int) and 0 <= value <= 6:
+        return value
+    if isinstance(value, str):
+        return WEEKDAY_NAMES.get(value.strip().lower())
+    return None
+
+
+def _parse_local(value: Optional[str], end_of_day: bool = False) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M")
+    except ValueError:
+        day = datetime.datetime.strptime(value, "%Y-%m-%d")
+        return day.replace(hour=23, minute=59) if end_of_day else day
+
+
+def _advance_fixed_np(current_times, steps, nows) -> Tuple[list, list]:
+    """Vectorized fixed-step catch-up: first current + k*step after now, with k >= 1"""
+    current = np.array(current_times, dtype='datetime64[s]')
+    now = np.array(nows, dtype='datetime64[s]')
+    step = np.array([s.total_seconds() for s in steps], dtype='int64')
+    behind = (now - current).astype('int64')
+    k = np.where(behind >= 0, behind // step + 1, 1)
+    next_times = current + (k * step).astype('timedelta64[s]')
+    return next_times.tolist(), (k - 1).tolist()
+
+
+def _add_months_np(current, months):
+    """Vectorized _add_months over datetime64[s] values"""
+    month_start = current.astype('datetime64[M]')
+    day_start = current.astype('datetime64[D]')
+    day_offset = (day_start - month_start.astype('datetime64[D]')).astype('int64')
+    time_of_day = current - day_start.astype('datetime64[s]')
+    target = month_start + months.astype('timedelta64[M]')
+    month_length = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype('int64')
+    days = np.minimum(day_offset, month_length - 1).astype('timedelta64[D]')
+    return (target.astype('datetime64[D]') + days).astype('datetime64[s]') + time_of_day
+
+
+def _advance_months_np(current_times, strides, nows) -> Tuple[list, list]:
+    """Vectorized month/year catch-up matching RepeatHandler.advance_past"""
+    current = np.array(current_times, dtype='datetime64[s]')
+    now = np.array(nows, dtype='datetime64[s]')
+    stride = np.array(strides, dtype='int64')
+    behind = now.astype('datetime64[M]').astype('int64') - current.astype('datetime64[M]').astype('int64')
+    steps = np.maximum(behind // stride, 1)
+    steps = np.where(_add_months_np(current, steps * stride) <= now, steps + 1, steps)
+    return _add_months_np(current, steps * stride).tolist(), (steps - 1).tolist()
 
 
 @dataclass
@@ -14,6 +80,63 @@ class RepeatPattern:
     time: Optional[str] = None
     day: Optional[int] = None
     weekday: Optional[int] = None
+    # Recurrence-rule fields, modelled on RFC 5545 BYDAY/BYMONTHDAY/COUNT/UNTIL/DTSTART
+    weekdays: Optional[List[int]] = None
+    month_days: Optional[List[int]] = None
+    count: Optional[int] = None
+    until: Optional[str] = None
+    start: Optional[str] = None
+    calendar: Optional[str] = None
+
+    def by_weekdays(self) -> List[int]:
+        days = list(self.weekdays or [])
+        if self.weekday is not None and self.weekday not in days:
+            days.append(self.weekday)
+        return sorted(days)
+
+    def by_month_days(self) -> List[int]:
+        days = list(self.month_days or [])
+        if self.day is not None and self.day not in days:
+            days.append(self.day)
+        return days
+
+    def has_end(self) -> bool:
+        return bool(self.count or self.until)
+
+    def is_rule(self) -> bool:
+        """Whether the pattern needs the recurrence engine rather than a plain step"""
+        return bool(
+            self.by_weekdays() or self.by_month_days() or self.has_end() or self.start
+            or self.calendar in ("shamsi", "qamari")
+            or (self.type != 'interval' and self.value and self.value > 1)
+        )
+
+
+class _GregorianCalendar:
+    def split(self, date: datetime.date) -> Tuple[int, int, int]:
+        return date.year, date.month, date.day
+
+    def join(self, year: int, month: int, day: int) -> datetime.date:
+        return datetime.date(year, month, day)
+
+    def month_length(self, year: int, month: int) -> int:
+        return calendar.monthrange(year, month)[1]
+
+
+class _ConvertdateCalendar:
+    """Month arithmetic in a calendar provided by a convertdate module"""
+
+    def __init__(self, module):
+        self.module = module
+
+    def split(self, date: datetime.date) -> Tuple[int, int, int]:
+        return self.module.from_gregorian(date.year, date.month, date.day)
+
+    def join(self, year: int, month: int, day: int) -> datetime.date:
+        return datetime.date(*self.module.to_gregorian(year, month, day))
+
+    def month_length(self, year: int, month: int) -> int:
+        return self.module.month_length(year, month)
 
 
 class RepeatHandler:
@@ -109,13 +232,23 @@ class RepeatHandler:
             if pattern.type == 'none':
                 return json.dumps({"type": "none"})
             elif pattern.type == 'interval':
-                return json.dumps({
+                data = {
                     "type": "interval",
                     "value": pattern.value,
                     "unit": pattern.unit
-                })
+                }
             else:
-                return json.dumps({"type": pattern.type})
+                data = {"type": pattern.type}
+                if pattern.value and pattern.value > 1:
+                    data["value"] = pattern.value
+            if pattern.by_weekdays():
+                data["weekdays"] = pattern.by_weekdays()
+            if pattern.by_month_days():
+                data["month_days"] = pattern.by_month_days()
+            for key in ("count", "until", "start", "calendar"):
+                if getattr(pattern, key):
+                    data[key] = getattr(pattern, key)
+            return json.dumps(data)
         except Exception as e:
             self.logger.error(f"Error converting pattern to JSON: {e}")
             return json.dumps({"type": "none"})
@@ -133,20 +266,73 @@ class RepeatHandler:
             pattern_type = data.get('type', 'none')
             
             if pattern_type == 'interval':
-                return RepeatPattern(
+                pattern = RepeatPattern(
                     type='interval',
                     value=data.get('value'),
                     unit=data.get('unit')
                 )
             else:
-                return RepeatPattern(type=pattern_type)
+                value = data.get('value')
+                pattern = RepeatPattern(type=pattern_type, value=value if isinstance(value, int) else None)
+            self._read_rule_fields(pattern, data)
+            return pattern
                 
         except (json.JSONDecodeError, KeyError, ValueError) as e:
             self.logger.error(f"Error parsing JSON repeat pattern: {e}")
             return RepeatPattern(type='none')
 
+    def anchor(self, repeat: Union[str, Dict[str, Any]], first_time: str, user_calendar: Optional[str] = None) -> str:
+        """Pin a repeat about to be saved to its first occurrence and the user's calendar.
+
+        count is counted from DTSTART, so a rule with count or until gets start
+        set to first_time (local "%Y-%m-%d %H:%M"); without it every advance
+        would count again from the current occurrence. Month and year steps of
+        a Shamsi or Hijri user follow that calendar's months.
+        """
+        try:
+            data = json.loads(repeat) if isinstance(repeat, str) and repeat.startswith("{") else repeat
+            if not isinstance(data, dict):
+                return repeat
+            data = dict(data)
+            if (data.get("count") or data.get("until")) and not data.get("start"):
+                _parse_local(first_time)
+                data["start"] = first_time
+            if user_calendar in ("shamsi", "qamari") and data.get("type") in ("monthly", "yearly"):
+                data.setdefault("calendar", user_calendar)
+            return json.dumps(data)
+        except (ValueError, TypeError) as e:
+            self.logger.error(f"Error anchoring repeat pattern: {e}")
+            return repeat if isinstance(repeat, str) else json.dumps(repeat)
+
+    def _read_rule_fields(self, pattern: RepeatPattern, data: Dict[str, Any]):
+        weekday = _weekday_index(data.get('weekday'))
+        if weekday is not None:
+            pattern.weekday = weekday
+        weekdays = data.get('weekdays')
+        if isinstance(weekdays, list):
+            pattern.weekdays = sorted({d for d in map(_weekday_index, weekdays) if d is not None}) or None
+        if isinstance(data.get('day'), int) and data['day']:
+            pattern.day = data['day']
+        month_days = data.get('month_days')
+        if isinstance(month_days, list):
+            pattern.month_days = [d for d in month_days if isinstance(d, int) and d and -31 <= d <= 31] or None
+        if isinstance(data.get('count'), int) and data['count'] > 0:
+            pattern.count = data['count']
+        for key in ('until', 'start'):
+            if isinstance(data.get(key), str):
+                try:
+                    _parse_local(data[key])
+                    setattr(pattern, key, data[key])
+                except ValueError:
+                    self.logger.warning(f"Ignoring invalid repeat {key}: {data[key]}")
+        if data.get('calendar') in ('shamsi', 'qamari'):
+            pattern.calendar = data['calendar']
+
     def calculate_next_time(self, current_time: datetime.datetime, pattern: RepeatPattern) -> Optional[datetime.datetime]:
         try:
+            if pattern.is_rule():
+                anchor = _parse_local(pattern.start) or current_time
+                return next(self.iter_occurrences(pattern, anchor, after=current_time), None)
             if pattern.type == 'none':
                 return None
             elif pattern.type == 'interval':
@@ -161,15 +347,9 @@ class RepeatHandler:
             elif pattern.type == 'weekly':
                 return current_time + datetime.timedelta(weeks=1)
             elif pattern.type == 'monthly':
-                if current_time.month == 12:
-                    return current_time.replace(year=current_time.year + 1, month=1)
-                else:
-                    return current_time.replace(month=current_time.month + 1)
+                return self._add_months(current_time, 1)
             elif pattern.type == 'yearly':
-                try:
-                    return current_time.replace(year=current_time.year + 1)
-                except ValueError:
-                    return current_time.replace(year=current_time.year + 1, day=28)
+                return self._add_months(current_time, 12)
             
             return None
             
@@ -177,6 +357,226 @@ class RepeatHandler:
             self.logger.error(f"Error calculating next time: {e}")
             return None
 
+    @staticmethod
+    def _add_months(dt: datetime.datetime, months: int) -> datetime.datetime:
+        """Shift by whole months, clamping the day to the target month's length"""
+        month_index = dt.year * 12 + dt.month - 1 + months
+        year, month = divmod(month_index, 12)
+        day = min(dt.day, calendar.monthrange(year, month + 1)[1])
+        return dt.replace(year=year, month=month + 1, day=day)
+
+    def _fixed_step(self, pattern: RepeatPattern) -> Optional[datetime.timedelta]:
+        if pattern.type == 'interval' and pattern.value:
+            if pattern.unit == 'minutes':
+                return datetime.timedelta(minutes=pattern.value)
+            elif pattern.unit == 'hours':
+                return datetime.timedelta(hours=pattern.value)
+            elif pattern.unit == 'days':
+                return datetime.timedelta(days=pattern.value)
+        elif pattern.type == 'daily':
+            return datetime.timedelta(days=1)
+        elif pattern.type == 'weekly':
+            return datetime.timedelta(weeks=1)
+        return None
+
+    def _rule_step(self, pattern: RepeatPattern) -> Optional[datetime.timedelta]:
+        """Distance between occurrences of a rule that has no weekday or month-day filter"""
+        if pattern.by_weekdays() or pattern.by_month_days():
+            return None
+        step = self._fixed_step(pattern)
+        if step is not None and pattern.type != 'interval' and pattern.value and pattern.value > 1:
+            step *= pattern.value
+        return step
+
+    def advance_past(self, current_time: datetime.datetime, pattern: RepeatPattern,
+                     now: datetime.datetime, count_missed: bool = True) -> Tuple[Optional[datetime.datetime], int]:
+        """Return the first occurrence after both current_time and now, and how many were skipped.
+
+        Skipped occurrences are those in (current_time, now]. Fixed-step patterns
+        are solved with one division and calendar patterns by month arithmetic,
+        so a reminder that is days overdue advances in a single step. Rule-based
+        patterns jump to now the same way; rules without a fixed step are walked
+        to count what was missed, which count_missed=False skips (missed is then 0).
+        """
+        try:
+            if pattern.is_rule():
+                anchor = _parse_local(pattern.start) or current_time
+                next_time = next(self.iter_occurrences(pattern, anchor, after=max(current_time, now)), None)
+                if not count_missed:
+                    return next_time, 0
+                step = self._rule_step(pattern)
+                if step is None:
+                    occurrences = self.iter_occurrences(pattern, anchor, after=current_time)
+                    return next_time, sum(1 for _ in itertools.takewhile(lambda dt: dt <= now, occurrences))
+                # Occurrence k is anchor + k * step; count the k in (current_time, now], within UNTIL and COUNT
+                until = _parse_local(pattern.until, end_of_day=True)
+                last_time = min(now, until) if until else now
+                first = max(0, (current_time - anchor) // step + 1)
+                last = (last_time - anchor) // step if last_time >= anchor else -1
+                if pattern.count:
+                    last = min(last, pattern.count - 1)
+                return next_time, max(0, last - first + 1)
+            step = self._fixed_step(pattern)
+            if step is not None:
+                steps = 1
+                if now >= current_time:
+                    steps = (now - current_time) // step + 1
+                return current_time + steps * step, steps - 1
+            if pattern.type in ('monthly', 'yearly'):
+                stride = 1 if pattern.type == 'monthly' else 12
+                months = (now.year - current_time.year) * 12 + now.month - current_time.month
+                steps = max(months // stride, 1)
+                if self._add_months(current_time, steps * stride) <= now:
+                    steps += 1
+                return self._add_months(current_time, steps * stride), steps - 1
+            return self.calculate_next_time(current_time, pattern), 0
+        except Exception as e:
+            self.logger.error(f"Error advancing past {now}: {e}")
+            return None, 0
+
+    def advance_many(self, current_times: Sequence[datetime.datetime], patterns: Sequence[RepeatPattern],
+                     nows: Sequence[datetime.datetime],
+                     count_missed: bool = True) -> List[Tuple[Optional[datetime.datetime], int]]:
+        """advance_past for a whole batch.
+
+        Plain fixed-step and month-step patterns are grouped and solved with
+        NumPy datetime64 arithmetic when NumPy is installed; rule patterns and
+        the no-NumPy case go through advance_past one at a time.
+        """
+        results: List[Tuple[Optional[datetime.datetime], int]] = [(None, 0)] * len(current_times)
+        fixed: List[Tuple[int, datetime.timedelta]] = []
+        monthly: List[Tuple[int, int]] = []
+        groups: Dict[int, Tuple[Optional[list], Any]] = {}
+        for i, pattern in enumerate(patterns):
+            # Batches usually share a handful of pattern objects, so classify each once
+            group = groups.get(id(pattern))
+            if group is None:
+                group = groups[id(pattern)] = self._batch_group(pattern, fixed, monthly)
+            target, arg = group
+            if target is None:
+                results[i] = self.advance_past(current_times[i], pattern, nows[i], count_missed)
+            else:
+                target.append((i, arg))
+
+        for group, solve in ((fixed, _advance_fixed_np), (monthly, _advance_months_np)):
+            if not group:
+                continue
+            indexes = [i for i, _ in group]
+            next_times, missed = solve([current_times[i] for i in indexes], [arg for _, arg in group],
+                                       [nows[i] for i in indexes])
+            for i, next_time, skipped in zip(indexes, next_times, missed):
+                results[i] = (next_time, skipped)
+        return results
+
+    def _batch_group(self, pattern: RepeatPattern, fixed: list, monthly: list) -> Tuple[Optional[list], Any]:
+        if np is None or pattern.is_rule():
+            return None, None
+        step = self._fixed_step(pattern)
+        if step:
+            return fixed, step
+        if pattern.type in ('monthly', 'yearly'):
+            return monthly, 1 if pattern.type == 'monthly' else 12
+        return None, None
+
+    def calculate_next_times(self, current_times: Sequence[datetime.datetime],
+                             patterns: Sequence[RepeatPattern]) -> List[Optional[datetime.datetime]]:
+        """calculate_next_time for a whole batch"""
+        return [next_time for next_time, _ in self.advance_many(current_times, patterns, current_times)]
+
+    def _calendar(self, name: Optional[str]):
+        if name == 'shamsi' and persian:
+            return _ConvertdateCalendar(persian)
+        if name == 'qamari' and islamic:
+            return _ConvertdateCalendar(islamic)
+        if name in ('shamsi', 'qamari'):
+            self.logger.warning(f"convertdate is not installed; using Gregorian months for {name} reminders")
+        return _GregorianCalendar()
+
+    def iter_occurrences(self, pattern: RepeatPattern, start: datetime.datetime,
+                         after: Optional[datetime.datetime] = None) -> Iterator[datetime.datetime]:
+        """Lazily yield occurrences of pattern anchored at start, in order.
+
+        start is the first occurrence (DTSTART); pattern.count counts from it and
+        pattern.until bounds the sequence. With after, only occurrences strictly
+        later are yielded; without a count the generator jumps straight to the
+        period containing after instead of stepping there.
+        """
+        until = _parse_local(pattern.until, end_of_day=True)
+        from_time = start if pattern.count or after is None else max(start, after)
+        produced = 0
+        for occurrence in self._candidates(pattern, start, from_time):
+            if until and occurrence > until:
+                return
+            produced += 1
+            if pattern.count and produced > pattern.count:
+                return
+            if after is None or occurrence > after:
+                yield occurrence
+
+    def _candidates(self, pattern: RepeatPattern, start: datetime.datetime,
+                    from_time: datetime.datetime) -> Iterator[datetime.datetime]:
+        """Occurrences >= start, beginning with the period that contains from_time"""
+        every = pattern.value if pattern.type != 'interval' and pattern.value and pattern.value > 0 else 1
+        weekdays = pattern.by_weekdays()
+        if pattern.type == 'interval' or (pattern.type == 'daily' and not weekdays) or (pattern.type == 'weekly' and not weekdays):
+            step = self._fixed_step(pattern)
+            if not step:
+                return
+            if pattern.type != 'interval':
+                step *= every
+            index = max(0, -(-(from_time - start) // step))
+            while True:
+                yield start + index * step
+                index += 1
+        elif pattern.type == 'daily':
+            index = max(0, (from_time - start).days // every)
+            misses = 0
+            while misses < 7:
+                occurrence = start + datetime.timedelta(days=index * every)
+                index += 1
+                if occurrence.weekday() in weekdays:
+                    misses = 0
+                    yield occurrence
+                else:
+                    misses += 1
+        elif pattern.type == 'weekly':
+            week_start = start - datetime.timedelta(days=start.weekday())
+            index = max(0, (from_time - week_start).days // 7 // every)
+            while True:
+                base = week_start + datetime.timedelta(weeks=index * every)
+                for weekday in weekdays:
+                    occurrence = base + datetime.timedelta(days=weekday)
+                    if occurrence >= start:
+                        yield occurrence
+                index += 1
+        elif pattern.type in ('monthly', 'yearly'):
+            yield from self._calendar_candidates(pattern, start, from_time, every, weekdays)
+
+    def _calendar_candidates(self, pattern: RepeatPattern, start: datetime.datetime,
+                             from_time: datetime.datetime, every: int, weekdays: List[int]) -> Iterator[datetime.datetime]:
+        cal = self._calendar(pattern.calendar)
+        start_year, start_month, start_day = cal.split(start.date())
+        from_year, from_month, _ = cal.split(from_time.date())
+        stride = every * (12 if pattern.type == 'yearly' else 1)
+        month_days = pattern.by_month_days() if pattern.type == 'monthly' else []
+        index = max(0, ((from_year - start_year) * 12 + from_month - start_month) // stride)
+        while True:
+            year, month = divmod((start_year * 12 + start_month - 1) + index * stride, 12)
+            month += 1
+            length = cal.month_length(year, month)
+            if month_days:
+                # Days past the end of a short month fall on its last day; negative days count from the end
+                days = sorted({min(length, d if d > 0 else max(1, length + 1 + d)) for d in month_days})
+            elif weekdays and pattern.type == 'monthly':
+                days = [d for d in range(1, length + 1) if cal.join(year, month, d).weekday() in weekdays]
+            else:
+                days = [min(start_day, length)]
+            for day in days:
+                occurrence = datetime.datetime.combine(cal.join(year, month, day), start.time())
+                if occurrence >= start:
+                    yield occurrence
+            index += 1
+
     def get_display_text(self, pattern: RepeatPattern, language: str = 'fa') -> str:
         try:
             lang_formats = self.display_formats.get(language, self.display_formats['fa'])
@@ -207,7 +607,14 @@ class RepeatHandler:
                        pattern.value > 0 and 
                        pattern.unit in ['minutes', 'hours', 'days'])
             elif pattern.type in ['daily', 'weekly', 'monthly', 'yearly']:
-                return True
+                if pattern.count is not None and pattern.count < 1:
+                    return False
+                if pattern.until and _parse_local(pattern.until) is None:
+                    return False
+                if pattern.start and _parse_local(pattern.start) is None:
+                    return False
+                return all(0 <= d <= 6 for d in pattern.by_weekdays()) and \
+                    all(d and -31 <= d <= 31 for d in pattern.by_month_days())
             else:
                 return False
         except Exception:
@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import NamedTuple, Optional
+
+from services.metrics import MetricsRegistry
+
+
+class MaintenanceReport(NamedTuple):
+    purged: int  # archived reminders past retention that were deleted
+    checkpoint_mode: str
+    checkpoint_busy: int  # non-zero when readers kept the checkpoint from finishing
+    wal_frames: int
+    checkpointed_frames: int
+    pages_freed: int
+    wal_bytes: int  # size of the WAL file(s) after the checkpoint
+    db_bytes: int
+    dead_purged: int = 0  # dead outbox messages past retention that were deleted
+
+
+class DatabaseMaintenance:
+    """Periodic housekeeping that keeps the database file and WAL from growing.
+
+    Each run archives finished reminders and purges old archived ones in
+    small batches under a time budget, and drops outbox messages that died
+    more than retention_days ago. It then returns free pages to the OS
+    with incremental_vacuum on files created with auto_vacuum=INCREMENTAL,
+    and checkpoints the WAL: PASSIVE normally, TRUNCATE once the WAL is
+    larger than wal_truncate_bytes.
+    """
+
+    def __init__(self, db, metrics: Optional[MetricsRegistry] = None, interval: float = 600,
+                 retention_days: int = 30, batch_size: int = 500, time_budget: float = 5.0,
+                 wal_truncate_bytes: int = 64 * 1024 * 1024, vacuum_pages: int = 0):
+        self.db = db
+        self.metrics = metrics or MetricsRegistry()
+        self.interval = interval
+        self.retention_days = retention_days
+        self.batch_size = max(1, batch_size)
+        self.time_budget = time_budget
+        self.wal_truncate_bytes = wal_truncate_bytes
+        self.vacuum_pages = vacuum_pages
+        self._purged = self.metrics.counter("db_reminders_purged_total", "Archived reminders deleted after retention")
+        self._dead_purged = self.metrics.counter(
+            "outbox_dead_purged_total", "Undeliverable notifications deleted after retention"
+        )
+        self._pages_freed = self.metrics.counter("db_pages_freed_total", "Free pages returned to the OS by incremental_vacuum")
+        self._checkpoints = self.metrics.counter("db_checkpoints_total", "WAL checkpoints by mode and result")
+        self._wal_bytes = self.metrics.gauge("db_wal_bytes", "Size of the WAL after the last checkpoint")
+        self._db_bytes = self.metrics.gauge("db_file_bytes", "Size of the database file(s)")
+        self._run_seconds = self.metrics.histogram("db_maintenance_seconds", "Time taken by one maintenance run")
+        self.task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        self.task = asyncio.get_event_loop().create_task(self._loop())
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.run_once()
+                self.logger.info(
+                    f"Maintenance - purged {report.purged} reminders and {report.dead_purged} dead notifications, "
+                    f"{report.checkpoint_mode} checkpoint "
+                    f"{report.checkpointed_frames}/{report.wal_frames} frames, {report.pages_freed} pages freed, "
+                    f"WAL {report.wal_bytes} bytes"
+                )
+            except Exception as e:
+                self.logger.error(f"Maintenance error: {e}")
+
+    async def run_once(self) -> MaintenanceReport:
+        started = time.perf_counter()
+        # Every batch is its own writer job, so ticks keep committing in between
+        purged = await self.db.cleanup_old_reminders(self.retention_days, self.batch_size, self.time_budget)
+        self._purged.inc(purged)
+        dead_purged = await self._purge_dead_outbox(started)
+        self._dead_purged.inc(dead_purged)
+
+        # Vacuum first so the pages it rewrites are covered by the checkpoint
+        pages_freed = await self.db.incremental_vacuum(self.vacuum_pages)
+        self._pages_freed.inc(pages_freed)
+
+        before = await self.db.storage_stats()
+        mode = "TRUNCATE" if before["wal_bytes"] >= self.wal_truncate_bytes else "PASSIVE"
+        busy, frames, checkpointed = await self.db.checkpoint(mode)
+        self._checkpoints.inc(labels={"mode": mode.lower(), "result": "busy" if busy else "ok"})
+        if busy and mode == "TRUNCATE":
+            self.logger.warning("WAL truncate checkpoint blocked by readers; retrying next run")
+
+        after = await self.db.storage_stats()
+        self._wal_bytes.set(after["wal_bytes"])
+        self._db_bytes.set(after["db_bytes"])
+        self._run_seconds.observe(time.perf_counter() - started)
+        return MaintenanceReport(
+            purged, mode, busy, frames, checkpointed, pages_freed, after["wal_bytes"], after["db_bytes"], dead_purged
+        )
+
+    async def _purge_dead_outbox(self, started: float) -> int:
+        """At least one batch, then more while the run is within its time budget"""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=self.retention_days)
+        purged = 0
+        while True:
+            deleted = await self.db.purge_dead_outbox(cutoff, self.batch_size)
+            purged += deleted
+            if deleted < self.batch_size or time.perf_counter() - started >= self.time_budget:
+                return purged
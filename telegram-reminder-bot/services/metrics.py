@@ -0,0 +1,282 @@
+import asyncio
+import bisect
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+DEFAULT_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+class Metric(ABC):
+    """A named metric with one series per label set.
+
+    Metrics are only updated from the event loop thread, so plain attribute
+    updates are enough and no lock is taken on the hot path.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        """Return (sample name, labels, value) tuples"""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str = ""):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str = ""):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None):
+        self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        self.inc(-amount, labels)
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+        # Counts are stored per bucket and made cumulative when exported
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+        series.max = max(series.max, value)
+
+    def summary(self, labels: Optional[Dict[str, str]] = None) -> Dict[str, float]:
+        series = self._series.get(_label_key(labels))
+        if series is None or not series.count:
+            return {"count": 0, "avg": 0.0, "max": 0.0, "p50": 0.0, "p95": 0.0}
+        return {
+            "count": series.count,
+            "avg": series.sum / series.count,
+            "max": series.max,
+            "p50": self._quantile(series, 0.5),
+            "p95": self._quantile(series, 0.95),
+        }
+
+    def _quantile(self, series: _HistogramSeries, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile"""
+        target = q * series.count
+        seen = 0
+        for bound, count in zip(self.buckets, series.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return series.max
+
+    def label_sets(self) -> List[LabelKey]:
+        return list(self._series)
+
+    def samples(self):
+        result = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                result.append((f"{self.name}_bucket", key + (("le", f"{bound:g}"),), cumulative))
+            result.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series.count))
+            result.append((f"{self.name}_sum", key, series.sum))
+            result.append((f"{self.name}_count", key, series.count))
+        return result
+
+
+class MetricsRegistry:
+    """Holds the process' metrics; getters create a metric on first use"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def metrics(self) -> List[Metric]:
+        return list(self._metrics.values())
+
+
+class MetricsExporter(ABC):
+    """Base class for metrics exporters"""
+
+    @abstractmethod
+    def export(self, registry: MetricsRegistry):
+        """Publish the current state of the registry"""
+        pass
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class TextMetricsExporter(MetricsExporter):
+    """Prometheus text exposition format, written to a file when a path is given"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.last_output = ""
+
+    def render(self, registry: MetricsRegistry) -> str:
+        lines = []
+        for metric in registry.metrics():
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, registry: MetricsRegistry):
+        self.last_output = self.render(registry)
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.last_output)
+            os.replace(tmp_path, self.path)
+
+
+class LogMetricsExporter(MetricsExporter):
+    """Logs a one-line summary per metric series"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+
+    def export(self, registry: MetricsRegistry):
+        for metric in registry.metrics():
+            if isinstance(metric, Histogram):
+                for labels in metric.label_sets():
+                    s = metric.summary(dict(labels))
+                    self.logger.info(
+                        f"{metric.name}{_format_labels(labels)} n={s['count']} avg={s['avg']:.2f} "
+                        f"p50<={s['p50']:g} p95<={s['p95']:g} max={s['max']:.2f}"
+                    )
+            else:
+                for sample_name, labels, value in metric.samples():
+                    self.logger.info(f"{sample_name}{_format_labels(labels)} {value:g}")
+
+
+class MetricsExporterFactory:
+    """Factory for creating metrics exporters"""
+
+    _exporters = {
+        "text": TextMetricsExporter,
+        "log": LogMetricsExporter,
+    }
+
+    @classmethod
+    def create(cls, exporter_type: str = "log", **kwargs) -> MetricsExporter:
+        exporter_class = cls._exporters.get(exporter_type, LogMetricsExporter)
+        return exporter_class(**kwargs)
+
+    @classmethod
+    def register_exporter(cls, name: str, exporter_class: type):
+        if not issubclass(exporter_class, MetricsExporter):
+            raise ValueError("Exporter class must inherit from MetricsExporter")
+        cls._exporters[name] = exporter_class
+
+
+class MetricsReporter:
+    """Exports a registry periodically"""
+
+    def __init__(self, registry: MetricsRegistry, exporters: Sequence[MetricsExporter], interval: float = 300):
+        self.registry = registry
+        self.exporters = list(exporters)
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        self.task = asyncio.get_event_loop().create_task(self._loop())
+
+    def export(self):
+        for exporter in self.exporters:
+            try:
+                exporter.export(self.registry)
+            except Exception as e:
+                self.logger.error(f"Metrics export failed in {type(exporter).__name__}: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.export()
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.export()
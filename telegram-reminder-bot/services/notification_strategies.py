@@ -1,9 +1,21 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+import functools
 import logging
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup
 from services.reminder_types import ReminderFactory
+from services.send_governor import SendGovernor
+
+
+def render_notification(reminder_data: Dict[str, Any], lang: str, t_func) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Build the message text and keyboard for a reminder"""
+    category = reminder_data.get('category', 'general')
+    content = reminder_data.get('content', 'No content')
+    reminder_type = ReminderFactory.create(category)
+    message_text = reminder_type.format_message(content, lang, t_func)
+    keyboard = reminder_type.create_keyboard(reminder_data.get('id'), lang, t_func)
+    return message_text, keyboard
 
 
 class NotificationStrategy(ABC):
@@ -19,7 +31,8 @@ class NotificationStrategy(ABC):
 class TelegramNotificationStrategy(NotificationStrategy):
     """Standard Telegram notification strategy"""
     
-    def __init__(self):
+    def __init__(self, governor: Optional[SendGovernor] = None):
+        self.governor = governor
         self.logger = logging.getLogger(__name__)
     
     async def send_notification(self, bot: Bot, user_id: int, reminder_data: Dict[str, Any], 
@@ -27,23 +40,19 @@ class TelegramNotificationStrategy(NotificationStrategy):
         try:
             reminder_id = reminder_data.get('id')
             category = reminder_data.get('category', 'general')
-            content = reminder_data.get('content', 'No content')
-            
-            # Use factory to get reminder type
-            reminder_type = ReminderFactory.create(category)
-            
-            # Format message
-            message_text = reminder_type.format_message(content, lang, t_func)
-            
-            # Create keyboard if needed
-            keyboard = reminder_type.create_keyboard(reminder_id, lang, t_func)
+            message_text, keyboard = render_notification(reminder_data, lang, t_func)
             
-            # Send message
-            await bot.send_message(
+            # Send message, paced by the governor when one is configured
+            send = functools.partial(
+                bot.send_message,
                 chat_id=user_id,
                 text=message_text,
                 reply_markup=keyboard
             )
+            if self.governor:
+                await self.governor.send(user_id, send)
+            else:
+                await send()
             
             self.logger.info(f"Sent {category} reminder {reminder_id} to user {user_id}")
             return True
@@ -56,7 +65,7 @@ class TelegramNotificationStrategy(NotificationStrategy):
 class SilentNotificationStrategy(NotificationStrategy):
     """Silent notification strategy (for testing or special cases)"""
     
-    def __init__(self):
+    def __init__(self, governor: Optional[SendGovernor] = None):
         self.logger = logging.getLogger(__name__)
     
     async def send_notification(self, bot: Bot, user_id: int, reminder_data: Dict[str, Any], 
@@ -76,10 +85,10 @@ class SilentNotificationStrategy(NotificationStrategy):
 class PriorityNotificationStrategy(NotificationStrategy):
     """Priority notification with multiple attempts"""
     
-    def __init__(self, max_retries: int = 3):
+    def __init__(self, max_retries: int = 3, governor: Optional[SendGovernor] = None):
         self.max_retries = max_retries
         self.logger = logging.getLogger(__name__)
-        self.base_strategy = TelegramNotificationStrategy()
+        self.base_strategy = TelegramNotificationStrategy(governor)
     
     async def send_notification(self, bot: Bot, user_id: int, reminder_data: Dict[str, Any], 
                               lang: str, t_func) -> bool:
@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import functools
+import json
+import logging
+import time
+from typing import List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardMarkup
+
+from services.metrics import MetricsRegistry
+from services.priority_lanes import PriorityLanes
+from services.send_governor import SendGovernor
+
+
+def encode_notification(text: str, keyboard: Optional[InlineKeyboardMarkup],
+                        lane: Optional[str] = None, due_at: Optional[int] = None) -> str:
+    """Serialize a rendered notification for the outbox payload column"""
+    return json.dumps({
+        "text": text,
+        "reply_markup": keyboard.model_dump(mode="json", exclude_none=True) if keyboard else None,
+        "lane": lane,
+        "due_at": due_at
+    }, ensure_ascii=False)
+
+
+class LeaseLost(Exception):
+    """The message was claimed again while it waited for its turn to be sent"""
+
+
+class OutboxDispatcher:
+    """Delivers notifications queued in the outbox table at least once.
+
+    A claim loop leases batches of due messages and feeds a pool of delivery
+    workers, which send through the governor and ack or reschedule each message.
+    A message whose worker dies is claimed again when its lease expires.
+
+    Messages are claimed most urgent lane first, and each send holds a slot
+    of its lane, so the capacity reserved for urgent lanes is kept across the
+    workers. With fewer workers than a lane's share of the capacity, the
+    reservation never binds and only the claim order applies.
+
+    A full page is not followed by another claim until the queue has drained.
+    Messages can still wait longer than the lease behind the per-chat limit,
+    so a worker renews the lease right before sending once half of it has
+    passed, and skips the message if it was claimed again in the meantime.
+    """
+
+    # Errors that will not go away by retrying, e.g. the user blocked the bot
+    PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+    def __init__(self, db, bot, governor: Optional[SendGovernor] = None, lanes: Optional[PriorityLanes] = None,
+                 workers: int = 4, batch_size: int = 50, lease_seconds: int = 60, max_attempts: int = 5,
+                 poll_interval: float = 1.0, backoff_base: float = 5.0, backoff_max: float = 3600,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.db = db
+        self.bot = bot
+        self.governor = governor
+        self.metrics = metrics or MetricsRegistry()
+        self.lanes = lanes or PriorityLanes(metrics=self.metrics)
+        self._sends = self.metrics.counter("notification_sends_total", "Notification send attempts by result")
+        self._queue_depth = self.metrics.gauge("outbox_queue_depth", "Claimed messages waiting for a delivery worker")
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        loop = asyncio.get_event_loop()
+        self._queue = asyncio.Queue(maxsize=self.batch_size)
+        self._wakeup = asyncio.Event()
+        self._tasks = [loop.create_task(self._claim_loop())]
+        self._tasks += [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def wake(self):
+        """Called after new messages were queued so they are claimed without waiting for the poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim_loop(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                messages = await self.db.claim_outbox(datetime.datetime.utcnow(), self.lease_seconds, self.batch_size)
+                lease_expires = time.monotonic() + self.lease_seconds
+                for message in messages:
+                    await self._queue.put((message, lease_expires))
+                self._queue_depth.set(self._queue.qsize())
+                if len(messages) >= self.batch_size:
+                    # More is due, but claiming it now would start leases the workers cannot serve yet
+                    await self._queue.join()
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Outbox claim error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _worker(self):
+        while True:
+            message, lease_expires = await self._queue.get()
+            self._queue_depth.set(self._queue.qsize())
+            try:
+                await self._deliver(message, lease_expires)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Outbox worker error for message {message.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _renew_lease(self, message, lease_expires: float) -> float:
+        """The lease expiry after making sure the message is still ours, renewing past half the lease"""
+        if time.monotonic() < lease_expires - self.lease_seconds / 2:
+            return lease_expires
+        renewed_at = time.monotonic()
+        if not await self.db.renew_outbox(message.id, message.attempts, datetime.datetime.utcnow(), self.lease_seconds):
+            raise LeaseLost(f"notification {message.id} was claimed again")
+        return renewed_at + self.lease_seconds
+
+    async def _deliver(self, message, lease_expires: Optional[float] = None) -> bool:
+        if lease_expires is None:
+            lease_expires = time.monotonic() + self.lease_seconds
+        try:
+            payload = json.loads(message.payload)
+            markup = payload.get("reply_markup")
+            send_message = functools.partial(
+                self.bot.send_message,
+                chat_id=message.user_id,
+                text=payload["text"],
+                reply_markup=InlineKeyboardMarkup.model_validate(markup) if markup else None
+            )
+
+            async def send():
+                # Checked after the governor's wait, which is where the lease runs out
+                nonlocal lease_expires
+                lease_expires = await self._renew_lease(message, lease_expires)
+                return await send_message()
+
+            async with self.lanes.slot(payload.get("lane") or PriorityLanes.NORMAL):
+                if self.governor:
+                    await self.governor.send(message.user_id, send)
+                else:
+                    await send()
+        except LeaseLost as e:
+            # Whoever claimed it again sends it; neither ack nor fail this copy
+            self.logger.warning(f"Skipping {e}")
+            self._sends.inc(labels={"result": "lease_lost"})
+            return False
+        except self.PERMANENT_ERRORS as e:
+            self.logger.error(f"Dropping notification {message.id} for user {message.user_id}: {e}")
+            self._sends.inc(labels={"result": "dead"})
+            await self.db.fail_outbox(message.id, e)
+            return False
+        except Exception as e:
+            if message.attempts >= self.max_attempts:
+                self.logger.error(f"Giving up on notification {message.id} after {message.attempts} attempts: {e}")
+                self._sends.inc(labels={"result": "dead"})
+                await self.db.fail_outbox(message.id, e)
+            else:
+                delay = min(self.backoff_base * 2 ** (message.attempts - 1), self.backoff_max)
+                self.logger.warning(f"Notification {message.id} failed, retrying in {delay:.0f}s: {e}")
+                self._sends.inc(labels={"result": "retry"})
+                await self.db.fail_outbox(message.id, e, datetime.datetime.utcnow() + datetime.timedelta(seconds=delay))
+            return False
+
+        await self.db.ack_outbox([message.id])
+        self._sends.inc(labels={"result": "success"})
+        if payload.get("due_at") is not None:
+            self.lanes.record_lateness(payload.get("lane") or PriorityLanes.NORMAL, time.time() - payload["due_at"])
+        self.logger.info(f"Delivered reminder {message.reminder_id} to user {message.user_id}")
+        return True
+
+    async def flush(self) -> int:
+        """Deliver everything that is due right now; returns the number of messages delivered"""
+        delivered = 0
+        while True:
+            messages = await self.db.claim_outbox(datetime.datetime.utcnow(), self.lease_seconds, self.batch_size)
+            if not messages:
+                return delivered
+            lease_expires = time.monotonic() + self.lease_seconds
+            results = await asyncio.gather(*(self._deliver(message, lease_expires) for message in messages))
+            delivered += sum(results)
+
+    def stop(self):
+        self.logger.info("Stopping outbox dispatcher")
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        self._tasks = []
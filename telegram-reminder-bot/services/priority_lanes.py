@@ -0,0 +1,97 @@
+import asyncio
+import contextlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.metrics import MetricsRegistry
+
+
+DEFAULT_PRIORITY_LANES = {
+    "critical": ["medicine", "installment", "installment_retry"],
+    "high": ["bill", "birthday", "birthday_pre_week", "birthday_pre_three"],
+}
+
+DEFAULT_LANE_RESERVED = {
+    "critical": 10,
+    "high": 5,
+}
+
+
+class LaneStats:
+    """Running lateness figures for one lane"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, lateness: float):
+        self.count += 1
+        self.total += lateness
+        self.max = max(self.max, lateness)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class PriorityLanes:
+    """Maps reminder categories to ordered priority lanes.
+
+    Lanes are ranked in the order they are configured; categories not listed fall
+    into the normal lane, which always ranks last. Send capacity is shared, but a
+    lane may only use what the lanes ranked above it have not reserved, so a burst
+    of normal reminders cannot take every slot from medicine.
+    """
+
+    NORMAL = "normal"
+
+    def __init__(self, lanes: Optional[Dict[str, Sequence[str]]] = None,
+                 reserved: Optional[Dict[str, int]] = None, capacity: int = 30,
+                 metrics: Optional[MetricsRegistry] = None):
+        lanes = DEFAULT_PRIORITY_LANES if lanes is None else lanes
+        reserved = DEFAULT_LANE_RESERVED if reserved is None else reserved
+        self.lanes: List[Tuple[str, List[str]]] = [(name, list(categories)) for name, categories in lanes.items()]
+        self.order = [name for name, _ in self.lanes] + [self.NORMAL]
+        self._category_lane = {category: name for name, categories in self.lanes for category in categories}
+        self._total = asyncio.Semaphore(capacity)
+        self._lane_limits: Dict[str, asyncio.Semaphore] = {}
+        reserved_above = 0
+        for name in self.order:
+            self._lane_limits[name] = asyncio.Semaphore(max(1, capacity - reserved_above))
+            reserved_above += reserved.get(name, 0)
+        self.stats: Dict[str, LaneStats] = {name: LaneStats() for name in self.order}
+        self._lateness = (metrics or MetricsRegistry()).histogram(
+            "reminder_lateness_seconds", "Delivery time minus the reminder's due time"
+        )
+
+    def lane_for(self, category: str) -> str:
+        return self._category_lane.get(category, self.NORMAL)
+
+    def rank(self, lane: str) -> int:
+        return self.order.index(lane) if lane in self.order else len(self.order) - 1
+
+    def priority_lanes(self) -> List[Tuple[str, List[str]]]:
+        """Configured lanes, most urgent first, without the normal lane"""
+        return self.lanes
+
+    def sort(self, reminders):
+        """Order due reminders by lane, then by due time"""
+        return sorted(reminders, key=lambda r: (self.rank(self.lane_for(r.category)), r.due_at, r.id))
+
+    @contextlib.asynccontextmanager
+    async def slot(self, lane: str):
+        """Hold one send slot for lane"""
+        async with self._lane_limits.get(lane, self._lane_limits[self.NORMAL]):
+            async with self._total:
+                yield
+
+    def record_lateness(self, lane: str, lateness: float):
+        lateness = max(lateness, 0.0)
+        self.stats.setdefault(lane, LaneStats()).record(lateness)
+        self._lateness.observe(lateness, {"lane": lane})
+
+    def lateness_summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.summary() for name, stats in self.stats.items() if stats.count}
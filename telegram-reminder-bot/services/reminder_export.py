@@ -0,0 +1,131 @@
+"""Streaming export of a user's reminders, archived ones included, as ICS or JSONL.
+
+Rows are read from the database a page at a time and written straight to a
+file, so memory use does not depend on how many reminders a user has.
+"""
+import datetime
+import json
+import logging
+from typing import AsyncIterator, Optional, TextIO, Tuple
+
+from handlers.repeat_handler import RepeatHandler
+from services.reminder_import import pattern_to_rrule
+
+EXPORT_FORMATS = ("ics", "jsonl")
+
+# VEVENT STATUS has no "completed"; the reminder status is kept in X-REMINDER-STATUS
+ICS_STATUS = {"active": "CONFIRMED", "completed": "CONFIRMED", "cancelled": "CANCELLED"}
+
+
+def _parse_tz(tz: str) -> datetime.timedelta:
+    sign = 1 if tz.startswith("+") else -1
+    hours, minutes = tz[1:].split(":")
+    return datetime.timedelta(hours=sign * int(hours), minutes=sign * int(minutes))
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split inside a UTF-8 sequence
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+class ReminderExporter:
+    """Writes a user's reminders to a text file, one page of rows at a time"""
+
+    def __init__(self, db, repeat_handler: Optional[RepeatHandler] = None, page_size: int = 500):
+        self.db = db
+        self.repeat_handler = repeat_handler or RepeatHandler()
+        self.page_size = max(1, page_size)
+        self.logger = logging.getLogger(__name__)
+
+    async def rows(self, user_id: int) -> AsyncIterator[Tuple]:
+        """Hot reminders, then archived ones, each in id order"""
+        for archived in (False, True):
+            after_id = 0
+            while True:
+                page = await self.db.export_page(user_id, after_id, self.page_size, archived)
+                for row in page:
+                    yield row
+                if len(page) < self.page_size:
+                    break
+                after_id = page[-1][0]
+
+    async def export(self, user_id: int, fmt: str, out: TextIO) -> int:
+        """Write every reminder of user_id to out in fmt; returns how many were written"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        written = 0
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        if fmt == "ics":
+            out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Smart Reminder Bot//Export//EN\r\n")
+        async for row in self.rows(user_id):
+            out.write(self._ics_event(row, stamp) if fmt == "ics" else self._json_line(row))
+            written += 1
+        if fmt == "ics":
+            out.write("END:VCALENDAR\r\n")
+        self.logger.info(f"Exported {written} reminders for user {user_id} as {fmt}")
+        return written
+
+    def _local_time(self, time_utc: str, tz: str) -> str:
+        try:
+            dt = datetime.datetime.strptime(time_utc, "%Y-%m-%d %H:%M") + _parse_tz(tz)
+            return dt.strftime("%Y-%m-%d %H:%M")
+        except (ValueError, TypeError, AttributeError):
+            return time_utc
+
+    def _json_line(self, row) -> str:
+        rid, category, content, time_utc, tz, repeat, status = row
+        return json.dumps({
+            "id": rid,
+            "category": category,
+            "content": content,
+            "time": self._local_time(time_utc, tz),
+            "timezone": tz,
+            "repeat": json.loads(self.repeat_handler.to_json(self.repeat_handler.from_json(repeat))),
+            "status": status,
+        }, ensure_ascii=False) + "\n"
+
+    def _ics_event(self, row, stamp: str) -> str:
+        rid, category, content, time_utc, tz, repeat, status = row
+        pattern = self.repeat_handler.from_json(repeat)
+        start = time_utc
+        if pattern.count and pattern.start:
+            # COUNT is counted from the rule's first occurrence, not from the next one
+            try:
+                start = (datetime.datetime.strptime(pattern.start, "%Y-%m-%d %H:%M") - _parse_tz(tz)).strftime("%Y-%m-%d %H:%M")
+            except ValueError:
+                pass
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:reminder-{rid}@smart-reminder-bot",
+            f"DTSTAMP:{stamp}",
+            f"SUMMARY:{_escape(content or '')}",
+        ]
+        try:
+            lines.append(f"DTSTART:{datetime.datetime.strptime(start, '%Y-%m-%d %H:%M').strftime('%Y%m%dT%H%M%SZ')}")
+        except (ValueError, TypeError):
+            pass
+        rrule = pattern_to_rrule(pattern, tz) if tz else None
+        if rrule:
+            lines.append(f"RRULE:{rrule}")
+        if category:
+            lines.append(f"CATEGORIES:{_escape(category)}")
+        lines.append(f"STATUS:{ICS_STATUS.get(status, 'CONFIRMED')}")
+        lines.append(f"X-REMINDER-STATUS:{status}")
+        lines.append(f"X-REMINDER-REPEAT:{_escape(self.repeat_handler.to_json(pattern))}")
+        lines.append("END:VEVENT")
+        return "".join(_fold(line) for line in lines)
@@ -0,0 +1,339 @@
+"""Bulk import of reminders from iCalendar (.ics) and CSV files.
+
+Files are read line by line and parsed by generators, and rows are inserted
+in chunks with Database.add_many, so memory use does not depend on file size.
+Each chunk is parsed in a worker thread to keep the event loop free.
+"""
+import asyncio
+import csv
+import datetime
+import json
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from handlers.repeat_handler import RepeatHandler, RepeatPattern
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+
+SUPPORTED_EXTENSIONS = (".ics", ".csv")
+
+# Largest file the Bot API lets a bot download
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+
+# All-day events (DTSTART;VALUE=DATE) are reminded at this local time
+ALL_DAY_TIME = datetime.time(9, 0)
+
+RRULE_WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+RRULE_FREQUENCIES = {
+    "MINUTELY": ("interval", "minutes"),
+    "HOURLY": ("interval", "hours"),
+    "DAILY": ("daily", None),
+    "WEEKLY": ("weekly", None),
+    "MONTHLY": ("monthly", None),
+    "YEARLY": ("yearly", None),
+}
+
+
+def _parse_tz(tz: str) -> datetime.timedelta:
+    sign = 1 if tz.startswith("+") else -1
+    hours, minutes = tz[1:].split(":")
+    return datetime.timedelta(hours=sign * int(hours), minutes=sign * int(minutes))
+
+
+class ImportResult(NamedTuple):
+    imported: int
+    skipped: int  # rows that could not be parsed, ended in the past or used unsupported rules
+    limit_reached: bool  # stopped early at max_reminders_per_user
+
+
+def rrule_to_pattern(rrule: str) -> Optional[RepeatPattern]:
+    """Map an RFC 5545 RRULE value onto a RepeatPattern; None when it cannot be represented.
+
+    UNTIL is returned as given (UTC or floating); callers convert it to local time.
+    """
+    parts = {}
+    for part in rrule.strip().split(";"):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            parts[key.strip().upper()] = value.strip()
+    if parts.get("FREQ") not in RRULE_FREQUENCIES:
+        return None
+    repeat_type, unit = RRULE_FREQUENCIES[parts["FREQ"]]
+    try:
+        interval = int(parts.get("INTERVAL", "1"))
+        pattern = RepeatPattern(type=repeat_type, unit=unit, value=interval if unit or interval > 1 else None)
+        if "BYDAY" in parts:
+            days = [RRULE_WEEKDAYS.get(day.strip().upper()) for day in parts["BYDAY"].split(",")]
+            # Ordinal weekdays such as 2MO ("second Monday") have no RepeatPattern equivalent
+            if None in days or repeat_type not in ("daily", "weekly"):
+                return None
+            # DAILY keeps counting INTERVAL in days and only keeps the listed weekdays
+            pattern.weekdays = sorted(set(days))
+        if "BYMONTHDAY" in parts:
+            pattern.month_days = [int(day) for day in parts["BYMONTHDAY"].split(",")]
+        if "COUNT" in parts:
+            pattern.count = int(parts["COUNT"])
+        if "UNTIL" in parts:
+            pattern.until = parts["UNTIL"]
+    except ValueError:
+        return None
+    unsupported = set(parts) - {"FREQ", "INTERVAL", "BYDAY", "BYMONTHDAY", "COUNT", "UNTIL", "WKST"}
+    return None if unsupported else pattern
+
+
+def pattern_to_rrule(pattern: RepeatPattern, timezone: str) -> Optional[str]:
+    """RRULE value for a RepeatPattern, or None for one-off and non-Gregorian patterns.
+
+    UNTIL is converted from local time in timezone to UTC.
+    """
+    if pattern.type == "none" or pattern.calendar in ("shamsi", "qamari"):
+        return None
+    if pattern.type == "interval":
+        units = {"minutes": ("MINUTELY", 1), "hours": ("HOURLY", 1), "days": ("DAILY", 1)}
+        if pattern.unit not in units or not pattern.value:
+            return None
+        freq, interval = units[pattern.unit][0], pattern.value
+    else:
+        freq = {"daily": "DAILY", "weekly": "WEEKLY", "monthly": "MONTHLY", "yearly": "YEARLY"}.get(pattern.type)
+        if freq is None:
+            return None
+        interval = pattern.value or 1
+    parts = [f"FREQ={freq}"]
+    if interval > 1:
+        parts.append(f"INTERVAL={interval}")
+    names = {v: k for k, v in RRULE_WEEKDAYS.items()}
+    if pattern.by_weekdays():
+        parts.append("BYDAY=" + ",".join(names[d] for d in pattern.by_weekdays()))
+    if pattern.by_month_days():
+        parts.append("BYMONTHDAY=" + ",".join(str(d) for d in pattern.by_month_days()))
+    if pattern.count:
+        parts.append(f"COUNT={pattern.count}")
+    if pattern.until:
+        try:
+            until = datetime.datetime.strptime(pattern.until, "%Y-%m-%d %H:%M")
+        except ValueError:
+            until = datetime.datetime.strptime(pattern.until, "%Y-%m-%d").replace(hour=23, minute=59)
+        parts.append("UNTIL=" + (until - _parse_tz(timezone)).strftime("%Y%m%dT%H%M%SZ"))
+    return ";".join(parts)
+
+
+def _ics_datetime(value: str, params: Dict[str, str], timezone: str) -> Optional[datetime.datetime]:
+    """Local time in timezone for an ICS DATE or DATE-TIME value"""
+    value = value.strip()
+    try:
+        if params.get("VALUE") == "DATE" or len(value) == 8:
+            return datetime.datetime.combine(datetime.datetime.strptime(value, "%Y%m%d").date(), ALL_DAY_TIME)
+        if value.endswith("Z"):
+            return datetime.datetime.strptime(value[:-1], "%Y%m%dT%H%M%S") + _parse_tz(timezone)
+        dt = datetime.datetime.strptime(value, "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None
+    tzid = params.get("TZID")
+    if tzid and ZoneInfo is not None:
+        try:
+            aware = dt.replace(tzinfo=ZoneInfo(tzid))
+        except (ZoneInfoNotFoundError, ValueError):
+            # Unknown zone: treat the time as floating, i.e. already local
+            return dt
+        return aware.astimezone(datetime.timezone.utc).replace(tzinfo=None) + _parse_tz(timezone)
+    return dt
+
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Join RFC 5545 folded lines (continuations start with a space or tab)"""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _unescape(text: str) -> str:
+    return text.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def iter_ics(lines: Iterable[str], timezone: str) -> Iterator[Optional[dict]]:
+    """Yield one raw reminder dict per VEVENT, or None for an event that cannot be read.
+
+    Times are local to timezone; "rule" holds the RepeatPattern or None for
+    one-off events.
+    """
+    event = None
+    for line in _unfold(lines):
+        name, _, value = line.partition(":")
+        name, *raw_params = name.split(";")
+        name = name.upper()
+        if name == "BEGIN" and value.strip().upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.strip().upper() == "VEVENT" and event is not None:
+            yield _event_reminder(event, timezone)
+            event = None
+        elif event is not None and name in ("SUMMARY", "DTSTART", "RRULE", "CATEGORIES") and name not in event:
+            params = dict(p.split("=", 1) for p in raw_params if "=" in p)
+            event[name] = (value, {k.upper(): v.strip('"') for k, v in params.items()})
+
+
+def _event_reminder(event: dict, timezone: str) -> Optional[dict]:
+    if "DTSTART" not in event or not event.get("SUMMARY", ("",))[0].strip():
+        return None
+    start = _ics_datetime(event["DTSTART"][0], event["DTSTART"][1], timezone)
+    if start is None:
+        return None
+    rule = None
+    if "RRULE" in event:
+        rule = rrule_to_pattern(event["RRULE"][0])
+        if rule is None:
+            return None
+        if rule.until:
+            until = _ics_datetime(rule.until, {}, timezone)
+            if until is None:
+                return None
+            rule.until = until.strftime("%Y-%m-%d %H:%M")
+    category = event.get("CATEGORIES", ("",))[0].split(",")[0].strip().lower() or None
+    return {"content": _unescape(event["SUMMARY"][0]).strip(), "start": start, "rule": rule, "category": category}
+
+
+def iter_csv(lines: Iterable[str], timezone: str, repeat_handler: RepeatHandler) -> Iterator[Optional[dict]]:
+    """Yield one raw reminder dict per CSV row, or None for a row that cannot be read.
+
+    Columns are content, time ("YYYY-MM-DD HH:MM" local) and optionally
+    repeat (none/daily/..., repeat JSON or an RRULE), category and timezone.
+    """
+    for row in csv.DictReader(lines):
+        row = {(k or "").strip().lower(): v.strip() if isinstance(v, str) else "" for k, v in row.items()}
+        content = row.get("content") or row.get("summary") or row.get("title")
+        try:
+            start = datetime.datetime.strptime(row.get("time", ""), "%Y-%m-%d %H:%M")
+            row_tz = row.get("timezone") or timezone
+            start += _parse_tz(timezone) - _parse_tz(row_tz)
+        except (ValueError, IndexError):
+            yield None
+            continue
+        if not content:
+            yield None
+            continue
+        repeat = row.get("repeat") or "none"
+        if repeat.upper().startswith(("FREQ=", "RRULE:")):
+            rule = rrule_to_pattern(repeat.split(":", 1)[-1])
+            if rule is None:
+                yield None
+                continue
+            if rule.until:
+                until = _ics_datetime(rule.until, {}, timezone)
+                if until is None:
+                    yield None
+                    continue
+                rule.until = until.strftime("%Y-%m-%d %H:%M")
+        else:
+            rule = repeat_handler.from_json(repeat)
+            rule = None if rule.type == "none" else rule
+        yield {"content": content, "start": start, "rule": rule, "category": row.get("category") or None}
+
+
+class ReminderImporter:
+    """Streams an uploaded .ics or .csv file into a user's reminders"""
+
+    def __init__(self, db, repeat_handler: Optional[RepeatHandler] = None, max_reminders: int = 0,
+                 chunk_size: int = 500, default_category: str = "general", max_content_length: int = 1000):
+        self.db = db
+        self.repeat_handler = repeat_handler or RepeatHandler()
+        self.max_reminders = max_reminders
+        self.chunk_size = max(1, chunk_size)
+        self.default_category = default_category
+        self.max_content_length = max_content_length
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_supported(file_name: Optional[str]) -> bool:
+        return bool(file_name) and os.path.splitext(file_name)[1].lower() in SUPPORTED_EXTENSIONS
+
+    def _to_reminder(self, raw: Optional[dict], timezone: str, now_local: datetime.datetime) -> Optional[dict]:
+        """Reminder for add_many at its next occurrence, or None when it is invalid or over"""
+        if raw is None:
+            return None
+        rule = raw["rule"]
+        if rule is None:
+            if raw["start"] <= now_local:
+                return None
+            time, repeat = raw["start"], json.dumps({"type": "none"})
+        else:
+            if not self.repeat_handler.is_valid_pattern(rule):
+                return None
+            if rule.count:
+                # COUNT is counted from DTSTART, so the rule keeps it as its anchor
+                rule.start = raw["start"].strftime("%Y-%m-%d %H:%M")
+            after = max(raw["start"] - datetime.timedelta(minutes=1), now_local)
+            time = next(self.repeat_handler.iter_occurrences(rule, raw["start"], after=after), None)
+            if time is None:
+                return None
+            repeat = self.repeat_handler.to_json(rule)
+        return {
+            "category": raw["category"] or self.default_category,
+            "content": raw["content"][:self.max_content_length],
+            "time": time.strftime("%Y-%m-%d %H:%M"),
+            "timezone": timezone,
+            "repeat": repeat,
+        }
+
+    def iter_reminders(self, lines: Iterable[str], file_name: str, timezone: str) -> Iterator[Optional[dict]]:
+        now_local = datetime.datetime.utcnow() + _parse_tz(timezone)
+        if file_name.lower().endswith(".ics"):
+            rows = iter_ics(lines, timezone)
+        else:
+            rows = iter_csv(lines, timezone, self.repeat_handler)
+        for raw in rows:
+            yield self._to_reminder(raw, timezone, now_local)
+
+    @staticmethod
+    def _next_chunk(reminders: Iterator[Optional[dict]], size: int):
+        """Up to size reminders from reminders and how many invalid ones were skipped on the way"""
+        chunk: List[dict] = []
+        skipped = 0
+        for reminder in reminders:
+            if reminder is None:
+                skipped += 1
+                continue
+            chunk.append(reminder)
+            if len(chunk) >= size:
+                break
+        return chunk, skipped
+
+    async def import_file(self, user_id: int, path: str, file_name: str, timezone: str) -> ImportResult:
+        """Import every reminder of the file at path, stopping at max_reminders active reminders"""
+        remaining = None
+        if self.max_reminders > 0:
+            remaining = max(0, self.max_reminders - await self.db.active_count(user_id))
+        imported = skipped = 0
+        limit_reached = False
+        f = await asyncio.to_thread(open, path, "r", encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            reminders = self.iter_reminders(f, file_name, timezone)
+            while True:
+                room = self.chunk_size if remaining is None else min(self.chunk_size, remaining - imported)
+                # With no room left, one more reminder tells whether the file had more to import
+                chunk, chunk_skipped = await asyncio.to_thread(self._next_chunk, reminders, max(room, 1))
+                skipped += chunk_skipped
+                if not chunk:
+                    break
+                if room <= 0:
+                    limit_reached = True
+                    break
+                imported += len(await self.db.add_many(user_id, chunk))
+                if len(chunk) < room:
+                    break
+        finally:
+            f.close()
+        self.logger.info(f"Imported {imported} reminders for user {user_id}, skipped {skipped}")
+        return ImportResult(imported, skipped, limit_reached)
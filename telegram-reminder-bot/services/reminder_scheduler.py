@@ -1,29 +1,113 @@
 import asyncio
+import calendar
 import datetime
+import heapq
 import logging
 import os
-from typing import Optional
+import socket
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from handlers.repeat_handler import RepeatHandler
 from config.interfaces import IScheduler, INotificationService
-from services.notification_strategies import NotificationContext, NotificationStrategyFactory
+from services.notification_strategies import NotificationContext, NotificationStrategyFactory, render_notification
+from services.outbox_dispatcher import OutboxDispatcher, encode_notification
 from services.reminder_types import ReminderFactory
+from services.send_governor import SendGovernor
+from services.priority_lanes import PriorityLanes
+from services.metrics import DEFAULT_SIZE_BUCKETS, MetricsRegistry
+
+
+def _parse_tz(tz: str) -> datetime.timedelta:
+    sign = 1 if tz.startswith("+") else -1
+    hours, minutes = tz[1:].split(":")
+    return datetime.timedelta(hours=sign * int(hours), minutes=sign * int(minutes))
+
+
+def _next_trigger(occurs_at: int, lead_times, after: int) -> Optional[int]:
+    later = [t for t in [occurs_at - lead for lead in lead_times] + [occurs_at] if t > after]
+    return min(later) if later else None
+
+
+@dataclass
+class TickOutcome:
+    """State changes collected during a tick and committed together"""
+    completed: List[int] = field(default_factory=list)
+    rescheduled: Dict[int, tuple] = field(default_factory=dict)  # id -> (local time, timezone[, next due_at])
+    cancelled: List[int] = field(default_factory=list)
+    notifications: List[Tuple[int, int, str, int]] = field(default_factory=list)  # (id, user_id, payload, priority)
+
+    def __len__(self) -> int:
+        return len(self.completed) + len(self.rescheduled) + len(self.cancelled) + len(self.notifications)
 
 
 class ReminderScheduler(IScheduler):
-    def __init__(self, db, json_storage, bot, notification_context: Optional[NotificationContext] = None):
+    MODE_POLL = "poll"
+    MODE_HEAP = "heap"
+    CATCH_UP_ONCE = "once"
+    CATCH_UP_SUMMARY = "summary"
+
+    # Unpaid installments and bills are followed by daily retries
+    RETRY_PARENT_CATEGORIES = ("installment", "bill")
+    RETRY_CATEGORY = "installment_retry"
+    MAX_RETRIES = 3
+
+    # Lead times with their own wording; others read "N days until ..."
+    LEAD_TIME_KEYS = {7 * 86400: "birthday_week_before", 3 * 86400: "birthday_three_days_before"}
+
+    # Most deadlines loaded into the heap per horizon reload
+    HEAP_LOAD_LIMIT = 10000
+
+    # The hourly cleanup rebuilds the stats counters from scratch once a day
+    STATS_RECONCILE_EVERY = 24
+
+    def __init__(self, db, json_storage, bot, notification_context: Optional[NotificationContext] = None,
+                 mode: str = MODE_POLL, poll_interval: float = 60, heap_horizon: float = 3600,
+                 batch_size: int = 500, drain: bool = False, governor: Optional[SendGovernor] = None,
+                 outbox: Optional[OutboxDispatcher] = None, instance_id: Optional[str] = None,
+                 lease_seconds: int = 300, lanes: Optional[PriorityLanes] = None,
+                 metrics: Optional[MetricsRegistry] = None, catch_up: str = CATCH_UP_ONCE):
         self.db = db
         self.json_storage = json_storage
         self.bot = bot
         self.task: Optional[asyncio.Task] = None
         self.cleanup_task: Optional[asyncio.Task] = None
-        self.processing_semaphore = asyncio.Semaphore(30)
+        # Send slots are shared between priority lanes, with capacity reserved for the urgent ones
+        self.metrics = metrics or MetricsRegistry()
+        self.lanes = lanes or PriorityLanes(metrics=self.metrics)
+        self._tick_seconds = self.metrics.histogram("scheduler_tick_seconds", "Time to process all due reminders of a tick")
+        self._page_size = self.metrics.histogram(
+            "scheduler_batch_size", "Due reminders claimed per page", buckets=DEFAULT_SIZE_BUCKETS
+        )
+        self._sends = self.metrics.counter("notification_sends_total", "Notification send attempts by result")
+        self._in_flight = self.metrics.gauge("scheduler_in_flight", "Due reminders waiting for or holding a send slot")
+        self.mode = mode if mode in (self.MODE_POLL, self.MODE_HEAP) else self.MODE_POLL
+        self.poll_interval = poll_interval
+        self.heap_horizon = heap_horizon
+        self.batch_size = max(1, batch_size)
+        self.drain = drain
+        # Overdue recurring reminders jump straight past now; "summary" also tells the user how many were missed
+        self.catch_up = catch_up if catch_up in (self.CATCH_UP_ONCE, self.CATCH_UP_SUMMARY) else self.CATCH_UP_ONCE
+        # With an outbox, rendered notifications are queued in the tick's transaction and sent by its workers
+        self.outbox = outbox
+        # Due reminders are leased to this instance so several replicas can share one database
+        self.instance_id = instance_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        # Min-heap of (utc_time, reminder_id) deadlines inside the current horizon (heap mode only)
+        self._heap: List[Tuple[datetime.datetime, int]] = []
+        self._horizon_end: Optional[datetime.datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
         self.logger = logging.getLogger(__name__)
         self.repeat_handler = RepeatHandler()
+        self._cleanups = 0
         self.reminder_factory = ReminderFactory()
         
         # Use dependency injection for notification strategy
         self.notification_context = notification_context or NotificationContext(
-            NotificationStrategyFactory.create("standard")
+            NotificationStrategyFactory.create("standard", governor=governor)
         )
         
         self._load_locales()
@@ -54,41 +138,209 @@ class ReminderScheduler(IScheduler):
         return text
 
     def start(self):
-        self.task = asyncio.get_event_loop().create_task(self._loop())
-        self.cleanup_task = asyncio.get_event_loop().create_task(self._cleanup_loop())
+        loop = asyncio.get_event_loop()
+        if self.mode == self.MODE_HEAP:
+            self._event_loop = loop
+            self._wakeup = asyncio.Event()
+            self.db.add_time_listener(self._on_deadline)
+            self.task = loop.create_task(self._heap_loop())
+        else:
+            self.task = loop.create_task(self._loop())
+        self.cleanup_task = loop.create_task(self._cleanup_loop())
 
     async def _loop(self):
         while True:
             try:
                 # Check if database connection is still open
                 try:
-                    with self.db.lock:
-                        self.db.conn.execute("SELECT 1")
+                    await self.db.ping()
                 except Exception as e:
                     self.logger.error(f"Database connection lost: {e}")
                     break
                     
-                now = datetime.datetime.utcnow()
-                due_reminders = self.db.due(now, limit=500)
-                
-                if due_reminders:
-                    self.logger.info(f"Processing {len(due_reminders)} due reminders")
-                    tasks = []
-                    for rid, uid, cat, content, time_str, tz, repeat in due_reminders:
-                        if self._validate_reminder_data(rid, uid, cat, content, time_str, repeat):
-                            task = self._process_reminder(rid, uid, cat, content, time_str, repeat)
-                            tasks.append(task)
-                    
-                    if tasks:
-                        results = await asyncio.gather(*tasks, return_exceptions=True)
-                        for i, result in enumerate(results):
-                            if isinstance(result, Exception):
-                                self.logger.error(f"Task {i} failed: {result}")
-                
-                await asyncio.sleep(60)
+                await self._process_due(datetime.datetime.utcnow())
+                await asyncio.sleep(self.poll_interval)
             except Exception as e:
                 self.logger.error(f"Scheduler loop error: {e}")
-                await asyncio.sleep(60)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _heap_loop(self):
+        """Sleep until the earliest known deadline instead of polling the database"""
+        while True:
+            try:
+                # Clear before inspecting the heap so a deadline pushed meanwhile still wakes us
+                self._wakeup.clear()
+                now = datetime.datetime.utcnow()
+                if self._horizon_end is None or now >= self._horizon_end:
+                    await self._reload_heap(now)
+
+                if self._heap and self._heap[0][0] <= now:
+                    while self._heap and self._heap[0][0] <= now:
+                        heapq.heappop(self._heap)
+                    # Popped deadlines may stand for more rows than one page holds
+                    try:
+                        await self._process_due(now, until_empty=True)
+                        retry_at = await self.db.next_claimable(now)
+                    except Exception as e:
+                        self.logger.error(f"Heap scheduler tick error: {e}")
+                        retry_at = now
+                    if retry_at is not None:
+                        # Rows leased elsewhere, or left behind by a failed tick, lost their deadline
+                        # when it was popped; look again once they can be claimed, like a poll would
+                        retry_at = max(retry_at, now + datetime.timedelta(seconds=self.poll_interval))
+                        self._push_deadline(0, retry_at)
+                    continue
+
+                deadline = self._horizon_end
+                if self._heap and self._heap[0][0] < deadline:
+                    deadline = self._heap[0][0]
+                timeout = max((deadline - now).total_seconds(), 0)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Heap scheduler loop error: {e}")
+                await asyncio.sleep(1)
+
+    async def _reload_heap(self, now: datetime.datetime):
+        self._horizon_end = now + datetime.timedelta(seconds=self.heap_horizon)
+        self._heap = await self.db.upcoming(self._horizon_end, self.HEAP_LOAD_LIMIT)
+        if len(self._heap) >= self.HEAP_LOAD_LIMIT:
+            # Deadlines past the last loaded one were cut off, so reload once it is reached
+            self._horizon_end = self._heap[-1][0]
+        heapq.heapify(self._heap)
+        self.logger.debug(f"Loaded {len(self._heap)} deadlines until {self._horizon_end}")
+
+    def _on_deadline(self, rid: int, dt_utc: datetime.datetime):
+        """Database time listener; may be called from any thread"""
+        if self._event_loop is None or self._event_loop.is_closed():
+            return
+        try:
+            self._event_loop.call_soon_threadsafe(self._push_deadline, rid, dt_utc)
+        except RuntimeError:
+            pass
+
+    def _push_deadline(self, rid: int, dt_utc: datetime.datetime):
+        if self._horizon_end is None or dt_utc >= self._horizon_end:
+            return
+        is_earliest = not self._heap or dt_utc < self._heap[0][0]
+        heapq.heappush(self._heap, (dt_utc, rid))
+        if is_earliest and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self, now: datetime.datetime):
+        """Claim a page, filling it from the priority lanes before the normal lane"""
+        page = []
+        for lane, categories in self.lanes.priority_lanes():
+            if len(page) >= self.batch_size:
+                break
+            page += await self.db.claim_due(now, self.instance_id, self.lease_seconds, self.batch_size - len(page), categories)
+        if len(page) < self.batch_size:
+            page += await self.db.claim_due(now, self.instance_id, self.lease_seconds, self.batch_size - len(page))
+        return page
+
+    async def _process_due(self, now: datetime.datetime, until_empty: bool = False):
+        started = time.monotonic()
+        try:
+            await self._process_claimed(now, until_empty)
+        finally:
+            self._tick_seconds.observe(time.monotonic() - started)
+
+    async def _process_claimed(self, now: datetime.datetime, until_empty: bool = False):
+        page = await self._claim(now)
+        if not self.drain:
+            await self._process_page(page)
+            # Heap mode has no next poll to pick up the rest, so claim until a short page
+            while until_empty and len(page) >= self.batch_size:
+                page = await self._claim(now)
+                await self._process_page(page)
+            return
+
+        # Drain mode: keep claiming pages until the backlog is empty. Claimed rows are
+        # leased, so the next page is claimed while the previous one is still sending.
+        started = time.monotonic()
+        total = 0
+        pages = 0
+        in_flight = deque()
+        while page:
+            pages += 1
+            total += len(page)
+            next_page = None
+            if len(page) >= self.batch_size:
+                next_page = asyncio.ensure_future(self._claim(now))
+            in_flight.append(asyncio.ensure_future(self._process_page(page)))
+            if len(in_flight) > 1:
+                await in_flight.popleft()
+            page = await next_page if next_page else []
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+        if pages > 1:
+            elapsed = time.monotonic() - started
+            rate = total / elapsed if elapsed > 0 else float(total)
+            self.logger.info(f"Drained {total} due reminders in {pages} pages over {elapsed:.1f}s ({rate:.0f}/s)")
+
+    async def _process_page(self, due_reminders):
+        if not due_reminders:
+            return
+        self.logger.info(f"Processing {len(due_reminders)} due reminders")
+        self._page_size.observe(len(due_reminders))
+        outcome = TickOutcome()
+        next_times = self._next_times(due_reminders)
+        tasks = []
+        for r in self.lanes.sort(due_reminders):
+            if self._validate_reminder_data(r.id, r.user_id, r.category, r.content, r.time, r.repeat):
+                task = self._process_reminder(r.id, r.user_id, r.category, r.content, r.time, r.timezone, r.repeat, outcome,
+                                              due_at=r.due_at, next_time=next_times.get(r.id),
+                                              occurs_at=r.occurs_at, lead_times=r.lead_times)
+                tasks.append(task)
+
+        if tasks:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for i, result in enumerate(results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Task {i} failed: {result}")
+
+        await self._commit_outcome(outcome)
+
+    async def _commit_outcome(self, outcome: TickOutcome):
+        """Apply a tick's state changes in as few transactions as batch_size allows.
+
+        Each reminder's notification is committed with its state change, and
+        only while this instance still holds the reminder's lease.
+        """
+        if not outcome:
+            return
+        ids = outcome.completed + list(outcome.rescheduled) + outcome.cancelled
+        step = self.batch_size
+        for start in range(0, len(ids), step):
+            chunk = set(ids[start:start + step])
+            try:
+                changed = await self.db.commit_tick(
+                    [rid for rid in outcome.completed if rid in chunk],
+                    {rid: change for rid, change in outcome.rescheduled.items() if rid in chunk},
+                    [rid for rid in outcome.cancelled if rid in chunk],
+                    [n for n in outcome.notifications if n[0] in chunk],
+                    owner=self.instance_id
+                )
+                if changed < len(chunk):
+                    self.logger.warning(f"{len(chunk) - changed} reminders were claimed again before this tick committed")
+            except Exception as e:
+                self.logger.error(f"Failed to commit tick results: {e}")
+        if self.outbox and outcome.notifications:
+            self.outbox.wake()
+        elif not self.outbox:
+            self._log_lateness()
+
+    def _log_lateness(self):
+        summary = self.lanes.lateness_summary()
+        if summary:
+            self.logger.info("Lateness by lane - " + ", ".join(
+                f"{lane}: n={s['count']} avg={s['avg']:.1f}s max={s['max']:.1f}s" for lane, s in summary.items()
+            ))
                 
     def _validate_reminder_data(self, rid, uid, cat, content, time_str, repeat) -> bool:
         if not all([rid, uid, cat, content, time_str, repeat]):
@@ -102,117 +354,152 @@ class ReminderScheduler(IScheduler):
             return False
         return True
 
-    async def _process_reminder(self, rid, uid, cat, content, time_str, repeat):
-        async with self.processing_semaphore:
+    async def _process_reminder(self, rid, uid, cat, content, time_str, tz, repeat, outcome: TickOutcome,
+                                due_at: Optional[int] = None, next_time: Optional[Tuple[Optional[str], int]] = None,
+                                occurs_at: Optional[int] = None, lead_times: Tuple[int, ...] = ()):
+        lane = self.lanes.lane_for(cat)
+        self._in_flight.inc()
+        async with self.lanes.slot(lane):
             try:
-                await self._send_reminder(rid, uid, cat, content, repeat)
+                lead = 0
+                now_ts = int(time.time())
+                if lead_times and occurs_at is not None and due_at is not None and due_at < occurs_at and now_ts < occurs_at:
+                    # After an outage only the latest alert that came due is sent, and none at all
+                    # once the occurrence itself is due, so "a week until" never follows the day
+                    lead = min((l for l in lead_times if occurs_at - l <= now_ts), default=occurs_at - due_at)
+                new_time, missed = None, 0
+                if next_time is not None:
+                    new_time, missed = next_time
+                elif not self._is_one_time(repeat):
+                    new_time, missed = self._next_time(time_str, repeat, tz)
+                if self.catch_up != self.CATCH_UP_SUMMARY:
+                    missed = 0
+
+                if self.outbox:
+                    payload = self._render_reminder(rid, uid, cat, content, repeat, lane, due_at, missed, lead)
+                    outcome.notifications.append((rid, uid, payload, self.lanes.rank(lane)))
+                else:
+                    await self._send_reminder(rid, uid, cat, content, repeat, missed, lead)
+                    self._sends.inc(labels={"result": "success"})
+                    if due_at is not None:
+                        self.lanes.record_lateness(lane, time.time() - due_at)
+
+                if lead:
+                    # An advance alert: the occurrence stays put and the next trigger is armed
+                    next_due = _next_trigger(occurs_at, lead_times, max(due_at, now_ts))
+                    outcome.rescheduled[rid] = (time_str, tz, next_due or occurs_at)
+                    self.logger.info(f"Sent advance alert for reminder {rid}, {lead // 3600}h ahead")
+                    return
                 
-                # Handle installment special case
-                if cat == "installment":
-                    await self._handle_installment_reminder(rid, uid, time_str, repeat)
-                elif repeat == "none":
-                    self.db.update_status(rid, "completed")
+                # Installments and bills keep reminding daily until paid
+                if cat in self.RETRY_PARENT_CATEGORIES or cat == self.RETRY_CATEGORY:
+                    await self._schedule_retry(rid, cat, time_str)
+                if cat == self.RETRY_CATEGORY or self._is_one_time(repeat):
+                    outcome.completed.append(rid)
                     self.logger.info(f"Completed one-time reminder {rid} for user {uid}")
                 else:
-                    # Get timezone for this reminder
-                    try:
-                        with self.db.lock:
-                            cur = self.db.conn.cursor()
-                            cur.execute("select timezone from reminders where id=?", (rid,))
-                            row = cur.fetchone()
-                            cur.close()
-                        tz = row[0] if row else "+00:00"
-                    except Exception as e:
-                        self.logger.error(f"Error getting timezone for reminder {rid}: {e}")
-                        tz = "+00:00"
-                    new_time = self._next_time(time_str, repeat, tz)
                     if new_time:
-                        self.db.update_time(rid, new_time)
+                        outcome.rescheduled[rid] = (new_time, tz, *self._lead_trigger(new_time, tz, lead_times))
                         self.logger.info(f"Updated recurring reminder {rid} to {new_time}")
+                    elif self.repeat_handler.from_json(repeat).has_end():
+                        outcome.completed.append(rid)
+                        self.logger.info(f"Recurring reminder {rid} reached the end of its rule")
                     else:
                         self.logger.error(f"Failed to calculate next time for reminder {rid}")
-                        self.db.update_status(rid, "cancelled")
+                        outcome.cancelled.append(rid)
             except Exception as e:
                 self.logger.error(f"Error processing reminder {rid}: {e}")
-                try:
-                    self.db.update_status(rid, "cancelled")
-                except Exception as db_error:
-                    self.logger.error(f"Failed to cancel reminder {rid}: {db_error}")
+                if not self.outbox:
+                    self._sends.inc(labels={"result": "failure"})
+                outcome.cancelled.append(rid)
+            finally:
+                self._in_flight.dec()
 
-    async def _handle_installment_reminder(self, rid, uid, time_str, repeat):
-        """Handle special logic for installment reminders - repeat for 3 days if not paid"""
+    def _is_one_time(self, repeat: str) -> bool:
+        # One-time reminders are stored both as "none" and as the default '{"type": "none"}'
+        return repeat == "none" or self.repeat_handler.from_json(repeat).type == "none"
+
+    @staticmethod
+    def _lead_trigger(new_time: str, tz: str, lead_times) -> Tuple[int, ...]:
+        """The first advance alert still ahead for the new occurrence, if any"""
+        if not lead_times:
+            return ()
+        dt_utc = datetime.datetime.strptime(new_time, "%Y-%m-%d %H:%M") - _parse_tz(tz)
+        occurs_at = calendar.timegm(dt_utc.timetuple())
+        next_due = _next_trigger(occurs_at, lead_times, int(time.time()))
+        return (next_due,) if next_due and next_due < occurs_at else ()
+
+    async def _schedule_retry(self, rid, cat, time_str):
+        """Queue the next daily retry of an unpaid installment or bill.
+
+        The parent itself moves on to its next cycle like any recurring reminder;
+        each retry links to it by parent_id and queues the one after it, up to
+        MAX_RETRIES. Paying or stopping cancels the pending retry, ending the chain.
+        Each retry is copied from the one before it, so the chain goes on after a
+        one-time parent has completed or been archived.
+        """
         try:
-            # Check how many times this installment has been sent
-            with self.db.lock:
-                cur = self.db.conn.cursor()
-                cur.execute(
-                    "select count(*) from reminders where user_id=? and category='installment_retry' and content like ?",
-                    (uid, f"%{rid}%")
-                )
-                retry_count = cur.fetchone()[0] if cur.fetchone() else 0
-                cur.close()
-            
-            if retry_count < 3:
-                # Create retry reminder for next day
-                dt_local = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M")
-                next_day = dt_local + datetime.timedelta(days=1)
-                
-                # Add retry reminder
-                self.db.add(
-                    uid,
-                    "installment_retry", 
-                    f"Retry #{retry_count + 1} for reminder {rid}",
-                    next_day.strftime("%Y-%m-%d %H:%M"),
-                    "+00:00",  # Will be converted properly
-                    '{"type": "none"}'
-                )
-                self.logger.info(f"Created installment retry {retry_count + 1} for reminder {rid}")
+            source_id = None
+            if cat == self.RETRY_CATEGORY:
+                link = await self.db.follow_up_of(rid)
+                if link is None:
+                    return
+                parent_id, retry_count = link
+                source_id = rid
             else:
-                # After 3 retries, continue with normal recurring pattern
-                if repeat != "none":
-                    new_time = self._next_time(time_str, repeat, "+00:00")
-                    if new_time:
-                        self.db.update_time(rid, new_time)
-                        self.logger.info(f"Updated installment reminder {rid} to next cycle: {new_time}")
-                    else:
-                        self.db.update_status(rid, "cancelled")
-                else:
-                    self.db.update_status(rid, "completed")
-                    
+                # A new cycle starts a new chain
+                parent_id, retry_count = rid, 0
+                await self.db.cancel_follow_ups(rid)
+            if retry_count >= self.MAX_RETRIES:
+                return
+            next_day = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M") + datetime.timedelta(days=1)
+            retry_id = await self.db.add_follow_up(
+                parent_id, self.RETRY_CATEGORY, next_day.strftime("%Y-%m-%d %H:%M"), retry_count + 1, source_id
+            )
+            if retry_id:
+                self.logger.info(f"Created retry {retry_count + 1} ({retry_id}) for reminder {parent_id}")
         except Exception as e:
-            self.logger.error(f"Error handling installment reminder {rid}: {e}")
+            self.logger.error(f"Error scheduling retry for reminder {rid}: {e}")
 
     async def _cleanup_loop(self):
+        # Archiving, purging and WAL upkeep are left to DatabaseMaintenance
         while True:
             try:
                 await asyncio.sleep(3600)
                 
                 # Check if database connection is still open
                 try:
-                    with self.db.lock:
-                        self.db.conn.execute("SELECT 1")
+                    await self.db.ping()
                 except Exception as e:
                     self.logger.error(f"Database connection lost in cleanup: {e}")
                     break
                     
-                deleted = self.db.cleanup_old_reminders(30)
-                if deleted > 0:
-                    self.logger.info(f"Cleaned up {deleted} old reminders")
-                    
-                stats = self.db.get_stats()
+                self._cleanups += 1
+                if self._cleanups % self.STATS_RECONCILE_EVERY == 0:
+                    drifted = await self.db.reconcile_stats()
+                    if drifted:
+                        self.logger.warning(f"Rebuilt stats counters; {drifted} had drifted")
+
+                stats = await self.db.get_stats()
                 if stats:
-                    self.logger.info(f"Database stats - Total: {stats[0]}, Active: {stats[1]}, Users: {stats[4]}")
+                    self.logger.info(
+                        f"Database stats - Total: {stats['total']}, Active: {stats['active']}, Users: {stats['unique_users']}"
+                    )
             except Exception as e:
                 self.logger.error(f"Cleanup error: {e}")
 
-    async def _send_reminder(self, rid, uid, category, content, repeat):
+    def _reminder_data(self, rid, uid, category, content, repeat, missed=0, lead=0):
         try:
             user_lang = self.json_storage.get_user_language(uid)
-            safe_content = str(content)[:500] if content else "No content"
         except Exception as e:
             self.logger.error(f"Error getting user language for {uid}: {e}")
             user_lang = "en"
-            safe_content = str(content)[:500] if content else "No content"
+        safe_content = str(content)[:500] if content else "No content"
+        if lead:
+            key = self.LEAD_TIME_KEYS.get(lead, "days_until")
+            safe_content = self.t(user_lang, key, content=safe_content, days=max(1, round(lead / 86400)))
+        if missed:
+            safe_content += "\n\n" + self.t(user_lang, "missed_occurrences", count=missed)
         
         # Prepare reminder data for notification strategy
         reminder_data = {
@@ -221,6 +508,15 @@ class ReminderScheduler(IScheduler):
             'content': safe_content,
             'repeat': repeat
         }
+        return reminder_data, user_lang
+
+    def _render_reminder(self, rid, uid, category, content, repeat, lane=None, due_at=None, missed=0, lead=0) -> str:
+        reminder_data, user_lang = self._reminder_data(rid, uid, category, content, repeat, missed, lead)
+        text, keyboard = render_notification(reminder_data, user_lang, self.t)
+        return encode_notification(text, keyboard, lane, due_at)
+
+    async def _send_reminder(self, rid, uid, category, content, repeat, missed=0, lead=0):
+        reminder_data, user_lang = self._reminder_data(rid, uid, category, content, repeat, missed, lead)
         
         # Use notification strategy to send reminder
         success = await self.notification_context.send_notification(
@@ -231,25 +527,67 @@ class ReminderScheduler(IScheduler):
             self.logger.error(f"Failed to send reminder {rid} to user {uid}")
             raise Exception(f"Notification failed for reminder {rid}")
 
-    def _next_time(self, time_str: str, repeat: str, timezone: str = "+00:00") -> Optional[str]:
+    def _next_times(self, reminders) -> Dict[int, Tuple[Optional[str], int]]:
+        """_next_time for every recurring reminder of a page, computed in one batch"""
+        utcnow = datetime.datetime.utcnow()
+        patterns, local_nows = {}, {}
+        ids, current_times, page_patterns, nows = [], [], [], []
+        for r in reminders:
+            if r.repeat == "none" or (r.lead_times and r.occurs_at is not None and r.due_at < r.occurs_at):
+                continue
+            try:
+                # Stored times are ISO "YYYY-MM-DD HH:MM"; fromisoformat is much cheaper than strptime
+                current = datetime.datetime.fromisoformat(r.time)
+                now_local = local_nows.get(r.timezone)
+                if now_local is None:
+                    now_local = local_nows[r.timezone] = utcnow + _parse_tz(r.timezone)
+            except (ValueError, TypeError):
+                # Left to _next_time, which logs the bad value
+                continue
+            pattern = patterns.get(r.repeat)
+            if pattern is None:
+                # Reminders created together share a repeat string; parse each one once
+                pattern = patterns[r.repeat] = self.repeat_handler.from_json(r.repeat)
+            if pattern.type == "none":
+                continue
+            ids.append(r.id)
+            current_times.append(current)
+            page_patterns.append(pattern)
+            nows.append(now_local)
+
+        # Only the summary catch-up reads missed, and counting it can mean walking every occurrence
+        count_missed = self.catch_up == self.CATCH_UP_SUMMARY
+        advanced = self.repeat_handler.advance_many(current_times, page_patterns, nows, count_missed)
+        result = {}
+        for rid, (next_dt, missed) in zip(ids, advanced):
+            result[rid] = (next_dt.isoformat(" ", "minutes"), missed) if next_dt else (None, 0)
+        return result
+
+    def _next_time(self, time_str: str, repeat: str, timezone: str = "+00:00") -> Tuple[Optional[str], int]:
+        """Next local occurrence after now, and the number of occurrences missed on the way"""
         try:
             # time_str is already in local time (converted from UTC in due() method)
             dt_local = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M")
+            now_local = datetime.datetime.utcnow() + _parse_tz(timezone)
 
             repeat_pattern = self.repeat_handler.from_json(repeat)
-            next_dt_local = self.repeat_handler.calculate_next_time(dt_local, repeat_pattern)
+            next_dt_local, missed = self.repeat_handler.advance_past(
+                dt_local, repeat_pattern, now_local, count_missed=self.catch_up == self.CATCH_UP_SUMMARY
+            )
 
             if next_dt_local:
-                return next_dt_local.strftime("%Y-%m-%d %H:%M")
+                return next_dt_local.strftime("%Y-%m-%d %H:%M"), missed
             else:
-                return None
+                return None, 0
 
         except (ValueError, TypeError) as e:
             self.logger.error(f"Error calculating next time for {time_str}, {repeat}: {e}")
-            return None
+            return None, 0
 
     def stop(self):
         self.logger.info("Stopping reminder scheduler")
+        if self.mode == self.MODE_HEAP:
+            self.db.remove_time_listener(self._on_deadline)
         if self.task and not self.task.done():
             self.task.cancel()
         if self.cleanup_task and not self.cleanup_task.done():
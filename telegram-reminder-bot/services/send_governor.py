@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from services.metrics import MetricsRegistry
+
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of polling.
+
+    reserve() always takes a token, letting the balance go negative, and returns
+    how long the caller has to wait for that token. Concurrent callers therefore
+    queue up in order without spinning. Not thread-safe; use from one event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        self._refill(self.clock())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def is_idle(self) -> bool:
+        self._refill(self.clock())
+        return self.tokens >= self.capacity
+
+
+class SendGovernor:
+    """Paces outgoing Telegram messages under the global and per-chat limits.
+
+    Every send takes a token from the chat's own bucket and from the shared
+    global bucket. A TelegramRetryAfter pauses all sends for the requested
+    time before the message is retried.
+    """
+
+    def __init__(self, global_rate: float = 30.0, per_chat_rate: float = 1.0, per_chat_burst: float = 1.0,
+                 max_retries: int = 3, max_idle_chats: int = 10000, metrics: Optional[MetricsRegistry] = None):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.max_idle_chats = max_idle_chats
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self.logger = logging.getLogger(__name__)
+        self._retry_after = (metrics or MetricsRegistry()).counter(
+            "telegram_retry_after_total", "Sends rejected by Telegram flood control"
+        )
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_idle_chats:
+                self._evict_idle()
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _evict_idle(self):
+        for chat_id in [cid for cid, bucket in self._chat_buckets.items() if bucket.is_idle()]:
+            del self._chat_buckets[chat_id]
+
+    async def acquire(self, chat_id: int):
+        """Wait until a message may be sent to chat_id"""
+        wait = self._chat_bucket(chat_id).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        wait = self.global_bucket.reserve()
+        pause = self._paused_until - time.monotonic()
+        if max(wait, pause) > 0:
+            await asyncio.sleep(max(wait, pause))
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def send(self, chat_id: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Run call() once the limits allow it, retrying after flood-control responses"""
+        attempt = 0
+        while True:
+            await self.acquire(chat_id)
+            try:
+                return await call()
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self._retry_after.inc()
+                self.logger.warning(f"Flood control for chat {chat_id}: retry after {e.retry_after}s (attempt {attempt})")
+                self.pause(e.retry_after)
+                if attempt > self.max_retries:
+                    raise
@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+import tempfile
+import os
+import datetime
+from unittest.mock import patch
+from async_database import AsyncDatabase
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=2)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        os.unlink(self.temp_db.name)
+
+    async def test_add_and_list(self):
+        reminder_id = await self.db.add(123, "medicine", "Take pills", "2024-01-01 10:00", "+00:00", "daily")
+        reminders = await self.db.list(123)
+        self.assertEqual(len(reminders), 1)
+        self.assertEqual(reminders[0][0], reminder_id)
+
+    async def test_readers_see_committed_writes(self):
+        now = datetime.datetime.utcnow()
+        past_time = (now - datetime.timedelta(hours=1)).strftime("%Y-%m-%d %H:%M")
+        reminder_id = await self.db.add(123, "work", "Past meeting", past_time, "+00:00", "none")
+        self.assertEqual(len(await self.db.due(now)), 1)
+        
+        await self.db.update_status(reminder_id, "completed")
+        self.assertEqual(await self.db.due(now), [])
+        self.assertEqual(len(await self.db.list(123, "completed")), 1)
+
+    async def test_concurrent_reads_and_writes(self):
+        writes = [
+            self.db.add(123, "work", f"Meeting {i}", "2024-01-01 14:00", "+00:00", "none")
+            for i in range(20)
+        ]
+        reads = [self.db.get_stats(123) for _ in range(20)]
+        results = await asyncio.gather(*writes, *reads)
+        self.assertEqual(len(set(results[:20])), 20)
+        self.assertEqual((await self.db.get_stats(123))['total'], 20)
+
+    async def test_active_count_cache_follows_writes(self):
+        ids = [await self.db.add(123, "work", f"Meeting {i}", "2024-01-01 14:00", "+00:00", "none") for i in range(3)]
+        self.assertEqual(await self.db.active_count(123), 3)
+        self.assertIn(123, self.db._active_counts)
+
+        await self.db.add(123, "work", "Another", "2024-01-01 14:00", "+00:00", "none")
+        await self.db.update_status(ids[0], "completed")
+        await self.db.cancel_for_user(ids[1], 123)
+        await self.db.cancel_for_user(ids[2], 456)
+        self.assertEqual(await self.db.active_count(123), 2)
+        self.assertEqual(await self.db.active_count(456), 0)
+
+        await self.db.commit_tick(completed=[ids[2]])
+        self.assertNotIn(123, self.db._active_counts)
+        self.assertEqual(await self.db.active_count(123), 1)
+
+    async def test_add_many_updates_cached_count(self):
+        await self.db.add(123, "work", "First", "2024-01-01 14:00", "+00:00", "none")
+        self.assertEqual(await self.db.active_count(123), 1)
+        ids = await self.db.add_many(123, [
+            {"category": "work", "content": f"Meeting {i}", "time": "2024-01-01 14:00", "timezone": "+00:00", "repeat": "none"}
+            for i in range(3)
+        ])
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(self.db._active_counts[123][0], 4)
+        self.assertEqual(len(await self.db.list(123)), 4)
+
+    async def test_concurrent_active_counts_stay_exact(self):
+        await asyncio.gather(*(
+            coro for i in range(20) for coro in (
+                self.db.add(123, "work", f"Meeting {i}", "2024-01-01 14:00", "+00:00", "none"),
+                self.db.active_count(123)
+            )
+        ))
+        self.assertEqual(await self.db.active_count(123), 20)
+
+    async def test_readers_are_query_only(self):
+        await self.db.ping()
+        reader = self.db._readers[0]
+        with self.assertRaises(Exception):
+            reader.conn.execute("delete from reminders")
+
+
+    async def test_cleanup_archives_in_batches(self):
+        ids = [await self.db.add(123, "work", f"Meeting {i}", "2024-01-01 14:00", "+00:00", "none") for i in range(5)]
+        await self.db.commit_tick(completed=ids)
+        with patch.object(self.db.writer, "archive_finished", wraps=self.db.writer.archive_finished) as archive:
+            self.assertEqual(await self.db.cleanup_old_reminders(100000, batch_size=2), 0)
+        self.assertEqual(archive.call_count, 3)
+        self.assertEqual(len(await self.db.list(123, "completed")), 5)
+        self.assertEqual(await self.db.cleanup_old_reminders(0, batch_size=2), 5)
+        self.assertEqual(await self.db.list(123, "completed"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
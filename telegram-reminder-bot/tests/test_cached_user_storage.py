@@ -0,0 +1,139 @@
+import unittest
+import tempfile
+import os
+import shutil
+import asyncio
+from unittest.mock import patch
+from services.metrics import MetricsRegistry
+from utils.cached_user_storage import CachedUserStorage
+from utils.json_storage import JSONStorage
+from utils.sqlite_user_storage import SqliteUserStorage
+
+
+class TestCachedUserStorage(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.backing = SqliteUserStorage(os.path.join(self.temp_dir, "users.db"))
+        self.metrics = MetricsRegistry()
+        self.storage = CachedUserStorage(self.backing, self.metrics, max_entries=2, ttl=60)
+
+    def tearDown(self):
+        self.backing.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_hot_reads_skip_storage(self):
+        with patch.object(self.backing, "load", wraps=self.backing.load) as load:
+            for _ in range(3):
+                self.assertEqual(self.storage.load(1)["settings"]["language"], "fa")
+            self.assertEqual(load.call_count, 1)
+        self.assertEqual(self.storage.hits, 2)
+        self.assertEqual(self.storage.misses, 1)
+        self.assertAlmostEqual(self.metrics.gauge("user_cache_hit_ratio").value(), 2 / 3)
+
+    def test_loaded_data_is_a_copy(self):
+        self.storage.load(1)["settings"]["language"] = "en"
+        self.assertEqual(self.storage.load(1)["settings"]["language"], "fa")
+
+    def test_saves_are_written_behind(self):
+        self.storage.update_setting(1, "language", "ru")
+        self.assertEqual(self.storage.get_user_language(1), "ru")
+        self.assertEqual(self.backing.get_user_language(1), "fa")
+
+        self.assertEqual(self.storage.flush(), 1)
+        self.assertEqual(self.backing.get_user_language(1), "ru")
+        self.assertEqual(self.storage.flush(), 0)
+
+    def test_evicted_dirty_users_are_kept_until_flush(self):
+        self.storage.update_setting(1, "language", "ar")
+        self.storage.load(2)
+        self.storage.load(3)
+        self.assertNotIn(1, self.storage._entries)
+        self.assertEqual(self.storage.get_user_language(1), "ar")
+
+        self.storage.flush()
+        self.assertEqual(self.backing.get_user_language(1), "ar")
+        self.assertEqual(self.storage._evicted, {})
+
+    def test_expired_entries_are_reloaded(self):
+        self.storage.ttl = 0
+        self.storage.load(1)
+        self.backing.update_setting(1, "language", "en")
+        self.assertEqual(self.storage.load(1)["settings"]["language"], "en")
+
+    def test_invalidate_keeps_pending_changes(self):
+        self.storage.update_setting(1, "timezone", "+01:00")
+        self.storage.load(2)
+        with patch.object(self.backing, "save") as save:
+            self.storage.invalidate()
+        save.assert_not_called()
+        self.assertEqual(list(self.storage._entries), [1])
+        self.assertEqual(self.storage.load(1)["settings"]["timezone"], "+01:00")
+        self.storage.flush()
+        self.storage.invalidate(1)
+        self.backing.update_setting(1, "timezone", "+02:00")
+        self.assertEqual(self.storage.load(1)["settings"]["timezone"], "+02:00")
+
+    def test_enumerating_users_does_not_flush(self):
+        self.storage.load(1)
+        self.storage.update_setting(2, "language", "en")
+        self.storage.save(3, {"user_id": 3, "settings": {"language": "ru"}})
+        self.storage.load(4)
+        self.storage.set_blocked(1)
+        self.storage.set_blocked(2)
+        with patch.object(self.backing, "save") as save:
+            self.assertEqual(self.storage.user_ids(), [3, 4])
+            self.assertEqual(self.storage.user_ids(include_blocked=True), [1, 2, 3, 4])
+            users = {data["user_id"]: data for data in self.storage.get_all_users()}
+        save.assert_not_called()
+        self.assertEqual(users[3]["settings"]["language"], "ru")
+        self.assertEqual(users[2]["settings"]["language"], "en")
+
+        # The unwritten save of user 2 carries the flag set_blocked stored
+        self.storage.flush()
+        self.storage.invalidate()
+        self.assertTrue(self.storage.load(2)["blocked"])
+        self.assertEqual(self.backing.user_ids(), [3, 4])
+
+    def test_failed_writes_are_retried(self):
+        self.storage.update_setting(1, "language", "en")
+        with patch.object(self.backing, "save", side_effect=OSError("disk full")):
+            self.assertEqual(self.storage.flush(), 0)
+        self.assertEqual(self.storage.flush(), 1)
+        self.assertEqual(self.backing.get_user_language(1), "en")
+
+    def test_delete_user_drops_pending_changes(self):
+        self.storage.update_setting(1, "language", "en")
+        self.assertTrue(self.storage.delete_user(1))
+        self.storage.flush()
+        self.assertEqual(self.backing.user_ids(), [])
+
+    def test_find_user_sees_unflushed_usernames(self):
+        self.storage.load(1)
+        self.storage.save(2, {**self.storage.load(2), "username": "omid"})
+        self.assertEqual(self.storage.find_user("@Omid"), 2)
+        self.storage.flush()
+        self.storage.invalidate()
+        self.assertEqual(self.storage.find_user("@omid"), 2)
+        self.assertIsNone(self.storage.find_user("@sara"))
+
+    def test_blocked_flag_in_json_records(self):
+        storage = CachedUserStorage(JSONStorage(os.path.join(self.temp_dir, "users")))
+        storage.update_setting(1, "language", "en")
+        storage.set_blocked(1)
+        self.assertEqual(storage.user_ids(), [])
+        self.assertTrue(storage.load(1)["blocked"])
+        self.assertEqual(storage.load(1)["settings"]["language"], "en")
+
+    def test_stop_flushes(self):
+        async def run():
+            self.storage.flush_interval = 3600
+            self.storage.start()
+            self.storage.update_setting(1, "language", "en")
+            self.storage.stop()
+
+        asyncio.run(run())
+        self.assertEqual(self.backing.get_user_language(1), "en")
+
+
+if __name__ == '__main__':
+    unittest.main()
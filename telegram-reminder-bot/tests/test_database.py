@@ -2,7 +2,9 @@ import unittest
 import tempfile
 import os
 import datetime
-from database import Database
+import sqlite3
+import json
+from database import BIRTHDAY_LEAD_TIMES, Database, _claim_candidates
 
 
 class TestDatabase(unittest.TestCase):
@@ -21,6 +23,23 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(reminders), 1)
         self.assertEqual(reminders[0][2], "Take pills")
         
+    def test_add_returns_id_and_notifies_listeners(self):
+        deadlines = []
+        self.db.add_time_listener(lambda rid, dt: deadlines.append((rid, dt)))
+        reminder_id = self.db.add(123, "work", "Meeting", "2024-01-01 14:00", "+03:30", "none")
+        self.assertEqual(deadlines, [(reminder_id, datetime.datetime(2024, 1, 1, 10, 30))])
+        
+        self.db.update_time(reminder_id, "2024-01-02 14:00")
+        self.assertEqual(deadlines[-1], (reminder_id, datetime.datetime(2024, 1, 2, 10, 30)))
+        
+    def test_upcoming(self):
+        self.db.add(123, "work", "Soon", "2024-01-01 10:00", "+00:00", "none")
+        self.db.add(123, "work", "Later", "2024-01-05 10:00", "+00:00", "none")
+        
+        upcoming = self.db.upcoming(datetime.datetime(2024, 1, 2))
+        self.assertEqual(len(upcoming), 1)
+        self.assertEqual(upcoming[0][0], datetime.datetime(2024, 1, 1, 10, 0))
+        
     def test_list_reminders(self):
         self.db.add(123, "work", "Meeting", "2024-01-01 14:00", "+00:00", "none")
         self.db.add(123, "medicine", "Pills", "2024-01-01 10:00", "+00:00", "daily")
@@ -50,14 +69,50 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(due_reminders[0][3], "Past meeting")
         
     def test_birthday_reminders(self):
-        self.db.add(123, "birthday", "John's birthday", "2024-06-15 08:00", "+00:00", "yearly")
+        next_year = datetime.datetime.utcnow().year + 1
+        rid = self.db.add(123, "birthday", "John's birthday", f"{next_year}-06-15 08:00", "+00:00", "yearly")
         reminders = self.db.list(123)
-        self.assertEqual(len(reminders), 3)
-        
-        categories = [r[1] for r in reminders]
-        self.assertIn("birthday", categories)
-        self.assertIn("birthday_pre_week", categories)
-        self.assertIn("birthday_pre_three", categories)
+        self.assertEqual(len(reminders), 1)
+        self.assertEqual(reminders[0][1], "birthday")
+
+        # The row waits for the week-ahead alert, then the three-days-ahead one
+        birthday = datetime.datetime(next_year, 6, 15, 8, 0)
+        week_before = birthday - datetime.timedelta(days=7)
+        self.assertEqual(self.db.upcoming(birthday), [(week_before, rid)])
+        due = self.db.due(week_before)[0]
+        self.assertEqual(due.occurs_at - due.due_at, 7 * 86400)
+        self.assertEqual(due.lead_times, (7 * 86400, 3 * 86400))
+
+    def test_update_time_rearms_lead_alerts(self):
+        next_year = datetime.datetime.utcnow().year + 1
+        rid = self.db.add(123, "birthday", "Sara", f"{next_year}-06-15 08:00", "+00:00", '{"type": "yearly"}')
+        self.db.update_time(rid, f"{next_year}-09-01 08:00")
+        self.assertEqual(self.db.upcoming(datetime.datetime(next_year, 12, 31)),
+                         [(datetime.datetime(next_year, 8, 25, 8, 0), rid)])
+
+    def test_migration_collapses_birthday_alert_rows(self):
+        self.db.close()
+        os.unlink(self.temp_db.name)
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute(
+            "create table reminders(id integer primary key, user_id integer, category text, content text, "
+            "time text, timezone text, repeat text, status text)"
+        )
+        for category, time in (("birthday", "2024-06-15 08:00"), ("birthday_pre_week", "2024-06-08 08:00"),
+                               ("birthday_pre_three", "2024-06-12 08:00")):
+            conn.execute(
+                "insert into reminders(user_id,category,content,time,timezone,repeat,status) "
+                "values(123,?,'John','" + time + "','+00:00','yearly','active')",
+                (category,)
+            )
+        conn.commit()
+        conn.close()
+
+        self.db = Database(self.temp_db.name)
+        reminders = self.db.list(123)
+        self.assertEqual([r[1] for r in reminders], ["birthday"])
+        lead_times = self.db.conn.execute("select lead_times from reminders").fetchone()[0]
+        self.assertEqual(lead_times, "[604800, 259200]")
         
     def test_cleanup_old_reminders(self):
         old_time = (datetime.datetime.utcnow() - datetime.timedelta(days=40)).strftime("%Y-%m-%d %H:%M")
@@ -67,14 +122,374 @@ class TestDatabase(unittest.TestCase):
         deleted_count = self.db.cleanup_old_reminders(30)
         self.assertEqual(deleted_count, 1)
         
+    def test_commit_tick(self):
+        done_id = self.db.add(123, "work", "Once", "2024-01-01 10:00", "+00:00", "none")
+        daily_id = self.db.add(123, "medicine", "Pills", "2024-01-01 10:00", "+03:30", "daily")
+        bad_id = self.db.add(123, "work", "Broken", "2024-01-01 10:00", "+00:00", "weekly")
+        
+        changed = self.db.commit_tick([done_id], {daily_id: ("2024-01-02 10:00", "+03:30")}, [bad_id])
+        self.assertEqual(changed, 3)
+        self.assertEqual([r[0] for r in self.db.list(123, "completed")], [done_id])
+        self.assertEqual([r[0] for r in self.db.list(123, "cancelled")], [bad_id])
+        active = self.db.list(123)
+        self.assertEqual(active[0][3], "2024-01-02 10:00")
+        self.assertEqual(self.db.upcoming(datetime.datetime(2024, 1, 2, 6, 30)), [(datetime.datetime(2024, 1, 2, 6, 30), daily_id)])
+        
+    def test_claim_due_leases_reminders(self):
+        first = self.db.add(123, "work", "First", "2024-01-01 10:00", "+00:00", "none")
+        second = self.db.add(123, "work", "Second", "2024-01-01 10:05", "+00:00", "daily")
+        now = datetime.datetime(2024, 1, 1, 11, 0)
+        
+        claimed = self.db.claim_due(now, "a", lease_seconds=60, limit=1)
+        self.assertEqual([r.id for r in claimed], [first])
+        self.assertEqual([r.id for r in self.db.claim_due(now, "b", lease_seconds=600)], [second])
+        self.assertEqual(self.db.claim_due(now, "b", lease_seconds=600), [])
+        
+        # Instance "a" died: its lease expires and the reminder can be claimed again
+        later = now + datetime.timedelta(seconds=60)
+        self.assertEqual([r.id for r in self.db.claim_due(later, "b", lease_seconds=60)], [first])
+        
+        self.db.commit_tick(completed=[first], rescheduled={second: ("2024-01-02 10:05", "+00:00")})
+        self.assertEqual(
+            self.db.conn.execute("select claimed_by, lease_until from reminders where id=?", (second,)).fetchone(),
+            (None, None)
+        )
+        
+    def test_commit_after_lease_expired_changes_nothing(self):
+        rid = self.db.add(123, "work", "Standup", "2024-01-01 10:00", "+00:00", "daily")
+        now = datetime.datetime(2024, 1, 1, 10, 0)
+        self.db.claim_due(now, "a", lease_seconds=60)
+        # "a" stalls past its lease and "b" claims the reminder again
+        self.db.claim_due(now + datetime.timedelta(seconds=60), "b", lease_seconds=60)
+        notification = [(rid, 123, '{"text": "Standup"}', 0)]
+
+        self.assertEqual(self.db.commit_tick(
+            rescheduled={rid: ("2024-01-02 10:00", "+00:00")}, notifications=notification, owner="a"
+        ), 0)
+        self.assertEqual(self.db.conn.execute("select count(*) from outbox").fetchone()[0], 0)
+        self.assertEqual(self.db.conn.execute("select claimed_by from reminders").fetchone()[0], "b")
+
+        self.assertEqual(self.db.commit_tick(
+            rescheduled={rid: ("2024-01-02 10:00", "+00:00")}, notifications=notification, owner="b"
+        ), 1)
+        self.assertEqual(self.db.conn.execute("select count(*) from outbox").fetchone()[0], 1)
+        self.assertEqual(self.db.list(123)[0][3], "2024-01-02 10:00")
+
+    def test_outbox_claim_lease_and_ack(self):
+        rid = self.db.add(123, "work", "Meeting", "2024-01-01 10:00", "+00:00", "none")
+        self.db.commit_tick(completed=[rid], notifications=[(rid, 123, '{"text": "Meeting"}', 0)])
+        self.assertEqual(self.db.list(123, "completed")[0][0], rid)
+        
+        now = datetime.datetime.utcnow()
+        claimed = self.db.claim_outbox(now, lease_seconds=60)
+        self.assertEqual([(m.reminder_id, m.user_id, m.attempts) for m in claimed], [(rid, 123, 1)])
+        self.assertEqual(self.db.claim_outbox(now, lease_seconds=60), [])
+        
+        # An expired lease makes the message claimable again
+        later = now + datetime.timedelta(seconds=61)
+        reclaimed = self.db.claim_outbox(later, lease_seconds=60)
+        self.assertEqual([m.attempts for m in reclaimed], [2])
+        
+        self.db.ack_outbox([reclaimed[0].id])
+        self.assertEqual(self.db.claim_outbox(later + datetime.timedelta(hours=1)), [])
+        
+    def test_outbox_claims_by_priority(self):
+        self.db.commit_tick(notifications=[(1, 123, '{"text": "work"}', 2), (2, 456, '{"text": "pills"}', 0)])
+        claimed = self.db.claim_outbox(datetime.datetime.utcnow(), limit=1)
+        self.assertEqual([m.reminder_id for m in claimed], [2])
+        
+    def test_claim_due_by_category(self):
+        self.db.add(123, "work", "Meeting", "2024-01-01 10:00", "+00:00", "none")
+        pills = self.db.add(123, "medicine", "Pills", "2024-01-01 10:30", "+00:00", "daily")
+        claimed = self.db.claim_due(datetime.datetime(2024, 1, 1, 11, 0), "a", categories=["medicine", "installment"])
+        self.assertEqual([r.id for r in claimed], [pills])
+        
+    def test_claim_due_by_category_merges_lanes_in_due_order(self):
+        bill = self.db.add(123, "bill", "Rent", "2024-01-01 09:00", "+00:00", "none")
+        pills = [self.db.add(123, "medicine", "Pills", f"2024-01-01 {hour:02d}:00", "+00:00", "none") for hour in (8, 10)]
+        self.db.add(123, "work", "Meeting", "2024-01-01 07:00", "+00:00", "none")
+        claimed = self.db.claim_due(datetime.datetime(2024, 1, 1, 11, 0), "a", limit=2, categories=["medicine", "bill"])
+        self.assertEqual([r.id for r in claimed], [pills[0], bill])
+        
+    def test_claim_due_by_category_uses_category_index(self):
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN " + _claim_candidates(2), ("medicine", 0, 0, 10, "bill", 0, 0, 10, 10)
+        ).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        self.assertIn("USING INDEX idx_active_category_due_at", details)
+        self.assertNotIn("idx_status_due_at", details)
+        
+    def test_outbox_retry_and_dead(self):
+        self.db.commit_tick(notifications=[(1, 123, '{"text": "a"}', 0), (2, 456, '{"text": "b"}', 0)])
+        now = datetime.datetime.utcnow()
+        first, second = self.db.claim_outbox(now)
+        self.db.fail_outbox(first.id, "timeout", now + datetime.timedelta(seconds=30))
+        self.db.fail_outbox(second.id, "blocked")
+        
+        self.assertEqual(self.db.claim_outbox(now + datetime.timedelta(seconds=29)), [])
+        retried = self.db.claim_outbox(now + datetime.timedelta(seconds=30))
+        self.assertEqual([m.id for m in retried], [first.id])
+        state = self.db.conn.execute("select state, last_error from outbox where id=?", (second.id,)).fetchone()
+        self.assertEqual(state, ("dead", "blocked"))
+        
+    def test_due_keyset_pagination(self):
+        for hour in (8, 8, 9, 10, 10):
+            self.db.add(123, "work", f"At {hour}", f"2024-01-01 {hour:02d}:00", "+00:00", "none")
+        now = datetime.datetime(2024, 1, 2)
+        
+        seen = []
+        page = self.db.due(now, limit=2)
+        while page:
+            seen.extend(r.id for r in page)
+            page = self.db.due(now, limit=2, after=(page[-1].due_at, page[-1].id))
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+        
+    def test_due_uses_due_at_index(self):
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN select id from reminders where status='active' and due_at <= ? order by due_at asc limit ?",
+            (0, 10)
+        ).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        self.assertIn("SEARCH reminders USING", details)
+        self.assertIn("due_at<?", details)
+        self.assertNotIn("SCAN reminders", details)
+        
+    def test_migration_backfills_due_at(self):
+        self.db.close()
+        os.unlink(self.temp_db.name)
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute(
+            "create table reminders(id integer primary key, user_id integer, category text, content text, "
+            "time text, timezone text, repeat text, status text)"
+        )
+        conn.execute(
+            "insert into reminders(user_id,category,content,time,timezone,repeat,status) "
+            "values(123,'work','Legacy','2024-01-01 10:30','+00:00','none','active')"
+        )
+        conn.commit()
+        conn.close()
+        
+        self.db = Database(self.temp_db.name)
+        due_at = self.db.conn.execute("select due_at from reminders").fetchone()[0]
+        self.assertEqual(due_at, 1704105000)
+        self.assertEqual(len(self.db.due(datetime.datetime(2024, 1, 1, 10, 30))), 1)
+        self.assertEqual(len(self.db.due(datetime.datetime(2024, 1, 1, 10, 29))), 0)
+
+    def test_due_at_backfill_runs_once(self):
+        self.assertEqual(self.db.conn.execute("PRAGMA user_version").fetchone()[0], 1)
+        with self.db.conn:
+            self.db.conn.execute(
+                "insert into reminders(user_id,category,content,time,timezone,repeat,status) "
+                "values(123,'work','No due_at','2024-01-01 10:30','+00:00','none','active')"
+            )
+        self.db.close()
+        
+        # A second open must not scan the table again
+        self.db = Database(self.temp_db.name)
+        self.assertIsNone(self.db.conn.execute("select due_at from reminders").fetchone()[0])
+
+    def test_migration_rebuilds_ids_as_autoincrement(self):
+        self.db.close()
+        os.unlink(self.temp_db.name)
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute(
+            "create table reminders(id integer primary key, user_id integer, category text, content text, "
+            "time text, timezone text, repeat text, status text)"
+        )
+        conn.execute(
+            "insert into reminders(id,user_id,category,content,time,timezone,repeat,status) "
+            "values(7,123,'work','Legacy','2024-01-01 10:30','+00:00','none','completed')"
+        )
+        conn.commit()
+        conn.close()
+
+        self.db = Database(self.temp_db.name)
+        self.assertEqual(self.db.get(7, 123, status="completed")[2], "Legacy")
+        self.assertEqual(self.db.get_stats()['completed'], 1)
+        self.assertEqual(self.db.archive_finished(), 1)
+        self.assertEqual(self.db.add(123, "work", "New", "2024-01-01 14:00", "+00:00", "none"), 8)
+        self.assertEqual(self.db.get_stats()['total'], 2)
+        self.assertEqual(self.db.reconcile_stats(), 0)
+
+    def test_archived_ids_are_not_reused(self):
+        rid = self.db.add(123, "work", "Done", "2024-01-01 14:00", "+00:00", "none")
+        self.db.update_status(rid, "completed")
+        self.assertEqual(self.db.archive_finished(), 1)
+        self.assertGreater(self.db.add(123, "work", "Next", "2024-01-01 14:00", "+00:00", "none"), rid)
+        
+    def test_follow_up_chain(self):
+        parent = self.db.add(123, "installment", "Car loan", "2024-01-05 09:00", "+03:30", '{"type": "monthly"}')
+        other = self.db.add(123, "installment", "Rent", "2024-01-05 09:00", "+03:30", '{"type": "monthly"}')
+        retry = self.db.add_follow_up(parent, "installment_retry", "2024-01-06 09:00", 1)
+        self.db.add_follow_up(other, "installment_retry", "2024-01-06 09:00", 1)
+
+        self.assertEqual(self.db.follow_up_of(retry), (parent, 1))
+        self.assertIsNone(self.db.follow_up_of(parent))
+        self.assertEqual(self.db.list(123)[2][2:5], ("Car loan", "2024-01-06 09:00", "+03:30"))
+        self.assertEqual(self.db.cancel_follow_ups(parent), 1)
+        self.assertEqual(self.db.count_follow_ups(parent), 0)
+        self.assertEqual(self.db.count_follow_ups(other), 1)
+
+        # A later retry is copied from the one before it, whatever became of the parent
+        self.db.update_status(parent, "cancelled")
+        self.db.update_status(retry, "completed")
+        self.db.archive_finished()
+        second = self.db.add_follow_up(parent, "installment_retry", "2024-01-07 09:00", 2, retry)
+        self.assertEqual(self.db.follow_up_of(second), (parent, 2))
+        self.assertEqual(self.db.list(123)[-1][2:5], ("Car loan", "2024-01-07 09:00", "+03:30"))
+        self.assertIsNone(self.db.add_follow_up(parent, "installment_retry", "2024-01-08 09:00", 3, 10**6))
+
+    def test_follow_up_lookup_uses_parent_index(self):
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN update reminders set status='cancelled' where parent_id=? and status='active'", (1,)
+        ).fetchall()
+        self.assertIn("idx_parent_status", " ".join(row[-1] for row in plan))
+
+    def test_migration_links_legacy_retries(self):
+        self.db.close()
+        os.unlink(self.temp_db.name)
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute(
+            "create table reminders(id integer primary key, user_id integer, category text, content text, "
+            "time text, timezone text, repeat text, status text)"
+        )
+        rows = [
+            (1, "installment", "Car loan"),
+            (10, "installment", "Rent"),
+            (11, "installment_retry", "Retry #2 for reminder 1"),
+            (12, "installment_retry", "Retry #1 for reminder 10"),
+        ]
+        for rid, category, content in rows:
+            conn.execute(
+                "insert into reminders(id,user_id,category,content,time,timezone,repeat,status) "
+                "values(?,123,?,?,'2024-01-01 10:30','+00:00','none','active')",
+                (rid, category, content)
+            )
+        conn.commit()
+        conn.close()
+
+        self.db = Database(self.temp_db.name)
+        self.assertEqual(self.db.follow_up_of(11), (1, 2))
+        self.assertEqual(self.db.follow_up_of(12), (10, 1))
+        self.assertEqual(self.db.count_follow_ups(1), 1)
+        content = self.db.conn.execute("select content from reminders where id=11").fetchone()[0]
+        self.assertEqual(content, "Car loan")
+
+    def test_point_lookups_check_owner(self):
+        rid = self.db.add(123, "work", "Meeting", "2024-01-01 14:00", "+03:30", "none")
+        self.assertEqual(self.db.get(rid, 123), self.db.list(123)[0])
+        self.assertIsNone(self.db.get(rid, 456))
+        self.assertTrue(self.db.exists_for_user(rid, 123))
+        self.assertFalse(self.db.exists_for_user(rid, 456))
+
+        self.assertEqual(self.db.cancel_for_user(rid, 456), 0)
+        self.assertEqual(self.db.cancel_for_user(rid, 123), 1)
+        self.assertEqual(self.db.cancel_for_user(rid, 123), 0)
+        self.assertIsNone(self.db.get(rid, 123))
+        self.assertEqual(self.db.get(rid, 123, status=None)[6], "cancelled")
+
+    def test_add_many(self):
+        ids = self.db.add_many(123, [
+            {"category": "work", "content": "Monday", "time": "2024-01-01 14:00", "timezone": "+03:30", "repeat": "none"},
+            {"category": "work", "content": "Wednesday", "time": "2024-01-03 14:00", "timezone": "+03:30", "repeat": "none"},
+            {"category": "birthday", "content": "Sara", "time": "2030-05-10 09:00", "timezone": "+00:00", "repeat": "yearly"},
+        ])
+        self.assertEqual(len(ids), 3)
+        self.assertEqual([r[0] for r in self.db.list(123)], ids)
+        self.assertEqual(self.db.get(ids[1], 123)[2:4], ("Wednesday", "2024-01-03 14:00"))
+        lead_times = self.db.conn.execute("select lead_times from reminders where id=?", (ids[2],)).fetchone()[0]
+        self.assertEqual(json.loads(lead_times), list(BIRTHDAY_LEAD_TIMES))
+        self.assertEqual(self.db.add_many(123, []), [])
+        self.assertEqual(self.db.active_count(123), 3)
+
     def test_get_stats(self):
         self.db.add(123, "work", "Meeting 1", "2024-01-01 14:00", "+00:00", "none")
         self.db.add(456, "medicine", "Pills", "2024-01-01 10:00", "+00:00", "daily")
         
         stats = self.db.get_stats()
-        self.assertEqual(stats[0], 2)
-        self.assertEqual(stats[1], 2)
-        self.assertEqual(stats[4], 2)
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['active'], 2)
+        self.assertEqual(stats['unique_users'], 2)
+
+    def test_stats_counters_follow_writes(self):
+        work = self.db.add(123, "work", "Meeting", "2024-01-01 14:00", "+00:00", "none")
+        self.db.add(123, "medicine", "Pills", "2024-01-01 10:00", "+00:00", "daily")
+        self.db.add(456, "medicine", "Vitamins", "2024-01-01 10:00", "+00:00", "daily")
+        self.db.commit_tick(completed=[work])
+        self.db.update_status(self.db.add(789, "work", "Gone", "2024-01-01 10:00", "+00:00", "none"), "cancelled")
+
+        self.assertEqual(self.db.get_stats(123), {
+            'total': 2, 'active': 1, 'completed': 1, 'cancelled': 0, 'unique_users': 1
+        })
+        admin = self.db.get_admin_stats()
+        self.assertEqual((admin['total_users'], admin['total_reminders'], admin['active_reminders']), (3, 4, 2))
+        self.assertEqual((admin['top_category'], admin['top_category_count']), ("medicine", 2))
+        self.assertEqual((admin['top_user_id'], admin['top_user_count']), (123, 2))
+
+        self.db.cleanup_old_reminders(0)
+        self.assertEqual(self.db.get_stats()['unique_users'], 2)
+        self.assertEqual(self.db.reconcile_stats(), 0)
+
+    def test_reconcile_stats_repairs_drift(self):
+        self.db.add(123, "work", "Meeting", "2024-01-01 14:00", "+00:00", "none")
+        self.db.conn.execute("update stats_counters set count=40 where scope='global'")
+        self.db.conn.commit()
+        self.assertEqual(self.db.reconcile_stats(), 1)
+        self.assertEqual(self.db.get_stats()['total'], 1)
+
+
+    def test_archive_keeps_hot_table_active(self):
+        done = self.db.add(123, "work", "Done", "2024-01-01 14:00", "+00:00", "none")
+        gone = self.db.add(123, "work", "Gone", "2024-01-01 14:00", "+00:00", "none")
+        self.db.add(123, "work", "Open", "2024-01-01 14:00", "+00:00", "none")
+        self.db.commit_tick(completed=[done], cancelled=[gone])
+        before = self.db.get_stats(123)
+
+        self.assertEqual(self.db.archive_finished(limit=1), 1)
+        self.assertEqual(self.db.archive_finished(limit=10), 1)
+        self.assertEqual(self.db.archive_finished(limit=10), 0)
+        statuses = [row[0] for row in self.db.conn.execute("select status from reminders")]
+        self.assertEqual(statuses, ["active"])
+        self.assertEqual([r[0] for r in self.db.list(123, "completed")], [done])
+        self.assertEqual([r[0] for r in self.db.list(123, "cancelled")], [gone])
+        self.assertEqual(self.db.get_stats(123), before)
+        self.assertEqual(self.db.reconcile_stats(), 0)
+
+        self.assertEqual(self.db.purge_archive(datetime.datetime(2024, 1, 2), limit=1), 1)
+        self.assertEqual(self.db.cleanup_old_reminders(30, batch_size=1), 1)
+        self.assertEqual(self.db.get_stats(123)['total'], 1)
+        self.assertEqual(self.db.reconcile_stats(), 0)
+
+    def test_archive_keeps_parents_of_active_follow_ups(self):
+        parent = self.db.add(123, "bill", "Electricity", "2024-01-05 09:00", "+00:00", "none")
+        self.db.commit_tick(completed=[parent])
+        retry = self.db.add_follow_up(parent, "installment_retry", "2024-01-06 09:00", 1)
+
+        self.assertEqual(self.db.archive_finished(), 0)
+        self.db.commit_tick(completed=[retry])
+        self.assertEqual(self.db.archive_finished(), 2)
+
+    def test_archive_in_attached_file(self):
+        archive = self.temp_db.name + ".archive"
+        self.db.close()
+        self.db = Database(self.temp_db.name, archive_path=archive)
+        try:
+            rid = self.db.add(123, "work", "Done", "2024-01-01 14:00", "+00:00", "none")
+            self.db.update_status(rid, "completed")
+            self.assertEqual(self.db.cleanup_old_reminders(100000), 0)
+            reader = Database(self.temp_db.name, readonly=True, archive_path=archive)
+            try:
+                self.assertEqual([r[0] for r in reader.list(123, "completed")], [rid])
+            finally:
+                reader.close()
+            conn = sqlite3.connect(archive)
+            count = conn.execute("select count(*) from reminders_archive").fetchone()[0]
+            conn.close()
+            self.assertEqual(count, 1)
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(archive + suffix):
+                    os.unlink(archive + suffix)
 
 
 if __name__ == '__main__':
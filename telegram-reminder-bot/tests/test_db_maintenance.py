@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import os
+import datetime
+from async_database import AsyncDatabase
+from database import Database
+from services.db_maintenance import DatabaseMaintenance
+from services.metrics import MetricsRegistry
+
+
+class TestDatabaseMaintenance(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=1)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    async def _add_finished(self, count, when="2024-01-01 14:00"):
+        ids = [
+            await self.db.add(123, "work", "x" * 500, when, "+00:00", "none")
+            for _ in range(count)
+        ]
+        await self.db.commit_tick(completed=ids)
+
+    async def test_purges_and_frees_pages(self):
+        await self._add_finished(300)
+        metrics = MetricsRegistry()
+        maintenance = DatabaseMaintenance(self.db, metrics=metrics, retention_days=0, batch_size=50)
+        report = await maintenance.run_once()
+
+        self.assertEqual(report.purged, 300)
+        self.assertEqual(report.checkpoint_mode, "PASSIVE")
+        self.assertGreater(report.pages_freed, 0)
+        self.assertEqual((await self.db.storage_stats())["freelist_count"], 0)
+        self.assertEqual(metrics.counter("db_pages_freed_total").value(), report.pages_freed)
+        self.assertEqual(await self.db.get_stats(), {
+            'total': 0, 'active': 0, 'completed': 0, 'cancelled': 0, 'unique_users': 0
+        })
+
+    async def test_old_dead_notifications_are_purged(self):
+        await self.db.commit_tick(notifications=[(i, 123, "{}", 0) for i in range(1, 4)])
+        for message in await self.db.claim_outbox(datetime.datetime.utcnow(), limit=2):
+            await self.db.fail_outbox(message.id, "blocked")
+        metrics = MetricsRegistry()
+        maintenance = DatabaseMaintenance(self.db, metrics=metrics, retention_days=1)
+        self.assertEqual((await maintenance.run_once()).dead_purged, 0)
+
+        maintenance.retention_days = -1
+        report = await maintenance.run_once()
+        self.assertEqual(report.dead_purged, 2)
+        self.assertEqual(metrics.counter("outbox_dead_purged_total").value(), 2)
+        states = self.db.writer.conn.execute("select state from outbox").fetchall()
+        self.assertEqual(states, [("pending",)])
+
+    async def test_large_wal_is_truncated(self):
+        await self._add_finished(50, datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M"))
+        self.assertGreater((await self.db.storage_stats())["wal_bytes"], 0)
+        maintenance = DatabaseMaintenance(self.db, retention_days=30, wal_truncate_bytes=1)
+        report = await maintenance.run_once()
+
+        self.assertEqual(report.checkpoint_mode, "TRUNCATE")
+        self.assertEqual(report.checkpoint_busy, 0)
+        self.assertEqual(report.wal_bytes, 0)
+        # Archived but within retention
+        self.assertEqual(report.purged, 0)
+        self.assertEqual(len(await self.db.list(123, "completed")), 50)
+
+    async def test_vacuum_skips_files_without_incremental_mode(self):
+        other = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        other.close()
+        db = Database(other.name, auto_vacuum=None)
+        try:
+            for _ in range(100):
+                db.add(123, "work", "x" * 500, "2024-01-01 14:00", "+00:00", "none")
+            db.conn.execute("delete from reminders")
+            db.conn.commit()
+            self.assertGreater(db.storage_stats()["freelist_count"], 0)
+            self.assertEqual(db.incremental_vacuum(), 0)
+        finally:
+            db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(other.name + suffix):
+                    os.unlink(other.name + suffix)
+
+
+if __name__ == '__main__':
+    unittest.main()
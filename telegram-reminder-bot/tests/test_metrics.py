@@ -0,0 +1,63 @@
+import unittest
+import logging
+from services.metrics import MetricsRegistry, TextMetricsExporter, LogMetricsExporter, MetricsExporterFactory
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge(self):
+        sends = self.registry.counter("sends_total")
+        sends.inc(labels={"result": "success"})
+        sends.inc(2, labels={"result": "success"})
+        sends.inc(labels={"result": "failure"})
+        self.assertEqual(sends.value({"result": "success"}), 3)
+        self.assertIs(self.registry.counter("sends_total"), sends)
+
+        depth = self.registry.gauge("depth")
+        depth.inc()
+        depth.inc()
+        depth.dec()
+        self.assertEqual(depth.value(), 1)
+
+    def test_kind_conflict(self):
+        self.registry.counter("x")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("x")
+
+    def test_histogram_summary(self):
+        hist = self.registry.histogram("lateness", buckets=(1, 5, 10))
+        for value in (0.5, 2, 3, 4, 20):
+            hist.observe(value)
+        summary = hist.summary()
+        self.assertEqual(summary["count"], 5)
+        self.assertEqual(summary["max"], 20)
+        self.assertAlmostEqual(summary["avg"], 5.9)
+        self.assertEqual(summary["p50"], 5)
+        self.assertEqual(summary["p95"], 20)
+
+    def test_text_format(self):
+        self.registry.counter("sends_total", "Sends").inc(labels={"result": "success"})
+        hist = self.registry.histogram("lateness", buckets=(1, 5))
+        hist.observe(0.5, {"lane": "critical"})
+        hist.observe(3, {"lane": "critical"})
+        output = TextMetricsExporter().render(self.registry)
+        self.assertIn("# HELP sends_total Sends", output)
+        self.assertIn('sends_total{result="success"} 1', output)
+        self.assertIn('lateness_bucket{lane="critical",le="1"} 1', output)
+        self.assertIn('lateness_bucket{lane="critical",le="5"} 2', output)
+        self.assertIn('lateness_bucket{lane="critical",le="+Inf"} 2', output)
+        self.assertIn('lateness_count{lane="critical"} 2', output)
+
+    def test_log_exporter(self):
+        self.registry.histogram("lateness").observe(1.5, {"lane": "normal"})
+        exporter = MetricsExporterFactory.create("log")
+        self.assertIsInstance(exporter, LogMetricsExporter)
+        with self.assertLogs("services.metrics", level=logging.INFO) as logs:
+            exporter.export(self.registry)
+        self.assertIn('lateness{lane="normal"} n=1', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
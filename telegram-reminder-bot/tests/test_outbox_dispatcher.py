@@ -0,0 +1,134 @@
+import unittest
+import tempfile
+import os
+import datetime
+import json
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock, patch
+from aiogram.exceptions import TelegramForbiddenError
+from async_database import AsyncDatabase
+from services.outbox_dispatcher import OutboxDispatcher
+from services.priority_lanes import PriorityLanes
+from services.reminder_scheduler import ReminderScheduler
+
+
+class TestOutboxDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=2)
+        self.bot = Mock()
+        self.bot.send_message = AsyncMock()
+        self.storage = Mock()
+        self.storage.get_user_language.return_value = "en"
+        self.outbox = OutboxDispatcher(self.db, self.bot)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        os.unlink(self.temp_db.name)
+
+    async def _outbox_rows(self):
+        return self.db.writer.conn.execute("select reminder_id, state, attempts from outbox").fetchall()
+
+    async def test_scheduler_enqueues_instead_of_sending(self):
+        past = (datetime.datetime.utcnow() - datetime.timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M")
+        rid = await self.db.add(123, "medicine", "Take pills", past, "+00:00", "none")
+        scheduler = ReminderScheduler(self.db, self.storage, self.bot, outbox=self.outbox)
+        await scheduler._process_due(datetime.datetime.utcnow())
+
+        self.bot.send_message.assert_not_called()
+        self.assertEqual(len(await self.db.list(123, "completed")), 1)
+        self.assertEqual(await self._outbox_rows(), [(rid, "pending", 0)])
+
+        self.assertEqual(await self.outbox.flush(), 1)
+        kwargs = self.bot.send_message.call_args.kwargs
+        self.assertEqual(kwargs["chat_id"], 123)
+        self.assertIn("Take pills", kwargs["text"])
+        self.assertIsNotNone(kwargs["reply_markup"])
+        self.assertEqual(await self._outbox_rows(), [])
+
+    async def test_failed_send_is_retried_later(self):
+        await self.db.commit_tick(notifications=[(1, 123, json.dumps({"text": "Hi", "reply_markup": None}), 0)])
+        self.bot.send_message.side_effect = ConnectionError("network down")
+        self.assertEqual(await self.outbox.flush(), 0)
+        self.assertEqual(await self._outbox_rows(), [(1, "pending", 1)])
+
+    async def test_permanent_error_marks_dead(self):
+        await self.db.commit_tick(notifications=[(1, 123, json.dumps({"text": "Hi", "reply_markup": None}), 0)])
+        self.bot.send_message.side_effect = TelegramForbiddenError(method=Mock(), message="bot was blocked by the user")
+        await self.outbox.flush()
+        self.assertEqual(await self._outbox_rows(), [(1, "dead", 1)])
+
+    async def test_sends_keep_capacity_reserved_for_urgent_lanes(self):
+        lanes = PriorityLanes({"critical": ["medicine"]}, {"critical": 1}, capacity=2)
+        outbox = OutboxDispatcher(self.db, self.bot, lanes=lanes)
+        notifications = [
+            (i, 123, json.dumps({"text": f"Hi {i}", "reply_markup": None, "lane": lane}), 0)
+            for i, lane in enumerate(["normal", "normal", "critical"], start=1)
+        ]
+        await self.db.commit_tick(notifications=notifications)
+        active = {"normal": 0, "critical": 0}
+        peak = {"normal": 0, "critical": 0}
+
+        async def send_message(chat_id, text, reply_markup=None):
+            lane = "critical" if text == "Hi 3" else "normal"
+            active[lane] += 1
+            peak[lane] = max(peak[lane], active[lane])
+            await asyncio.sleep(0.05)
+            active[lane] -= 1
+
+        self.bot.send_message.side_effect = send_message
+        self.assertEqual(await outbox.flush(), 3)
+        self.assertEqual(peak, {"normal": 1, "critical": 1})
+
+    async def test_message_claimed_again_while_queued_is_skipped(self):
+        await self.db.commit_tick(notifications=[(1, 123, json.dumps({"text": "Hi", "reply_markup": None}), 0)])
+        now = datetime.datetime.utcnow()
+        [message] = await self.db.claim_outbox(now, lease_seconds=60)
+        # The lease ran out behind the per-chat limit and another worker took the message
+        await self.db.claim_outbox(now + datetime.timedelta(seconds=60), lease_seconds=60)
+
+        self.assertFalse(await self.outbox._deliver(message, time.monotonic() - 1))
+        self.bot.send_message.assert_not_called()
+        self.assertEqual(await self._outbox_rows(), [(1, "sending", 2)])
+
+    async def test_late_send_renews_its_lease(self):
+        await self.db.commit_tick(notifications=[(1, 123, json.dumps({"text": "Hi", "reply_markup": None}), 0)])
+        [message] = await self.db.claim_outbox(datetime.datetime.utcnow(), lease_seconds=60)
+        with patch.object(self.db, "renew_outbox", wraps=self.db.renew_outbox) as renew:
+            self.assertTrue(await self.outbox._deliver(message, time.monotonic() + 10))
+        renew.assert_called_once()
+        self.assertEqual(await self._outbox_rows(), [])
+
+    async def test_full_page_is_sent_before_the_next_claim(self):
+        outbox = OutboxDispatcher(self.db, self.bot, workers=1, batch_size=2, poll_interval=0.01)
+        await self.db.commit_tick(notifications=[
+            (i, 123, json.dumps({"text": f"Hi {i}", "reply_markup": None}), 0) for i in range(1, 6)
+        ])
+        unsent_at_claim = []
+        claim_outbox = self.db.claim_outbox
+
+        async def claim(*args, **kwargs):
+            unsent_at_claim.append(outbox._queue.qsize())
+            return await claim_outbox(*args, **kwargs)
+
+        async def send_message(chat_id, text, reply_markup=None):
+            await asyncio.sleep(0.01)
+
+        self.bot.send_message.side_effect = send_message
+        with patch.object(self.db, "claim_outbox", claim):
+            outbox.start()
+            try:
+                for _ in range(100):
+                    if not await self._outbox_rows():
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                outbox.stop()
+        self.assertEqual(self.bot.send_message.call_count, 5)
+        self.assertEqual(set(unsent_at_claim), {0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import asyncio
+from database import DueReminder
+from services.priority_lanes import PriorityLanes
+
+
+class TestPriorityLanes(unittest.IsolatedAsyncioTestCase):
+    def test_lane_for_category(self):
+        lanes = PriorityLanes()
+        self.assertEqual(lanes.lane_for("medicine"), "critical")
+        self.assertEqual(lanes.lane_for("birthday"), "high")
+        self.assertEqual(lanes.lane_for("work"), PriorityLanes.NORMAL)
+        self.assertEqual(lanes.order, ["critical", "high", PriorityLanes.NORMAL])
+
+    def test_sort_by_lane_then_due_time(self):
+        lanes = PriorityLanes()
+        reminders = [
+            DueReminder(1, 1, "work", "a", "", "+00:00", "none", 100),
+            DueReminder(2, 1, "bill", "b", "", "+00:00", "none", 50),
+            DueReminder(3, 1, "medicine", "c", "", "+00:00", "none", 200),
+            DueReminder(4, 1, "medicine", "d", "", "+00:00", "none", 150),
+        ]
+        self.assertEqual([r.id for r in lanes.sort(reminders)], [4, 3, 2, 1])
+
+    async def test_normal_lane_cannot_take_reserved_slots(self):
+        lanes = PriorityLanes({"critical": ["medicine"]}, {"critical": 2}, capacity=4)
+        release = asyncio.Event()
+        holding = []
+
+        async def hold(lane):
+            async with lanes.slot(lane):
+                holding.append(lane)
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(hold(PriorityLanes.NORMAL)) for _ in range(4)]
+        tasks += [asyncio.ensure_future(hold("critical")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        self.assertEqual(sorted(holding), ["critical", "critical", PriorityLanes.NORMAL, PriorityLanes.NORMAL])
+        release.set()
+        await asyncio.gather(*tasks)
+
+    def test_lateness_summary(self):
+        lanes = PriorityLanes()
+        lanes.record_lateness("critical", 2.0)
+        lanes.record_lateness("critical", 4.0)
+        lanes.record_lateness("critical", -1.0)
+        summary = lanes.lateness_summary()
+        self.assertEqual(list(summary), ["critical"])
+        self.assertEqual(summary["critical"]["count"], 3)
+        self.assertEqual(summary["critical"]["max"], 4.0)
+        self.assertAlmostEqual(summary["critical"]["avg"], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
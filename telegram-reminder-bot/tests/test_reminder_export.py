@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+import os
+import io
+import json
+from unittest.mock import patch
+from async_database import AsyncDatabase
+from services.reminder_export import ReminderExporter, _fold
+from services.reminder_import import iter_ics
+
+
+class TestReminderExporter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=1)
+        done = await self.db.add(123, "work", "Old, done", "2024-01-01 09:00", "+03:30", "none")
+        await self.db.update_status(done, "completed")
+        await self.db.add(123, "work", "Stand-up", "2030-01-07 12:30", "+03:30",
+                          '{"type": "weekly", "weekdays": [0, 2], "count": 4, "start": "2030-01-07 12:30"}')
+        await self.db.add(123, "medicine", "Pills", "2030-01-01 08:00", "+03:30", '{"type": "daily"}')
+        await self.db.add(456, "work", "Someone else", "2030-01-01 08:00", "+00:00", "none")
+        await self.db.archive_finished()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        os.unlink(self.temp_db.name)
+
+    async def test_jsonl_includes_archive_and_pages(self):
+        out = io.StringIO()
+        exporter = ReminderExporter(self.db, page_size=1)
+        with patch.object(self.db, "export_page", wraps=self.db.export_page) as export_page:
+            self.assertEqual(await exporter.export(123, "jsonl", out), 3)
+        # Two hot rows and one archived row, one per page, plus an empty page for each table
+        self.assertEqual(export_page.call_count, 5)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["content"] for r in rows], ["Stand-up", "Pills", "Old, done"])
+        self.assertEqual(rows[2]["status"], "completed")
+        self.assertEqual(rows[1]["time"], "2030-01-01 08:00")
+        self.assertEqual(rows[1]["repeat"], {"type": "daily"})
+
+    async def test_ics_round_trips_through_import(self):
+        out = io.StringIO(newline="")
+        await ReminderExporter(self.db).export(123, "ics", out)
+        text = out.getvalue()
+        self.assertTrue(text.startswith("BEGIN:VCALENDAR\r\n") and text.endswith("END:VCALENDAR\r\n"))
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4", text)
+        self.assertIn("STATUS:CONFIRMED\r\nX-REMINDER-STATUS:completed", text)
+
+        events = list(iter_ics(text.splitlines(keepends=True), "+03:30"))
+        self.assertEqual([e["content"] for e in events], ["Stand-up", "Pills", "Old, done"])
+        self.assertEqual(events[0]["start"].strftime("%Y-%m-%d %H:%M"), "2030-01-07 12:30")
+        self.assertEqual(events[0]["rule"].weekdays, [0, 2])
+
+    def test_fold_keeps_utf8_sequences_whole(self):
+        line = "SUMMARY:" + "یادآوری" * 20
+        folded = _fold(line)
+        self.assertTrue(all(len(part.encode("utf-8")) <= 75 for part in folded.split("\r\n")))
+        self.assertEqual(folded.replace("\r\n ", "").rstrip("\r\n"), line)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+import tempfile
+import os
+import datetime
+import json
+import threading
+from unittest.mock import patch
+from async_database import AsyncDatabase
+from handlers.repeat_handler import RepeatHandler
+from services.reminder_import import ReminderImporter, iter_csv, iter_ics, rrule_to_pattern
+
+
+ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+SUMMARY:Team stand
+ up
+DTSTART;TZID=Europe/London:20300107T090000
+RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4
+CATEGORIES:WORK
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Dentist
+DTSTART:20300110T063000Z
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Second Monday
+DTSTART:20300110T063000Z
+RRULE:FREQ=MONTHLY;BYDAY=2MO
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Long ago
+DTSTART;VALUE=DATE:20000101
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+class TestRRuleMapping(unittest.TestCase):
+    def test_supported_rules(self):
+        pattern = rrule_to_pattern("FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;UNTIL=20301231T000000Z")
+        self.assertEqual((pattern.type, pattern.value, pattern.weekdays), ("weekly", 2, [1, 3]))
+        self.assertEqual(pattern.until, "20301231T000000Z")
+        pattern = rrule_to_pattern("FREQ=HOURLY;INTERVAL=8")
+        self.assertEqual((pattern.type, pattern.value, pattern.unit), ("interval", 8, "hours"))
+        self.assertEqual(rrule_to_pattern("FREQ=MONTHLY;BYMONTHDAY=1,-1").month_days, [1, -1])
+
+    def test_unsupported_rules(self):
+        self.assertIsNone(rrule_to_pattern("FREQ=MONTHLY;BYDAY=2MO"))
+        self.assertIsNone(rrule_to_pattern("FREQ=YEARLY;BYMONTH=3"))
+        self.assertIsNone(rrule_to_pattern("FREQ=SECONDLY"))
+
+
+class TestParsers(unittest.TestCase):
+    def test_ics_events(self):
+        events = list(iter_ics(ICS.splitlines(keepends=True), "+03:30"))
+        self.assertEqual(len(events), 4)
+        standup, dentist, unsupported, old = events
+        self.assertEqual(standup["content"], "Team standup")
+        self.assertEqual(standup["category"], "work")
+        # 09:00 London in January is 09:00 UTC, 12:30 at +03:30
+        self.assertEqual(standup["start"], datetime.datetime(2030, 1, 7, 12, 30))
+        self.assertEqual(standup["rule"].count, 4)
+        self.assertEqual(dentist["start"], datetime.datetime(2030, 1, 10, 10, 0))
+        self.assertIsNone(dentist["rule"])
+        self.assertIsNone(unsupported)
+        self.assertEqual(old["start"], datetime.datetime(2000, 1, 1, 9, 0))
+
+    def test_csv_rows(self):
+        lines = [
+            "content,time,repeat,timezone\n",
+            "Pills,2030-01-01 08:00,daily,\n",
+            "Call,2030-01-01 08:00,FREQ=WEEKLY;BYDAY=FR,+00:00\n",
+            "Broken,tomorrow,,\n",
+        ]
+        rows = list(iter_csv(lines, "+03:30", RepeatHandler()))
+        self.assertEqual(rows[0]["rule"].type, "daily")
+        self.assertEqual(rows[1]["start"], datetime.datetime(2030, 1, 1, 11, 30))
+        self.assertEqual(rows[1]["rule"].weekdays, [4])
+        self.assertIsNone(rows[2])
+
+
+class TestReminderImporter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=1)
+        self.files = []
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        os.unlink(self.temp_db.name)
+        for path in self.files:
+            os.unlink(path)
+
+    def _file(self, suffix, text):
+        f = tempfile.NamedTemporaryFile("w", delete=False, suffix=suffix, encoding="utf-8")
+        f.write(text)
+        f.close()
+        self.files.append(f.name)
+        return f.name
+
+    async def test_import_ics(self):
+        importer = ReminderImporter(self.db)
+        result = await importer.import_file(123, self._file(".ics", ICS), "calendar.ics", "+03:30")
+        self.assertEqual((result.imported, result.skipped, result.limit_reached), (2, 2, False))
+        reminders = {r[2]: r for r in await self.db.list(123)}
+        self.assertEqual(reminders["Team standup"][3], "2030-01-07 12:30")
+        repeat = json.loads(reminders["Team standup"][5])
+        self.assertEqual((repeat["weekdays"], repeat["count"], repeat["start"]), ([0, 2], 4, "2030-01-07 12:30"))
+        self.assertEqual(reminders["Dentist"][1], "general")
+
+    async def test_import_daily_rule_with_weekdays_and_interval(self):
+        ics = (
+            "BEGIN:VEVENT\nSUMMARY:Gym\nDTSTART:20300107T090000\n"
+            "RRULE:FREQ=DAILY;INTERVAL=2;BYDAY=MO,TU\nEND:VEVENT\n"
+        )
+        importer = ReminderImporter(self.db)
+        result = await importer.import_file(123, self._file(".ics", ics), "calendar.ics", "+00:00")
+        self.assertEqual(result.imported, 1)
+        reminder = (await self.db.list(123))[0]
+        self.assertEqual(reminder[3], "2030-01-07 09:00")
+        handler = RepeatHandler()
+        pattern = handler.from_json(reminder[5])
+        self.assertEqual((pattern.type, pattern.value, pattern.weekdays), ("daily", 2, [0, 1]))
+        # Every other day, kept only on Mondays and Tuesdays: Mon 7th, Tue 15th, Mon 21st
+        occurrences = handler.iter_occurrences(pattern, datetime.datetime(2030, 1, 7, 9, 0))
+        self.assertEqual([next(occurrences).day for _ in range(3)], [7, 15, 21])
+
+    async def test_import_csv_in_chunks_up_to_limit(self):
+        rows = "".join(f"Reminder {i},2030-01-01 08:00\n" for i in range(25))
+        path = self._file(".csv", "content,time\n" + rows)
+        importer = ReminderImporter(self.db, max_reminders=20, chunk_size=8)
+        await self.db.add(123, "work", "Existing", "2030-01-01 08:00", "+03:30", "none")
+        with patch.object(self.db, "add_many", wraps=self.db.add_many) as add_many:
+            result = await importer.import_file(123, path, "export.csv", "+03:30")
+        self.assertEqual((result.imported, result.limit_reached), (19, True))
+        self.assertEqual([len(call.args[1]) for call in add_many.call_args_list], [8, 8, 3])
+        self.assertEqual(await self.db.active_count(123), 20)
+
+    async def test_file_is_parsed_off_the_event_loop(self):
+        path = self._file(".csv", "content,time\nDentist,2030-01-01 08:00\n")
+        importer = ReminderImporter(self.db)
+        threads = []
+        parse = importer._to_reminder
+
+        def to_reminder(*args):
+            threads.append(threading.current_thread())
+            return parse(*args)
+
+        with patch.object(importer, "_to_reminder", to_reminder):
+            result = await importer.import_file(123, path, "export.csv", "+03:30")
+        self.assertEqual(result.imported, 1)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    async def test_recurring_event_starts_at_next_occurrence(self):
+        ics = "BEGIN:VEVENT\nSUMMARY:Water plants\nDTSTART:20200101T080000\nRRULE:FREQ=DAILY\nEND:VEVENT\n"
+        importer = ReminderImporter(self.db)
+        result = await importer.import_file(123, self._file(".ics", ics), "plants.ics", "+00:00")
+        self.assertEqual(result.imported, 1)
+        time = datetime.datetime.strptime((await self.db.list(123))[0][3], "%Y-%m-%d %H:%M")
+        now = datetime.datetime.utcnow()
+        self.assertTrue(now < time <= now + datetime.timedelta(days=1))
+        self.assertEqual(time.strftime("%H:%M"), "08:00")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,367 @@
+import unittest
+import asyncio
+import tempfile
+import os
+import datetime
+import types
+from unittest.mock import Mock, patch
+from async_database import AsyncDatabase
+from handlers.repeat_handler import RepeatHandler
+from services import reminder_scheduler
+from services.reminder_scheduler import ReminderScheduler
+from services.priority_lanes import PriorityLanes
+from services.notification_strategies import NotificationContext, NotificationStrategy, SilentNotificationStrategy
+
+
+class TestHeapScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=2)
+        self.storage = Mock()
+        self.storage.get_user_language.return_value = "en"
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        os.unlink(self.temp_db.name)
+
+    def _scheduler(self, batch_size=500):
+        return ReminderScheduler(
+            self.db, self.storage, Mock(),
+            notification_context=NotificationContext(SilentNotificationStrategy()),
+            mode=ReminderScheduler.MODE_HEAP,
+            batch_size=batch_size
+        )
+
+    async def _wait_for_status(self, user_id, status, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while asyncio.get_running_loop().time() < deadline:
+            if await self.db.list(user_id, status):
+                return True
+            await asyncio.sleep(0.02)
+        return False
+
+    async def test_processes_overdue_reminder_on_start(self):
+        past = (datetime.datetime.utcnow() - datetime.timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M")
+        await self.db.add(123, "work", "Overdue", past, "+00:00", "none")
+        scheduler = self._scheduler()
+        scheduler.start()
+        try:
+            self.assertTrue(await self._wait_for_status(123, "completed"))
+        finally:
+            scheduler.stop()
+
+    async def test_new_earlier_deadline_wakes_scheduler(self):
+        scheduler = self._scheduler()
+        scheduler.start()
+        try:
+            await asyncio.sleep(0.05)
+            self.assertEqual(scheduler._heap, [])
+            now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M")
+            await self.db.add(123, "work", "Right now", now, "+00:00", "none")
+            self.assertTrue(await self._wait_for_status(123, "completed", timeout=1.0))
+        finally:
+            scheduler.stop()
+
+    async def test_claims_every_due_row_past_one_page(self):
+        past = (datetime.datetime.utcnow() - datetime.timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M")
+        for i in range(7):
+            await self.db.add(123, "work", f"Overdue {i}", past, "+00:00", "none")
+        scheduler = self._scheduler(batch_size=2)
+        scheduler.start()
+        try:
+            deadline = asyncio.get_running_loop().time() + 2.0
+            while len(await self.db.list(123, "completed")) < 7 and asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(0.02)
+            self.assertEqual(len(await self.db.list(123, "completed")), 7)
+        finally:
+            scheduler.stop()
+
+    async def test_horizon_ends_at_last_loaded_deadline_when_limit_is_hit(self):
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        for minutes in (10, 20, 30):
+            when = (now + datetime.timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M")
+            await self.db.add(123, "work", f"In {minutes}", when, "+00:00", "none")
+        scheduler = self._scheduler()
+
+        await scheduler._reload_heap(now)
+        self.assertEqual(len(scheduler._heap), 3)
+        self.assertEqual(scheduler._horizon_end, now + datetime.timedelta(seconds=scheduler.heap_horizon))
+
+        scheduler.HEAP_LOAD_LIMIT = 2
+        await scheduler._reload_heap(now)
+        self.assertEqual(len(scheduler._heap), 2)
+        self.assertEqual(scheduler._horizon_end, now + datetime.timedelta(minutes=20))
+
+    async def test_row_leased_elsewhere_is_retried_when_its_lease_ends(self):
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        rid = await self.db.add(123, "work", "Overdue", (now - datetime.timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M"), "+00:00", "none")
+        await self.db.claim_due(now, "crashed-instance", lease_seconds=120)
+        scheduler = self._scheduler()
+        scheduler.start()
+        try:
+            await asyncio.sleep(0.1)
+            self.assertEqual(scheduler._heap, [(now + datetime.timedelta(seconds=120), 0)])
+            self.assertEqual(await self.db.list(123, "completed"), [])
+        finally:
+            scheduler.stop()
+
+        # A tick that fails keeps the due rows in view too
+        await self.db.commit_tick(completed=[rid])
+        await self.db.add(123, "work", "Due", now.strftime("%Y-%m-%d %H:%M"), "+00:00", "none")
+        scheduler = self._scheduler()
+        with patch.object(scheduler, "_process_due", side_effect=RuntimeError("database is locked")):
+            scheduler.start()
+            try:
+                await asyncio.sleep(0.1)
+                self.assertEqual(len(scheduler._heap), 1)
+                self.assertGreater(scheduler._heap[0][0], now)
+            finally:
+                scheduler.stop()
+
+    async def test_deadline_beyond_horizon_is_not_kept(self):
+        scheduler = self._scheduler()
+        scheduler.start()
+        try:
+            await asyncio.sleep(0.05)
+            later = (datetime.datetime.utcnow() + datetime.timedelta(days=2)).strftime("%Y-%m-%d %H:%M")
+            await self.db.add(123, "work", "Later", later, "+00:00", "none")
+            await asyncio.sleep(0.05)
+            self.assertEqual(scheduler._heap, [])
+        finally:
+            scheduler.stop()
+
+
+class TestTickBatching(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = AsyncDatabase(self.temp_db.name, readers=2)
+        self.storage = Mock()
+        self.storage.get_user_language.return_value = "en"
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        os.unlink(self.temp_db.name)
+
+    def _scheduler(self, batch_size=500, drain=False, lanes=None):
+        return ReminderScheduler(
+            self.db, self.storage, Mock(),
+            notification_context=NotificationContext(SilentNotificationStrategy()),
+            batch_size=batch_size,
+            drain=drain,
+            lanes=lanes
+        )
+
+    async def _add_due(self, count, repeat, category="work"):
+        past = (datetime.datetime.utcnow() - datetime.timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M")
+        for i in range(count):
+            await self.db.add(123, category, f"Reminder {i}", past, "+03:30", repeat)
+
+    async def test_tick_commits_once(self):
+        await self._add_due(10, "none")
+        await self._add_due(10, '{"type": "daily"}')
+        scheduler = self._scheduler()
+        with patch.object(self.db, "commit_tick", wraps=self.db.commit_tick) as commit_tick:
+            await scheduler._process_due(datetime.datetime.utcnow())
+        self.assertEqual(commit_tick.call_count, 1)
+        self.assertEqual(len(await self.db.list(123, "completed")), 10)
+        self.assertEqual(await self.db.due(datetime.datetime.utcnow()), [])
+
+    async def test_commit_is_chunked_by_batch_size(self):
+        await self._add_due(10, "none")
+        scheduler = self._scheduler(batch_size=4)
+        with patch.object(self.db, "commit_tick", wraps=self.db.commit_tick) as commit_tick:
+            await scheduler._process_due(datetime.datetime.utcnow())
+        self.assertEqual(commit_tick.call_count, 1)
+        self.assertEqual(len(await self.db.list(123, "completed")), 4)
+
+    async def test_drain_empties_backlog(self):
+        await self._add_due(25, "none")
+        scheduler = self._scheduler(batch_size=4, drain=True, lanes=PriorityLanes({}))
+        with patch.object(self.db, "claim_due", wraps=self.db.claim_due) as claim_due:
+            await scheduler._process_due(datetime.datetime.utcnow())
+        self.assertEqual(len(await self.db.list(123, "completed")), 25)
+        self.assertEqual(claim_due.call_count, 7)
+
+    async def test_overdue_recurring_catches_up_in_one_step(self):
+        three_days_ago = (datetime.datetime.utcnow() - datetime.timedelta(days=3)).strftime("%Y-%m-%d %H:%M")
+        await self.db.add(123, "work", "Stretch", three_days_ago, "+00:00", '{"type": "interval", "value": 5, "unit": "minutes"}')
+        sent = []
+        scheduler = ReminderScheduler(
+            self.db, self.storage, Mock(),
+            notification_context=NotificationContext(RecordingNotificationStrategy(sent, keep_data=True)),
+            catch_up=ReminderScheduler.CATCH_UP_SUMMARY
+        )
+        scheduler.locales = {"en": {"missed_occurrences": "missed {count}"}}
+        await scheduler._process_due(datetime.datetime.utcnow())
+        await scheduler._process_due(datetime.datetime.utcnow())
+        self.assertEqual(len(sent), 1)
+        self.assertRegex(sent[0]['content'], r"missed 86[34]$")
+        self.assertEqual(await self.db.due(datetime.datetime.utcnow()), [])
+
+    async def test_counted_rule_ends_after_count_occurrences(self):
+        # The callback flow anchors the AI's repeat at the first occurrence before saving
+        start = "2024-01-01 09:00"
+        repeat = RepeatHandler().anchor('{"type": "daily", "count": 3}', start)
+        await self.db.add(123, "work", "Standup", start, "+00:00", repeat)
+        sent = []
+        scheduler = ReminderScheduler(
+            self.db, self.storage, Mock(),
+            notification_context=NotificationContext(RecordingNotificationStrategy(sent))
+        )
+        clock = types.SimpleNamespace(now=None)
+
+        class Clock(datetime.datetime):
+            @classmethod
+            def utcnow(cls):
+                return clock.now
+
+        with patch.object(reminder_scheduler, "datetime", types.SimpleNamespace(datetime=Clock, timedelta=datetime.timedelta)):
+            for day in range(1, 8):
+                clock.now = datetime.datetime(2024, 1, day, 9, 0)
+                await scheduler._process_due(clock.now)
+        self.assertEqual(len(sent), 3)
+        self.assertEqual(len(await self.db.list(123, "completed")), 1)
+        self.assertEqual(await self.db.list(123), [])
+
+    async def test_installment_retries_follow_parent(self):
+        parent = await self.db.add(123, "installment", "Car loan", "2024-01-05 09:00", "+00:00", '{"type": "monthly"}')
+        scheduler = self._scheduler()
+        await scheduler._process_due(datetime.datetime(2024, 1, 5, 9, 0))
+
+        # The parent moves to its next cycle instead of firing again every tick
+        self.assertEqual(await self.db.due(datetime.datetime(2024, 1, 5, 12, 0)), [])
+        for day in (6, 7, 8, 9):
+            await scheduler._process_due(datetime.datetime(2024, 1, day, 9, 0))
+        retries = await self.db.list(123, "completed")
+        self.assertEqual(len(retries), 3)
+        self.assertEqual({(await self.db.follow_up_of(r[0]))[0] for r in retries}, {parent})
+        self.assertEqual(await self.db.count_follow_ups(parent), 0)
+
+    async def test_one_time_bill_retries_survive_archiving(self):
+        parent = await self.db.add(123, "bill", "Electricity", "2024-01-05 09:00", "+00:00", '{"type": "none"}')
+        scheduler = self._scheduler()
+        for day in (5, 6, 7, 8, 9):
+            await scheduler._process_due(datetime.datetime(2024, 1, day, 9, 0))
+            await self.db.archive_finished(500)
+        self.assertEqual(await self.db.list(123), [])
+        completed = await self.db.list(123, "completed")
+        self.assertEqual([r[1] for r in completed], ["bill"] + ["installment_retry"] * 3)
+        self.assertEqual({r[2] for r in completed}, {"Electricity"})
+
+    async def test_paid_retry_ends_chain(self):
+        parent = await self.db.add(123, "bill", "Electricity", "2024-01-05 09:00", "+00:00", "none")
+        scheduler = self._scheduler()
+        await scheduler._process_due(datetime.datetime(2024, 1, 5, 9, 0))
+        self.assertEqual(await self.db.count_follow_ups(parent), 1)
+        await self.db.cancel_follow_ups(parent)
+        await scheduler._process_due(datetime.datetime(2024, 1, 6, 9, 0))
+        self.assertEqual(await self.db.count_follow_ups(parent), 0)
+
+    async def test_birthday_lead_alerts_from_one_row(self):
+        birthday = datetime.datetime.utcnow().replace(second=0, microsecond=0) + datetime.timedelta(days=10)
+        rid = await self.db.add(123, "birthday", "Sara", birthday.strftime("%Y-%m-%d %H:%M"), "+00:00", '{"type": "yearly"}')
+        sent = []
+        scheduler = ReminderScheduler(
+            self.db, self.storage, Mock(),
+            notification_context=NotificationContext(RecordingNotificationStrategy(sent, keep_data=True))
+        )
+        scheduler.locales = {"en": {"birthday_week_before": "week until {content}",
+                                    "birthday_three_days_before": "3 days until {content}"}}
+        with patch("time.time", return_value=(birthday - datetime.timedelta(days=7) - datetime.datetime(1970, 1, 1)).total_seconds()):
+            await scheduler._process_due(birthday - datetime.timedelta(days=7))
+        await scheduler._process_due(birthday - datetime.timedelta(days=3))
+        self.assertEqual([s['content'] for s in sent], ["week until Sara", "3 days until Sara"])
+
+        upcoming = await self.db.upcoming(birthday + datetime.timedelta(days=1))
+        self.assertEqual(upcoming, [(birthday, rid)])
+        await scheduler._process_due(birthday)
+        self.assertEqual(sent[-1]['content'], "Sara")
+        reminders = await self.db.list(123)
+        self.assertEqual(len(reminders), 1)
+        self.assertEqual(reminders[0][3], birthday.replace(year=birthday.year + 1).strftime("%Y-%m-%d %H:%M"))
+
+    async def test_stale_lead_alerts_are_dropped_after_an_outage(self):
+        birthday = datetime.datetime.utcnow().replace(second=0, microsecond=0) + datetime.timedelta(days=10)
+        earlier = birthday - datetime.timedelta(days=5)
+        await self.db.add(123, "birthday", "Sara", birthday.strftime("%Y-%m-%d %H:%M"), "+00:00", '{"type": "yearly"}')
+        await self.db.add(123, "birthday", "Reza", earlier.strftime("%Y-%m-%d %H:%M"), "+00:00", '{"type": "yearly"}')
+        sent = []
+        scheduler = ReminderScheduler(
+            self.db, self.storage, Mock(),
+            notification_context=NotificationContext(RecordingNotificationStrategy(sent, keep_data=True))
+        )
+        scheduler.locales = {"en": {"birthday_week_before": "week until {content}",
+                                    "birthday_three_days_before": "3 days until {content}"}}
+
+        # Down from before both week alerts until two days before Sara's birthday, after Reza's
+        back = birthday - datetime.timedelta(days=2)
+        with patch("time.time", return_value=(back - datetime.datetime(1970, 1, 1)).total_seconds()):
+            await scheduler._process_due(back)
+            await scheduler._process_due(back)
+        self.assertEqual(sorted(s['content'] for s in sent), ["3 days until Sara", "Reza"])
+        times = {r[2]: r[3] for r in await self.db.list(123)}
+        self.assertEqual(times["Reza"], earlier.replace(year=earlier.year + 1).strftime("%Y-%m-%d %H:%M"))
+        self.assertEqual(times["Sara"], birthday.strftime("%Y-%m-%d %H:%M"))
+
+    async def test_priority_lane_claimed_first(self):
+        await self._add_due(10, "none")
+        await self._add_due(2, "none", category="medicine")
+        scheduler = self._scheduler(batch_size=4)
+        await scheduler._process_due(datetime.datetime.utcnow())
+        completed = await self.db.list(123, "completed")
+        self.assertEqual(sorted(r[1] for r in completed), ["medicine", "medicine", "work", "work"])
+        self.assertEqual(scheduler.metrics.counter("notification_sends_total").value({"result": "success"}), 4)
+        self.assertEqual(scheduler.metrics.histogram("scheduler_batch_size").summary()["count"], 1)
+        lateness = scheduler.lanes.lateness_summary()
+        self.assertEqual(lateness["critical"]["count"], 2)
+        self.assertGreaterEqual(lateness["critical"]["avg"], 60)
+
+
+class RecordingNotificationStrategy(NotificationStrategy):
+    def __init__(self, sent, keep_data=False):
+        self.sent = sent
+        self.keep_data = keep_data
+
+    async def send_notification(self, bot, user_id, reminder_data, lang, t_func):
+        await asyncio.sleep(0.001)
+        self.sent.append(reminder_data if self.keep_data else reminder_data['id'])
+        return True
+
+
+class TestMultiInstance(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        # Each instance gets its own connections, as separate replicas would
+        self.dbs = [AsyncDatabase(self.temp_db.name, readers=1) for _ in range(3)]
+        self.storage = Mock()
+        self.storage.get_user_language.return_value = "en"
+
+    async def asyncTearDown(self):
+        for db in self.dbs:
+            await db.close()
+        os.unlink(self.temp_db.name)
+
+    async def test_each_reminder_delivered_once(self):
+        past = (datetime.datetime.utcnow() - datetime.timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M")
+        ids = [await self.dbs[0].add(123, "work", f"Reminder {i}", past, "+00:00", "none") for i in range(60)]
+        sent = []
+        schedulers = [
+            ReminderScheduler(
+                db, self.storage, Mock(),
+                notification_context=NotificationContext(RecordingNotificationStrategy(sent)),
+                batch_size=7, drain=True, instance_id=f"replica-{i}"
+            )
+            for i, db in enumerate(self.dbs)
+        ]
+        now = datetime.datetime.utcnow()
+        await asyncio.gather(*(scheduler._process_due(now) for scheduler in schedulers))
+
+        self.assertEqual(sorted(sent), ids)
+        self.assertEqual(len(await self.dbs[0].list(123, "completed")), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import unittest
+import datetime
+import itertools
+import json
+import unittest.mock
+from handlers.repeat_handler import RepeatHandler, RepeatPattern
+
+
+class TestAdvancePast(unittest.TestCase):
+    def setUp(self):
+        self.handler = RepeatHandler()
+        self.current = datetime.datetime(2024, 1, 31, 9, 0)
+
+    def test_interval_jumps_in_one_step(self):
+        pattern = RepeatPattern(type='interval', value=5, unit='minutes')
+        now = self.current + datetime.timedelta(days=3, minutes=2)
+        next_time, missed = self.handler.advance_past(self.current, pattern, now)
+        self.assertEqual(next_time, self.current + datetime.timedelta(days=3, minutes=5))
+        self.assertEqual(missed, 3 * 288)
+
+    def test_not_overdue_advances_once(self):
+        next_time, missed = self.handler.advance_past(self.current, RepeatPattern(type='daily'), self.current)
+        self.assertEqual(next_time, datetime.datetime(2024, 2, 1, 9, 0))
+        self.assertEqual(missed, 0)
+
+    def test_weekly(self):
+        now = datetime.datetime(2024, 2, 14, 9, 0)
+        next_time, missed = self.handler.advance_past(self.current, RepeatPattern(type='weekly'), now)
+        self.assertEqual(next_time, datetime.datetime(2024, 2, 21, 9, 0))
+        self.assertEqual(missed, 2)
+
+    def test_monthly_clamps_to_month_end(self):
+        pattern = RepeatPattern(type='monthly')
+        next_time, missed = self.handler.advance_past(self.current, pattern, datetime.datetime(2024, 4, 30, 8, 0))
+        self.assertEqual(next_time, datetime.datetime(2024, 4, 30, 9, 0))
+        self.assertEqual(missed, 2)
+        next_time, missed = self.handler.advance_past(self.current, pattern, datetime.datetime(2024, 4, 30, 10, 0))
+        self.assertEqual(next_time, datetime.datetime(2024, 5, 31, 9, 0))
+        self.assertEqual(missed, 3)
+
+    def test_yearly(self):
+        leap_day = datetime.datetime(2024, 2, 29, 9, 0)
+        next_time, missed = self.handler.advance_past(leap_day, RepeatPattern(type='yearly'), datetime.datetime(2027, 6, 1))
+        self.assertEqual(next_time, datetime.datetime(2028, 2, 29, 9, 0))
+        self.assertEqual(missed, 3)
+
+    def test_matches_stepping(self):
+        patterns = [RepeatPattern(type='interval', value=7, unit='hours'), RepeatPattern(type='monthly'),
+                    RepeatPattern(type='yearly'), RepeatPattern(type='daily')]
+        now = datetime.datetime(2026, 3, 15, 12, 0)
+        for pattern in patterns:
+            stepped, count = self.current, 0
+            while True:
+                stepped = self.handler.calculate_next_time(stepped, pattern)
+                if stepped > now:
+                    break
+                count += 1
+            next_time, missed = self.handler.advance_past(self.current, pattern, now)
+            if pattern.type != 'monthly':  # stepping a clamped month loses the original day
+                self.assertEqual(next_time, stepped, pattern)
+            self.assertEqual(missed, count, pattern)
+
+    def test_none_pattern(self):
+        self.assertEqual(self.handler.advance_past(self.current, RepeatPattern(type='none'), self.current), (None, 0))
+
+
+class TestRecurrenceRules(unittest.TestCase):
+    def setUp(self):
+        self.handler = RepeatHandler()
+        self.start = datetime.datetime(2024, 1, 1, 9, 0)  # a Monday
+
+    def _take(self, pattern, count, start=None, after=None):
+        return list(itertools.islice(self.handler.iter_occurrences(pattern, start or self.start, after), count))
+
+    def test_weekdays_from_json(self):
+        pattern = self.handler.from_json('{"type": "weekly", "weekdays": ["monday", "wednesday"]}')
+        self.assertEqual(pattern.weekdays, [0, 2])
+        self.assertEqual([d.day for d in self._take(pattern, 5)], [1, 3, 8, 10, 15])
+        self.assertEqual(self.handler.calculate_next_time(datetime.datetime(2024, 1, 3, 9, 0), pattern),
+                         datetime.datetime(2024, 1, 8, 9, 0))
+
+    def test_every_other_week(self):
+        pattern = RepeatPattern(type='weekly', value=2, weekdays=[1, 3])
+        self.assertEqual([d.day for d in self._take(pattern, 4)], [2, 4, 16, 18])
+
+    def test_after_skips_to_later_period(self):
+        pattern = RepeatPattern(type='weekly', weekdays=[4])
+        after = datetime.datetime(2030, 6, 1)
+        self.assertEqual(self._take(pattern, 1, after=after), [datetime.datetime(2030, 6, 7, 9, 0)])
+
+    def test_month_days_with_count(self):
+        pattern = RepeatPattern(type='monthly', month_days=[15, -1], count=4)
+        occurrences = list(self.handler.iter_occurrences(pattern, datetime.datetime(2024, 1, 15, 8, 0)))
+        self.assertEqual([d.date() for d in occurrences], [
+            datetime.date(2024, 1, 15), datetime.date(2024, 1, 31),
+            datetime.date(2024, 2, 15), datetime.date(2024, 2, 29),
+        ])
+
+    def test_count_is_counted_from_start(self):
+        pattern = RepeatPattern(type='daily', count=3, start="2024-01-01 09:00")
+        self.assertEqual(self.handler.calculate_next_time(datetime.datetime(2024, 1, 2, 9, 0), pattern),
+                         datetime.datetime(2024, 1, 3, 9, 0))
+        self.assertIsNone(self.handler.calculate_next_time(datetime.datetime(2024, 1, 3, 9, 0), pattern))
+
+    def test_until_ends_daily_weekday_rule(self):
+        pattern = self.handler.from_json('{"type": "daily", "weekdays": [0, 1, 2, 3, 4], "until": "2024-01-09"}')
+        self.assertEqual([d.day for d in self.handler.iter_occurrences(pattern, datetime.datetime(2024, 1, 4, 8, 0))],
+                         [4, 5, 8, 9])
+
+    def test_shamsi_monthly_follows_persian_months(self):
+        pattern = RepeatPattern(type='monthly', calendar='shamsi')
+        # 1 Farvardin 1403; the first six Persian months have 31 days
+        occurrences = self._take(pattern, 3, start=datetime.datetime(2024, 3, 20, 8, 0))
+        self.assertEqual([d.date() for d in occurrences], [
+            datetime.date(2024, 3, 20), datetime.date(2024, 4, 20), datetime.date(2024, 5, 21),
+        ])
+
+    def test_advance_past_counts_missed_rule_occurrences(self):
+        pattern = RepeatPattern(type='weekly', weekdays=[0, 2])
+        next_time, missed = self.handler.advance_past(self.start, pattern, datetime.datetime(2024, 1, 20))
+        self.assertEqual(next_time, datetime.datetime(2024, 1, 22, 9, 0))
+        self.assertEqual(missed, 5)
+
+    def test_fixed_step_rules_count_missed_by_division(self):
+        now = datetime.datetime(2024, 1, 20, 12, 0)
+        patterns = [
+            RepeatPattern(type='interval', value=30, unit='minutes', until="2024-01-10 00:00"),
+            RepeatPattern(type='daily', value=3, count=4),
+            RepeatPattern(type='weekly', value=2, start="2023-12-18 09:00"),
+            RepeatPattern(type='daily', until="2024-02-01 00:00"),
+        ]
+        for pattern in patterns:
+            anchor = datetime.datetime.strptime(pattern.start, "%Y-%m-%d %H:%M") if pattern.start else self.start
+            walked = sum(1 for _ in itertools.takewhile(
+                lambda dt: dt <= now, self.handler.iter_occurrences(pattern, anchor, after=self.start)
+            ))
+            with unittest.mock.patch.object(self.handler, "iter_occurrences", wraps=self.handler.iter_occurrences) as it:
+                _, missed = self.handler.advance_past(self.start, pattern, now)
+            self.assertEqual(missed, walked, pattern)
+            self.assertEqual(it.call_count, 1)
+
+    def test_missed_is_not_counted_unless_asked(self):
+        pattern = RepeatPattern(type='weekly', weekdays=[0, 2])
+        next_time, missed = self.handler.advance_past(self.start, pattern, datetime.datetime(2024, 1, 20), count_missed=False)
+        self.assertEqual((next_time, missed), (datetime.datetime(2024, 1, 22, 9, 0), 0))
+
+    def test_anchor_pins_start_and_user_calendar(self):
+        anchored = json.loads(self.handler.anchor({"type": "daily", "count": 3}, "2024-01-01 09:00"))
+        self.assertEqual(anchored["start"], "2024-01-01 09:00")
+        anchored = json.loads(self.handler.anchor('{"type": "monthly", "day": 15}', "2024-01-05 09:00", "shamsi"))
+        self.assertEqual(anchored, {"type": "monthly", "day": 15, "calendar": "shamsi"})
+        self.assertEqual(json.loads(self.handler.anchor('{"type": "daily"}', "2024-01-01 09:00", "qamari")), {"type": "daily"})
+        self.assertEqual(self.handler.anchor("none", "2024-01-01 09:00"), "none")
+
+    def test_round_trip(self):
+        raw = '{"type": "monthly", "month_days": [1, 15], "count": 6, "calendar": "shamsi"}'
+        pattern = self.handler.from_json(raw)
+        self.assertEqual(self.handler.from_json(self.handler.to_json(pattern)), pattern)
+        self.assertTrue(self.handler.is_valid_pattern(pattern))
+
+
+class TestAdvanceMany(unittest.TestCase):
+    def setUp(self):
+        self.handler = RepeatHandler()
+
+    def test_matches_advance_past(self):
+        patterns = [
+            RepeatPattern(type='interval', value=5, unit='minutes'),
+            RepeatPattern(type='interval', value=3, unit='hours'),
+            RepeatPattern(type='daily'),
+            RepeatPattern(type='weekly'),
+            RepeatPattern(type='monthly'),
+            RepeatPattern(type='yearly'),
+            RepeatPattern(type='weekly', weekdays=[0, 3]),
+            RepeatPattern(type='none'),
+        ]
+        base = datetime.datetime(2024, 1, 31, 9, 0)
+        current_times, batch, nows = [], [], []
+        for i in range(400):
+            current = base + datetime.timedelta(minutes=7919 * i)
+            current_times.append(current)
+            batch.append(patterns[i % len(patterns)])
+            nows.append(current + datetime.timedelta(minutes=(104729 * i) % 600000 - 5000))
+        expected = [self.handler.advance_past(c, p, n) for c, p, n in zip(current_times, batch, nows)]
+        self.assertEqual(self.handler.advance_many(current_times, batch, nows), expected)
+
+    def test_calculate_next_times(self):
+        current = datetime.datetime(2024, 1, 31, 9, 0)
+        self.assertEqual(
+            self.handler.calculate_next_times([current, current], [RepeatPattern(type='monthly'), RepeatPattern(type='daily')]),
+            [datetime.datetime(2024, 2, 29, 9, 0), datetime.datetime(2024, 2, 1, 9, 0)]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, patch
+from aiogram.exceptions import TelegramRetryAfter
+from services.send_governor import TokenBucket, SendGovernor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_reservations_queue_past_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+    def test_refill_is_capped(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+        bucket.reserve()
+        self.assertFalse(bucket.is_idle())
+        clock.now = 100
+        self.assertTrue(bucket.is_idle())
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+
+class TestSendGovernor(unittest.IsolatedAsyncioTestCase):
+    async def test_per_chat_pacing(self):
+        governor = SendGovernor(global_rate=1000, per_chat_rate=4)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(3):
+            await governor.acquire(1)
+        self.assertGreaterEqual(loop.time() - start, 0.49)
+
+        start = loop.time()
+        await asyncio.gather(*(governor.acquire(chat_id) for chat_id in range(100, 110)))
+        self.assertLess(loop.time() - start, 0.25)
+
+    async def test_retry_after_is_honored(self):
+        governor = SendGovernor(global_rate=1000, per_chat_rate=1000)
+        attempts = []
+
+        async def send():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise TelegramRetryAfter(method=Mock(), message="Too Many Requests", retry_after=0)
+            return "sent"
+
+        with patch.object(governor, "pause", wraps=governor.pause) as pause:
+            self.assertEqual(await governor.send(1, send), "sent")
+        self.assertEqual(pause.call_count, 2)
+        self.assertEqual(len(attempts), 3)
+
+    async def test_gives_up_after_max_retries(self):
+        governor = SendGovernor(global_rate=1000, per_chat_rate=1000, max_retries=1)
+
+        async def send():
+            raise TelegramRetryAfter(method=Mock(), message="Too Many Requests", retry_after=0)
+
+        with self.assertRaises(TelegramRetryAfter):
+            await governor.send(1, send)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import tempfile
+import os
+import json
+import shutil
+from unittest.mock import patch
+from utils.json_storage import JSONStorage
+from utils.sqlite_user_storage import SqliteUserStorage
+
+
+class TestSqliteUserStorage(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.storage = SqliteUserStorage(os.path.join(self.temp_dir, "users.db"))
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_registers_new_user_with_defaults(self):
+        data = self.storage.load(42)
+        self.assertEqual(data["user_id"], 42)
+        self.assertEqual(data["settings"], {"language": "fa", "timezone": "+03:30", "calendar": "shamsi", "setup_complete": False})
+        self.assertEqual(self.storage.user_ids(), [42])
+
+    def test_save_round_trips_unknown_keys(self):
+        data = self.storage.load(1)
+        data["settings"].update(language="en", setup_complete=True, theme="dark")
+        data["referrer"] = 7
+        self.storage.save(1, data)
+
+        loaded = self.storage.load(1)
+        self.assertEqual(loaded["settings"]["language"], "en")
+        self.assertTrue(loaded["settings"]["setup_complete"])
+        self.assertEqual(loaded["settings"]["theme"], "dark")
+        self.assertEqual(loaded["referrer"], 7)
+
+    def test_update_setting(self):
+        self.storage.update_setting(5, "timezone", "+01:00")
+        self.storage.update_setting(5, "setup_complete", True)
+        self.storage.update_setting(5, "theme", "light")
+        settings = self.storage.load(5)["settings"]
+        self.assertEqual(settings["timezone"], "+01:00")
+        self.assertTrue(settings["setup_complete"])
+        self.assertEqual(settings["theme"], "light")
+        self.assertEqual(self.storage.get_user_language(5), "fa")
+        self.assertEqual(self.storage.get_user_language(6), "en")
+        with self.assertRaises(ValueError):
+            self.storage.update_setting(5, "", 1)
+
+    def test_blocked_users_are_not_enumerated(self):
+        for user_id in (3, 1, 2):
+            self.storage.load(user_id)
+        self.storage.set_blocked(2)
+        self.assertEqual(self.storage.user_ids(), [1, 3])
+        self.assertEqual(self.storage.user_ids(include_blocked=True), [1, 2, 3])
+        self.storage.set_blocked(2, False)
+        self.assertEqual(self.storage.user_ids(), [1, 2, 3])
+
+    def test_load_shows_blocked_flag(self):
+        self.storage.load(1)
+        self.storage.set_blocked(1)
+        data = self.storage.load(1)
+        self.assertTrue(data["blocked"])
+        # The flag only changes through set_blocked
+        self.storage.save(1, {**data, "blocked": False})
+        self.assertTrue(self.storage.load(1)["blocked"])
+        self.storage.set_blocked(1, False)
+        self.assertNotIn("blocked", self.storage.load(1))
+
+    def test_find_user_by_username(self):
+        for storage in (self.storage, JSONStorage(os.path.join(self.temp_dir, "users"))):
+            data = storage.load(7)
+            data["username"] = "Sara_K"
+            storage.save(7, data)
+            storage.load(8)
+            self.assertEqual(storage.find_user("@sara_k"), 7)
+            self.assertIsNone(storage.find_user("@nobody"))
+
+    def test_delete_user(self):
+        self.storage.load(9)
+        self.assertTrue(self.storage.delete_user(9))
+        self.assertFalse(self.storage.delete_user(9))
+        self.assertEqual(self.storage.get_all_users(), [])
+
+    def test_migrate_from_json(self):
+        users_path = os.path.join(self.temp_dir, "users")
+        json_storage = JSONStorage(users_path)
+        for user_id in range(1, 6):
+            json_storage.update_setting(user_id, "language", "ru")
+        with open(os.path.join(users_path, "broken.json"), "w") as f:
+            f.write("{")
+
+        self.assertEqual(self.storage.migrate_from_json(users_path, batch_size=2), 5)
+        self.assertEqual(self.storage.user_ids(), [1, 2, 3, 4, 5])
+        self.assertEqual(self.storage.get_user_language(3), "ru")
+        # A finished migration is not repeated
+        self.assertEqual(self.storage.migrate_from_json(users_path), 0)
+
+    def test_interrupted_migration_resumes(self):
+        users_path = os.path.join(self.temp_dir, "users")
+        os.makedirs(users_path)
+        for user_id in range(1, 6):
+            with open(os.path.join(users_path, f"{user_id}.json"), "w") as f:
+                json.dump({"user_id": user_id, "settings": {"language": "ar"}}, f)
+        # A user changed settings after the first batch was copied
+        self.storage.update_setting(1, "language", "en")
+
+        original = self.storage._insert_migrated
+        calls = []
+
+        def fail_second_batch(rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+            return original(rows)
+
+        with patch.object(self.storage, "_insert_migrated", side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.storage.migrate_from_json(users_path, batch_size=2)
+
+        self.storage.migrate_from_json(users_path, batch_size=2)
+        self.assertEqual(self.storage.user_ids(), [1, 2, 3, 4, 5])
+        self.assertEqual(self.storage.get_user_language(1), "en")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.interfaces import IUserStorage
+from services.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class CachedUserStorage(IUserStorage):
+    """Bounded LRU of user data in front of another IUserStorage.
+
+    Hot users are served from memory; clean entries are reloaded after ttl
+    seconds. save only updates the cache and marks the user dirty, and dirty
+    users are written to the wrapped storage every flush_interval seconds
+    and on stop. Dirty entries pushed out of the LRU are kept aside until
+    the next flush, so a read never sees older data than was saved.
+
+    Callers get copies, so changing a loaded dict has no effect until save.
+    Nothing but the flush loop and stop writes to the wrapped storage in
+    bulk: enumerating users reads storage and lays the unwritten saves over
+    it, so those calls never wait for a flush on the event loop.
+    """
+
+    def __init__(self, storage: IUserStorage, metrics: Optional[MetricsRegistry] = None,
+                 max_entries: int = 10000, ttl: float = 300, flush_interval: float = 5.0):
+        self.storage = storage
+        self.metrics = metrics or MetricsRegistry()
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Serializes writes to the wrapped storage so an older copy never lands last
+        self._flush_lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._dirty: Dict[int, int] = {}  # user_id -> version of the unwritten save
+        self._evicted: Dict[int, Dict[str, Any]] = {}
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self._lookups = self.metrics.counter("user_cache_lookups_total", "User data lookups by cache result")
+        self._hit_ratio = self.metrics.gauge("user_cache_hit_ratio", "Share of user data lookups served from memory")
+        self._size = self.metrics.gauge("user_cache_entries", "Users held in the cache")
+        self._flushed = self.metrics.counter("user_cache_flushed_total", "Dirty users written to storage")
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.get_event_loop().create_task(self._loop())
+
+    def stop(self):
+        """Cancels the flush loop and writes whatever is still dirty"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self._flushed.inc(self.flush())
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self._flushed.inc(await loop.run_in_executor(None, self.flush))
+            except Exception as e:
+                logger.error(f"User cache flush error: {e}")
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._lookups.inc(labels={"result": "hit" if hit else "miss"})
+        self._hit_ratio.set(self.hits / (self.hits + self.misses))
+
+    def _cached(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is not None and (user_id in self._dirty or time.monotonic() - entry[1] < self.ttl):
+            self._entries.move_to_end(user_id)
+            return entry[0]
+        return self._evicted.get(user_id)
+
+    def _put(self, user_id: int, data: Dict[str, Any]):
+        self._entries[user_id] = (data, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            evicted_id, (evicted, _) = self._entries.popitem(last=False)
+            if self._dirty.pop(evicted_id, None) is not None:
+                self._evicted[evicted_id] = evicted
+        self._size.set(len(self._entries))
+
+    def _load(self, user_id: int) -> Dict[str, Any]:
+        """The cached dict itself; callers must not change it"""
+        with self.lock:
+            data = self._cached(user_id)
+            version = self._version
+        self._record(data is not None)
+        if data is not None:
+            return data
+        data = self.storage.load(user_id)
+        with self.lock:
+            # A save that happened while we were reading is newer than data
+            if version == self._version:
+                self._put(user_id, data)
+            else:
+                data = self._cached(user_id) or data
+        return data
+
+    def load(self, user_id: int) -> Dict[str, Any]:
+        return copy.deepcopy(self._load(user_id))
+
+    def save(self, user_id: int, data: Dict[str, Any]) -> None:
+        data = copy.deepcopy(data)
+        with self.lock:
+            self._version += 1
+            self._dirty[user_id] = self._version
+            self._evicted.pop(user_id, None)
+            self._put(user_id, data)
+
+    def update_setting(self, user_id: int, key: str, value: Any) -> None:
+        if not key or not isinstance(key, str):
+            raise ValueError("Invalid setting key")
+        data = self.load(user_id)
+        data.setdefault("settings", {})[key] = value
+        self.save(user_id, data)
+
+    def add_reminder(self, user_id: int, reminder: Dict[str, Any]) -> None:
+        if not isinstance(reminder, dict):
+            raise ValueError("Invalid reminder data")
+        data = self.load(user_id)
+        data.setdefault("reminders", {"active": [], "completed": [], "cancelled": []})["active"].append(reminder)
+        self.save(user_id, data)
+
+    def get_user_language(self, user_id: int) -> str:
+        try:
+            return self._load(user_id).get("settings", {}).get("language", "en")
+        except Exception:
+            return "en"
+
+    def _pending(self) -> Dict[int, Dict[str, Any]]:
+        """Saved users not written to storage yet"""
+        with self.lock:
+            pending = {user_id: self._entries[user_id][0] for user_id in self._dirty}
+            pending.update(self._evicted)
+        return pending
+
+    def get_all_users(self) -> List[Dict[str, Any]]:
+        pending = self._pending()
+        users = [
+            copy.deepcopy(pending.pop(data.get("user_id"))) if data.get("user_id") in pending else data
+            for data in self.storage.get_all_users()
+        ]
+        return users + [copy.deepcopy(pending[user_id]) for user_id in sorted(pending)]
+
+    def user_ids(self, include_blocked: bool = False) -> List[int]:
+        ids = set(self.storage.user_ids(include_blocked))
+        for user_id, data in self._pending().items():
+            if include_blocked or not data.get("blocked"):
+                ids.add(user_id)
+            else:
+                ids.discard(user_id)
+        return sorted(ids)
+
+    def set_blocked(self, user_id: int, blocked: bool = True) -> None:
+        self.storage.set_blocked(user_id, blocked)
+        with self.lock:
+            entry = self._entries.get(user_id)
+            if user_id in self._evicted:
+                # A new dict, as a flush may be writing the old one right now
+                self._evicted[user_id] = {**self._evicted[user_id], "blocked": blocked}
+            elif user_id in self._dirty:
+                # Stays dirty under a new version so the unwritten save carries the new flag
+                self._version += 1
+                self._dirty[user_id] = self._version
+                self._entries[user_id] = ({**entry[0], "blocked": blocked}, entry[1])
+            elif entry is not None and bool(entry[0].get("blocked")) != blocked:
+                del self._entries[user_id]
+
+    def delete_user(self, user_id: int) -> bool:
+        with self._flush_lock:
+            with self.lock:
+                self._entries.pop(user_id, None)
+                self._dirty.pop(user_id, None)
+                self._evicted.pop(user_id, None)
+            return self.storage.delete_user(user_id)
+
+    def find_user(self, username: str) -> Optional[int]:
+        name = username.lstrip("@").lower()
+        with self.lock:
+            pending = [(user_id, self._entries[user_id][0]) for user_id in self._dirty]
+            pending += list(self._evicted.items())
+        # A username saved since the last flush is not in storage yet
+        for user_id, data in pending:
+            if (data.get("username") or "").lower() == name:
+                return user_id
+        return self.storage.find_user(username)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Drop cached users so the next load reads storage; unsaved changes stay until the next flush"""
+        with self.lock:
+            for cached_id in ([user_id] if user_id is not None else list(self._entries)):
+                if cached_id not in self._dirty:
+                    self._entries.pop(cached_id, None)
+            self._size.set(len(self._entries))
+
+    def flush(self) -> int:
+        """Writes dirty users to the wrapped storage; returns how many were written"""
+        return self._write(lambda user: True)
+
+    def _write(self, selected) -> int:
+        written = 0
+        with self._flush_lock:
+            with self.lock:
+                batch = [
+                    (user_id, version, self._entries[user_id][0])
+                    for user_id, version in self._dirty.items() if selected(user_id)
+                ]
+                batch += [(user_id, None, data) for user_id, data in self._evicted.items() if selected(user_id)]
+            for user_id, version, data in batch:
+                try:
+                    self.storage.save(user_id, data)
+                except Exception as e:
+                    # Stays dirty and is retried by the next flush
+                    logger.error(f"Failed to write user {user_id}: {e}")
+                    continue
+                written += 1
+                with self.lock:
+                    if version is None:
+                        if self._evicted.get(user_id) is data:
+                            del self._evicted[user_id]
+                    elif self._dirty.get(user_id) == version:
+                        del self._dirty[user_id]
+        return written
@@ -1,7 +1,7 @@
 import json
 import os
 import threading
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 
 class JSONStorage:
@@ -100,4 +100,37 @@ class JSONStorage:
                     users.append(data)
                 except (ValueError, Exception):
                     continue
-        return users
\ No newline at end of file
+        return users
+        
+    def user_ids(self, include_blocked: bool = False) -> List[int]:
+        ids = []
+        for filename in os.listdir(self.path):
+            if filename.endswith('.json'):
+                try:
+                    user_id = int(filename[:-5])
+                except ValueError:
+                    continue
+                if include_blocked or not self.load(user_id).get("blocked"):
+                    ids.append(user_id)
+        return sorted(ids)
+        
+    def set_blocked(self, user_id: int, blocked: bool = True) -> None:
+        data = self.load(user_id)
+        if bool(data.get("blocked")) != blocked:
+            data["blocked"] = blocked
+            self.save(user_id, data)
+        
+    def delete_user(self, user_id: int) -> bool:
+        with self.lock:
+            try:
+                os.remove(self.file(user_id))
+                return True
+            except FileNotFoundError:
+                return False
+                
+    def find_user(self, username: str) -> Optional[int]:
+        username = username.lstrip("@").lower()
+        for user_id in self.user_ids(include_blocked=True):
+            if (self.load(user_id).get("username") or "").lower() == username:
+                return user_id
+        return None
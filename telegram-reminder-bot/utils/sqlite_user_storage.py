@@ -0,0 +1,229 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config.interfaces import IUserStorage
+
+
+# Settings that have their own column; anything else is kept in the extra JSON
+SETTING_COLUMNS = ("language", "timezone", "calendar", "setup_complete")
+DEFAULT_SETTINGS = {"language": "fa", "timezone": "+03:30", "calendar": "shamsi", "setup_complete": False}
+
+
+class SqliteUserStorage(IUserStorage):
+    """User settings in one SQLite table instead of a JSON file per user.
+
+    load/save keep the JSONStorage dict shape. Known settings are columns,
+    so reads are primary-key lookups and enumerating users is one query;
+    other keys round-trip through the extra column. "blocked" is a column
+    too, changed only through set_blocked. The reminder copies
+    JSONStorage kept under "reminders" are not stored, as the reminders
+    table is the source of truth.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                """
+                create table if not exists users(
+                    user_id integer primary key,
+                    language text,
+                    timezone text,
+                    calendar text,
+                    setup_complete integer default 0,
+                    created_at integer,
+                    blocked integer default 0,
+                    extra text
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_users_reachable ON users(user_id) WHERE blocked=0"
+            )
+            self.conn.execute(
+                "create table if not exists user_migrations(source text primary key, users integer, completed_at integer)"
+            )
+
+    @staticmethod
+    def _default(user_id: int) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "reminders": {"active": [], "completed": [], "cancelled": []},
+            "settings": dict(DEFAULT_SETTINGS)
+        }
+
+    @staticmethod
+    def _to_data(row) -> Dict[str, Any]:
+        user_id, language, timezone, calendar, setup_complete, blocked, extra = row
+        extra = json.loads(extra) if extra else {}
+        settings = dict(extra.pop("settings", {}))
+        settings.update(language=language, timezone=timezone, calendar=calendar, setup_complete=bool(setup_complete))
+        data = {"user_id": user_id, "reminders": {"active": [], "completed": [], "cancelled": []}}
+        data.update(extra)
+        data["settings"] = settings
+        if blocked:
+            data["blocked"] = True
+        return data
+
+    @staticmethod
+    def _to_row(user_id: int, data: Dict[str, Any]) -> tuple:
+        settings = {**DEFAULT_SETTINGS, **(data.get("settings") or {})}
+        extra = {k: v for k, v in data.items() if k not in ("user_id", "reminders", "settings", "blocked")}
+        extra_settings = {k: v for k, v in settings.items() if k not in SETTING_COLUMNS}
+        if extra_settings:
+            extra["settings"] = extra_settings
+        return (
+            user_id, settings["language"], settings["timezone"], settings["calendar"],
+            int(bool(settings["setup_complete"])), json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+
+    def _insert_default(self, user_id: int):
+        self.conn.execute(
+            "insert or ignore into users(user_id, language, timezone, calendar, setup_complete, created_at) "
+            "values(?, ?, ?, ?, ?, ?)",
+            (user_id, DEFAULT_SETTINGS["language"], DEFAULT_SETTINGS["timezone"], DEFAULT_SETTINGS["calendar"],
+             0, int(time.time()))
+        )
+
+    def load(self, user_id: int) -> Dict[str, Any]:
+        with self.lock:
+            row = self.conn.execute(
+                "select user_id, language, timezone, calendar, setup_complete, blocked, extra from users where user_id=?",
+                (user_id,)
+            ).fetchone()
+            if row is not None:
+                return self._to_data(row)
+            # Like JSONStorage, a first load registers the user
+            with self.conn:
+                self._insert_default(user_id)
+            return self._default(user_id)
+
+    def save(self, user_id: int, data: Dict[str, Any]) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                insert into users(user_id, language, timezone, calendar, setup_complete, extra, created_at)
+                values(?, ?, ?, ?, ?, ?, ?)
+                on conflict(user_id) do update set language=excluded.language, timezone=excluded.timezone,
+                    calendar=excluded.calendar, setup_complete=excluded.setup_complete, extra=excluded.extra
+                """,
+                self._to_row(user_id, data) + (int(time.time()),)
+            )
+
+    def update_setting(self, user_id: int, key: str, value: Any) -> None:
+        if not key or not isinstance(key, str):
+            raise ValueError("Invalid setting key")
+        if key not in SETTING_COLUMNS:
+            data = self.load(user_id)
+            data["settings"][key] = value
+            self.save(user_id, data)
+            return
+        with self.lock, self.conn:
+            self._insert_default(user_id)
+            self.conn.execute(
+                f"update users set {key}=? where user_id=?",
+                (int(bool(value)) if key == "setup_complete" else value, user_id)
+            )
+
+    def add_reminder(self, user_id: int, reminder: Dict[str, Any]) -> None:
+        """Kept for IUserStorage; reminders are only stored in the reminders table"""
+        if not isinstance(reminder, dict):
+            raise ValueError("Invalid reminder data")
+
+    def get_user_language(self, user_id: int) -> str:
+        with self.lock:
+            row = self.conn.execute("select language from users where user_id=?", (user_id,)).fetchone()
+        return row[0] if row and row[0] else "en"
+
+    def get_all_users(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "select user_id, language, timezone, calendar, setup_complete, blocked, extra from users order by user_id"
+            ).fetchall()
+        return [self._to_data(row) for row in rows]
+
+    def user_ids(self, include_blocked: bool = False) -> List[int]:
+        query = "select user_id from users" if include_blocked else "select user_id from users where blocked=0"
+        with self.lock:
+            return [row[0] for row in self.conn.execute(query + " order by user_id")]
+
+    def set_blocked(self, user_id: int, blocked: bool = True) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "update users set blocked=? where user_id=? and blocked<>?", (int(blocked), user_id, int(blocked))
+            )
+
+    def delete_user(self, user_id: int) -> bool:
+        with self.lock, self.conn:
+            return self.conn.execute("delete from users where user_id=?", (user_id,)).rowcount > 0
+
+    def find_user(self, username: str) -> Optional[int]:
+        with self.lock:
+            row = self.conn.execute(
+                "select user_id from users where lower(json_extract(extra, '$.username')) = ? limit 1",
+                (username.lstrip("@").lower(),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def migrate_from_json(self, users_path: str, batch_size: int = 500) -> int:
+        """Copy JSONStorage files from users_path once; returns how many users were added.
+
+        Each batch commits on its own and users already in the table are left
+        as they are, so an interrupted migration simply continues where it
+        stopped when run again. A finished migration is recorded and skipped.
+        """
+        source = os.path.abspath(users_path)
+        with self.lock:
+            if self.conn.execute("select 1 from user_migrations where source=?", (source,)).fetchone():
+                return 0
+        if not os.path.isdir(users_path):
+            return 0
+        added = 0
+        batch = []
+        for entry in os.scandir(users_path):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                user_id = int(entry.name[:-5])
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (ValueError, OSError):
+                continue
+            if not isinstance(data, dict) or "settings" not in data:
+                continue
+            batch.append(self._to_row(user_id, data) + (int(entry.stat().st_mtime),))
+            if len(batch) >= batch_size:
+                added += self._insert_migrated(batch)
+                batch = []
+        if batch:
+            added += self._insert_migrated(batch)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "insert or replace into user_migrations(source, users, completed_at) values(?, ?, ?)",
+                (source, added, int(time.time()))
+            )
+        return added
+
+    def _insert_migrated(self, rows) -> int:
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "insert or ignore into users(user_id, language, timezone, calendar, setup_complete, extra, created_at) "
+                "values(?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return self.conn.total_changes - before
+
+    def close(self):
+        with self.lock:
+            self.conn.close()